@@ -0,0 +1,154 @@
+import hashlib
+import numpy as np
+from collections import OrderedDict
+
+# -------------------------------------------------------------
+# File:
+# -----
+#   ActivationCache.py
+# -------------------------------------------------------------
+# Description:
+# ------------
+#   The ActivationCache file contains the ActivationCache class.
+#   The ActivationCache class remembers the activations that the
+#   leading layers of a backing tensor produce over the whole
+#   Data Frame so that a Mapping Operator whose leading layers
+#   did not change is not pushed through them again.
+#
+#   Mutation often leaves the first layers of a backing tensor
+#   alone and layer-wise crossover keeps the leading layers of a
+#   parent, so many children share a prefix of layers with a
+#   Mapping Operator that was evaluated last generation. The
+#   activations after layer i only depend on layers 0 through i
+#   and their biases, so they are keyed by a fingerprint of that
+#   prefix. See computePrefixFingerprints().
+#
+#   Activations are large ([pairs, N, N] floats per layer), so
+#   the cache holds at most a fixed number of bytes and evicts
+#   the least recently used activations to stay under it.
+#
+#   There is one cache per Data Frame rather than one per
+#   Mapping Operator. A child is a new Mapping Operator, so a
+#   cache kept on each operator would start out empty for every
+#   child and only help an operator that is evaluated again.
+#   Keyed by prefix fingerprint, one cache lets a child pick up
+#   the activations of whichever parent, clone or elite shares
+#   its leading layers, and a single byte budget bounds the
+#   memory of the whole process however large the population.
+# -------------------------------------------------------------
+# Bypass:
+# -------
+#   The cached activations cover every Stimulus-Product pair in
+#   one batch, so the cache is only used when the Data Frame is
+#   evaluated that way. It is bypassed, and the Mapping Operator
+#   evaluated as if there were no cache, when:
+#
+#       1. Evaluation is not batched (batchedEvaluation is off)
+#       2. A fitness sample is set (fitnessSampleSize > 0)
+#       3. The Data Frame is evaluated in chunks
+#          (0 < evaluationChunkSize < the number of pairs)
+#
+#   See DataFrame.isActivationCacheActive(). While the cache is
+#   in use the Mapping Operators of a population are evaluated
+#   one at a time, not stacked by shape, and the compiled
+#   forward pass is not used.
+# -------------------------------------------------------------
+
+class ActivationCache :
+
+    # Configuration
+    # -------------
+    byteBudget = 0
+
+    # Cached Activations
+    #   Prefix fingerprint -> activations, ordered from least to most recently used
+    activations = None
+    usedBytes = 0
+
+    # Counters
+    hits = 0
+    misses = 0
+
+    def __init__(self, byteBudget) :
+        self.byteBudget = byteBudget
+        self.activations = OrderedDict()
+        self.usedBytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    # Returns the cached activations for a prefix fingerprint, or None if they are not held
+    def lookup(self, prefixFingerprint) :
+        activations = self.activations.get(prefixFingerprint)
+        if activations is None :
+            self.misses = self.misses + 1
+            return None
+        self.activations.move_to_end(prefixFingerprint)
+        self.hits = self.hits + 1
+        return activations
+
+    # Caches the activations for a prefix fingerprint, evicting the least recently used activations to stay in budget
+    def store(self, prefixFingerprint, activations) :
+
+        activations = np.array(activations, dtype = np.float32)
+        if activations.nbytes > self.byteBudget :
+            return
+
+        if prefixFingerprint in self.activations :
+            self.usedBytes = self.usedBytes - self.activations.pop(prefixFingerprint).nbytes
+
+        self.activations[prefixFingerprint] = activations
+        self.usedBytes = self.usedBytes + activations.nbytes
+        while self.usedBytes > self.byteBudget :
+            prefixFingerprint, evictedActivations = self.activations.popitem(last = False)
+            self.usedBytes = self.usedBytes - evictedActivations.nbytes
+
+    # Drops every cached activation. Used when the Data Frame changes.
+    def clear(self) :
+        self.activations.clear()
+        self.usedBytes = 0
+
+    def getHits(self) :
+        return self.hits
+
+    def getMisses(self) :
+        return self.misses
+
+    # Function:
+    # ---------
+    #   computePrefixFingerprints()
+    # --------------------------------------------------------------------------
+    # Description:
+    # ------------
+    #   Fingerprints every leading run of layers of a backing tensor.
+    # --------------------------------------------------------------------------
+    # Parameters:
+    # -----------
+    #   backingTensor - The layers of the backing tensor
+    #   backingTensorBiases - The biases of the backing tensor
+    # --------------------------------------------------------------------------
+    # Returns:
+    # --------
+    #   A list whose entry i fingerprints layers 0 through i and their biases.
+    # --------------------------------------------------------------------------
+    # Explanation:
+    # ------------
+    #   The fingerprints are chained: the fingerprint of layer i is a hash of
+    #   the fingerprint of layer i - 1 together with the shape, values and bias
+    #   of layer i. Two backing tensors therefore share the fingerprint of
+    #   layer i exactly when they agree on every layer up to and including i.
+    # --------------------------------------------------------------------------
+    @staticmethod
+    def computePrefixFingerprints(backingTensor, backingTensorBiases) :
+
+        prefixFingerprints = []
+        prefixFingerprint = b""
+        for i in range(len(backingTensor)) :
+            layer = np.ascontiguousarray(backingTensor[i], dtype = np.float32)
+            layerHash = hashlib.blake2b(prefixFingerprint, digest_size = 16)
+            layerHash.update(np.array(layer.shape, dtype = np.int64).tobytes())
+            layerHash.update(layer.tobytes())
+            layerHash.update(np.float32(backingTensorBiases[i]).tobytes())
+            prefixFingerprint = layerHash.digest()
+            prefixFingerprints.append(prefixFingerprint)
+
+        return prefixFingerprints
@@ -0,0 +1,387 @@
+import numpy as np
+
+# -------------------------------------------------------------
+# File:
+# -----
+#   Backend.py
+# -------------------------------------------------------------
+# Description:
+# ------------
+#   The Backend file contains the compute backends that run the
+#   math of the simulation. A backend provides the handful of
+#   tensor operations the Data Frame and the Mapping Operators
+#   use: elementwise arithmetic, leaky ReLU, matmuls, sums and
+#   stacking. Two backends are provided:
+#
+#       numpy      - Runs everything with NumPy. This is the
+#                    default. It starts instantly and the small
+#                    matmuls of the simulation run without any
+#                    per operation dispatch overhead.
+#       tensorflow - Runs everything as eager TensorFlow
+#                    operations. TensorFlow is only imported when
+#                    this backend is selected.
+#
+#   One backend is selected per process with selectBackend() and
+#   fetched with getBackend(). The Evaluation Module selects the
+#   backend named by its computeBackend parameter and the
+#   evaluator processes select the same one when they start.
+# -------------------------------------------------------------
+# Compiled Evaluators:
+# --------------------
+#   Evaluating a Mapping Operator one layer at a time costs one
+#   call into the backend per operation, and for the small
+#   matrices of the simulation that overhead is most of the
+#   time. A backend can instead compile the whole forward pass
+#   and the L1 error into one function:
+#
+#       numpy      - A numba kernel, when numba is installed and
+#                    the network is small enough to gain from it
+#       tensorflow - A tf.function graph
+#
+#   Compiled evaluators are cached per (depth, product vector
+#   size), so a new one is only built when topological mutation
+#   produces a depth that has not been seen before. See
+#   getCompiledEvaluator().
+# -------------------------------------------------------------
+
+class ComputeBackend :
+
+    # Compiled Evaluators
+    #   (depth, product vector size) -> compiled evaluator, or None if the backend cannot compile one
+    compiledEvaluators = None
+
+    # Function:
+    # ---------
+    #   getCompiledEvaluator()
+    # --------------------------------------------------------------------------
+    # Description:
+    # ------------
+    #   Returns the compiled evaluator for backing tensors of the given shape,
+    #   compiling it the first time it is asked for.
+    # --------------------------------------------------------------------------
+    # Parameters:
+    # -----------
+    #   depth - The number of layers of the backing tensor
+    #   productVectorSize - The product vector size N. The hidden layers are
+    #                       N X N and the output layer is N X 1.
+    # --------------------------------------------------------------------------
+    # Returns:
+    # --------
+    #   A function (stimuli, products, backingTensor, backingTensorBiases) that
+    #   returns the sum of the absolute errors of the backing tensor over the
+    #   given [pairs, 1, 1] stimuli and [pairs, N, 1] products, or None if this
+    #   backend cannot compile one.
+    # --------------------------------------------------------------------------
+    def getCompiledEvaluator(self, depth, productVectorSize) :
+        if self.compiledEvaluators is None :
+            self.compiledEvaluators = {}
+        signature = (depth, productVectorSize)
+        if signature not in self.compiledEvaluators :
+            self.compiledEvaluators[signature] = self.compileEvaluator(depth, productVectorSize)
+        return self.compiledEvaluators[signature]
+
+    def compileEvaluator(self, depth, productVectorSize) :
+        return None
+
+# Function:
+# ---------
+#   buildNumbaForwardPassKernel()
+# --------------------------------------------------------------------------
+# Description:
+# ------------
+#   Compiles the numba kernel behind the compiled evaluators of the NumPy
+#   backend.
+# --------------------------------------------------------------------------
+# Returns:
+# --------
+#   The kernel, or None if numba is not installed.
+# --------------------------------------------------------------------------
+# Explanation:
+# ------------
+#   The kernel takes the backing tensor as one flat float32 buffer with a
+#   table of layer offsets and shapes, the same layout as Genome.py, so a
+#   single compiled kernel serves every depth. It runs the network with
+#   plain loops, which numba turns into tight machine code, and only ever
+#   allocates two activation batches that the layers take turns writing
+#   into.
+# --------------------------------------------------------------------------
+def buildNumbaForwardPassKernel() :
+
+    try :
+        import numba
+    except ImportError :
+        return None
+
+    @numba.njit(cache = True)
+    def forwardPassError(stimuli, products, buffer, layerOffsets, layerShapes, biases, alpha) :
+
+        pairCount = stimuli.shape[0]
+        rows = layerShapes[0, 0]
+        maxCols = 1
+        for i in range(layerShapes.shape[0]) :
+            maxCols = max(maxCols, layerShapes[i, 1])
+
+        # Two activation batches that the layers take turns writing into
+        activations = np.empty((pairCount, rows, maxCols), dtype = np.float32)
+        nextActivations = np.empty((pairCount, rows, maxCols), dtype = np.float32)
+
+        # Feed every stimulus into the first layer
+        cols = layerShapes[0, 1]
+        layer = buffer[layerOffsets[0]:layerOffsets[0] + rows * cols].reshape((rows, cols))
+        for pairIndex in range(pairCount) :
+            for r in range(rows) :
+                for c in range(cols) :
+                    value = stimuli[pairIndex] * layer[r, c] + biases[0]
+                    activations[pairIndex, r, c] = max(value, alpha * value)
+
+        # Push the batch through the rest of the layers. The loops run row,
+        # inner, column so the innermost loop walks both matrices contiguously.
+        for i in range(1, layerShapes.shape[0]) :
+            inner = layerShapes[i, 0]
+            cols = layerShapes[i, 1]
+            layer = buffer[layerOffsets[i]:layerOffsets[i] + inner * cols].reshape((inner, cols))
+            for pairIndex in range(pairCount) :
+                for r in range(rows) :
+                    for c in range(cols) :
+                        nextActivations[pairIndex, r, c] = biases[i]
+                    for k in range(inner) :
+                        activation = activations[pairIndex, r, k]
+                        for c in range(cols) :
+                            nextActivations[pairIndex, r, c] += activation * layer[k, c]
+                    for c in range(cols) :
+                        value = nextActivations[pairIndex, r, c]
+                        nextActivations[pairIndex, r, c] = max(value, alpha * value)
+            activations, nextActivations = nextActivations, activations
+
+        # Sum the absolute error against the product vectors
+        sumOfErrors = 0.0
+        for pairIndex in range(pairCount) :
+            for r in range(rows) :
+                for c in range(cols) :
+                    sumOfErrors = sumOfErrors + abs(products[pairIndex, r, c] - activations[pairIndex, r, c])
+
+        return sumOfErrors
+
+    return forwardPassError
+
+class NumpyBackend(ComputeBackend) :
+
+    name = "numpy"
+    float32 = np.float32
+
+    # The negative slope TensorFlow's leaky_relu defaults to
+    leakyReluAlpha = 0.2
+
+    def leaky_relu(self, x) :
+        return np.maximum(x, self.leakyReluAlpha * x)
+
+    def add(self, a, b) :
+        return np.add(a, b, dtype = np.float32)
+
+    def subtract(self, a, b) :
+        return np.subtract(a, b, dtype = np.float32)
+
+    def multiply(self, a, b) :
+        return np.multiply(a, b, dtype = np.float32)
+
+    def scalar_mul(self, scalar, x) :
+        return np.multiply(np.float32(scalar), x, dtype = np.float32)
+
+    def matmul(self, a, b) :
+        return np.matmul(a, b)
+
+    # Only contractions of the last axis of a against the first axis of b are used
+    def tensordot(self, a, b, axes) :
+        if axes == [[np.ndim(a) - 1], [0]] :
+            return np.matmul(a, b)
+        return np.tensordot(a, b, axes)
+
+    def einsum(self, equation, *operands) :
+        return np.einsum(equation, *operands)
+
+    def reduce_sum(self, x, axis = None) :
+        return np.sum(np.asarray(x, dtype = np.float32), axis = tuple(axis) if isinstance(axis, list) else axis)
+
+    def abs(self, x) :
+        return np.abs(x)
+
+    def convert_to_tensor(self, x, dtype = np.float32) :
+        return np.asarray(x, dtype = dtype)
+
+    def stack(self, xs) :
+        return np.stack([np.asarray(x) for x in xs])
+
+    def reshape(self, x, shape) :
+        return np.reshape(x, shape)
+
+    def expand_dims(self, x, axis) :
+        return np.expand_dims(x, axis)
+
+    def gather(self, x, indices) :
+        return np.asarray(x)[indices]
+
+    def toNumpy(self, x) :
+        return np.asarray(x)
+
+    # The numba kernel, built the first time a compiled evaluator is asked for. False until then.
+    forwardPassKernel = False
+
+    # The largest product vector size the numba kernel is faster than NumPy for
+    maxCompiledProductVectorSize = 4
+
+    # Function:
+    # ---------
+    #   compileEvaluator()
+    # --------------------------------------------------------------------------
+    # Explanation:
+    # ------------
+    #   The NumPy batched forward pass is already one BLAS matmul per layer, so
+    #   its dispatch overhead only matters when the matrices are tiny. The numba
+    #   kernel beats it up to a product vector size of about 4 and loses to
+    #   BLAS above that, so larger networks are not compiled.
+    # --------------------------------------------------------------------------
+    def compileEvaluator(self, depth, productVectorSize) :
+
+        if productVectorSize > self.maxCompiledProductVectorSize :
+            return None
+
+        if self.forwardPassKernel is False :
+            self.forwardPassKernel = buildNumbaForwardPassKernel()
+        forwardPassKernel = self.forwardPassKernel
+        if forwardPassKernel is None :
+            return None
+
+        alpha = np.float32(self.leakyReluAlpha)
+
+        def evaluate(stimuli, products, backingTensor, backingTensorBiases) :
+            layerShapes = np.array([np.shape(layer) for layer in backingTensor], dtype = np.int64)
+            layerOffsets = np.zeros(len(backingTensor), dtype = np.int64)
+            layerOffsets[1:] = np.cumsum(layerShapes[:, 0] * layerShapes[:, 1])[:-1]
+            buffer = np.concatenate([np.asarray(layer, dtype = np.float32).ravel() for layer in backingTensor])
+            return float(forwardPassKernel(np.asarray(stimuli, dtype = np.float32).reshape(-1),
+                                           np.asarray(products, dtype = np.float32),
+                                           buffer, layerOffsets, layerShapes,
+                                           np.asarray(backingTensorBiases, dtype = np.float32), alpha))
+
+        return evaluate
+
+class TensorFlowBackend(ComputeBackend) :
+
+    name = "tensorflow"
+
+    # TensorFlow Module
+    #   Imported when the backend is created
+    tf = None
+    float32 = None
+
+    def __init__(self) :
+        import tensorflow as tf
+
+        # TensorFlow 1 has to be told to run eagerly. TensorFlow 2 always does.
+        if hasattr(tf, 'enable_eager_execution') :
+            tf.enable_eager_execution()
+
+        self.tf = tf
+        self.float32 = tf.float32
+
+    def leaky_relu(self, x) :
+        return self.tf.nn.leaky_relu(x)
+
+    def add(self, a, b) :
+        return self.tf.add(a, b)
+
+    def subtract(self, a, b) :
+        return self.tf.subtract(a, b)
+
+    def multiply(self, a, b) :
+        return self.tf.multiply(a, b)
+
+    def scalar_mul(self, scalar, x) :
+        return self.tf.scalar_mul(scalar, x)
+
+    def matmul(self, a, b) :
+        return self.tf.matmul(a, b)
+
+    def tensordot(self, a, b, axes) :
+        return self.tf.tensordot(a, b, axes = axes)
+
+    def einsum(self, equation, *operands) :
+        return self.tf.einsum(equation, *operands)
+
+    def reduce_sum(self, x, axis = None) :
+        return self.tf.reduce_sum(x, axis = axis)
+
+    def abs(self, x) :
+        return self.tf.abs(x)
+
+    def convert_to_tensor(self, x, dtype = None) :
+        return self.tf.convert_to_tensor(x, dtype = self.tf.float32 if dtype is None else dtype)
+
+    def stack(self, xs) :
+        return self.tf.stack(xs)
+
+    def reshape(self, x, shape) :
+        return self.tf.reshape(x, shape)
+
+    def expand_dims(self, x, axis) :
+        return self.tf.expand_dims(x, axis)
+
+    def gather(self, x, indices) :
+        return self.tf.gather(x, indices)
+
+    def toNumpy(self, x) :
+        if hasattr(x, 'numpy') :
+            return x.numpy()
+        return np.asarray(x)
+
+    # Compiles the forward pass and error reduction of one backing tensor shape into a graph
+    def compileEvaluator(self, depth, productVectorSize) :
+
+        tf = self.tf
+        if not hasattr(tf, 'function') :
+            return None
+
+        # Fixing the shapes in the signature means the graph is traced once per signature
+        layerSpecs = [tf.TensorSpec([productVectorSize, productVectorSize], tf.float32) for i in range(depth - 1)]
+        layerSpecs.append(tf.TensorSpec([productVectorSize, 1], tf.float32))
+        inputSignature = [tf.TensorSpec([None, 1, 1], tf.float32),
+                          tf.TensorSpec([None, productVectorSize, 1], tf.float32),
+                          layerSpecs,
+                          tf.TensorSpec([depth], tf.float32)]
+
+        @tf.function(input_signature = inputSignature)
+        def forwardPassError(stimuli, products, layers, biases) :
+            activations = tf.nn.leaky_relu(tf.add(tf.multiply(stimuli, layers[0]), biases[0]))
+            for i in range(1, depth) :
+                activations = tf.nn.leaky_relu(tf.add(tf.tensordot(activations, layers[i], axes = [[2], [0]]), biases[i]))
+            return tf.reduce_sum(tf.abs(tf.subtract(products, activations)))
+
+        def evaluate(stimuli, products, backingTensor, backingTensorBiases) :
+            return float(forwardPassError(tf.convert_to_tensor(stimuli, dtype = tf.float32),
+                                          tf.convert_to_tensor(products, dtype = tf.float32),
+                                          [tf.convert_to_tensor(layer, dtype = tf.float32) for layer in backingTensor],
+                                          tf.convert_to_tensor(np.asarray(backingTensorBiases, dtype = np.float32))))
+
+        return evaluate
+
+# Backend Registry
+#   Backend name -> backend class
+backendClasses = {
+    NumpyBackend.name : NumpyBackend,
+    TensorFlowBackend.name : TensorFlowBackend
+}
+
+# The backend selected in this process
+currentBackend = NumpyBackend()
+
+# Selects the backend with the given name for this process and returns it
+def selectBackend(backendName) :
+    global currentBackend
+    if backendName not in backendClasses :
+        raise ValueError("Unknown compute backend: " + str(backendName) + ". Choose one of " + ", ".join(backendClasses))
+    if currentBackend.name != backendName :
+        currentBackend = backendClasses[backendName]()
+    return currentBackend
+
+def getBackend() :
+    return currentBackend
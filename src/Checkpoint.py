@@ -0,0 +1,323 @@
+import os
+import json
+import random as random
+import threading
+import numpy as np
+
+from MappingOperator import MappingOperator
+
+# -------------------------------------------------------------
+# File:
+# -----
+#   Checkpoint.py
+# -------------------------------------------------------------
+# Description:
+# ------------
+#   The Checkpoint file contains the Checkpoint class. The
+#   Checkpoint class is responsible for two things:
+#
+#       1. Periodically saving the state of a Genetic Algorithm
+#          run to disk so that a crash or preemption does not lose
+#          the evolved population.
+#       2. Loading a saved state so that the run can continue
+#          exactly where it stopped.
+#
+#   A checkpoint holds the population and elites, their
+#   fitnesses, the best fitness and the fully scored best Mapping
+#   Operator if there is one, the generation count, the state
+#   of the random number generators and the Data Frame that the
+#   population is being trained on. A Data Frame that was loaded
+#   from a file is saved as the path of that file.
+#
+#   A checkpoint also holds the Evaluation Module parameters of
+#   the run, so that a resumed run evolves with the same settings
+#   (see loadParameters()), the counters behind the performance
+#   metrics, so that the metrics of a resumed run cover the whole
+#   run and not only the part after the resume, and the contents
+#   of the fitness cache.
+# -------------------------------------------------------------
+# Format:
+# -------
+#   A checkpoint is an uncompressed NumPy .npz archive. The
+#   population and the elites are each stored as a set of flat
+#   arrays:
+#
+#       <prefix>Buffers       - Every member's backing tensor
+#                               buffer, one after the other
+#       <prefix>BufferOffsets - Where each member's buffer starts
+#       <prefix>LayerShapes   - The [rows, cols] of every layer of
+#                               every member, one after the other
+#       <prefix>Depths        - The number of layers of each member
+#       <prefix>Biases        - Every member's biases, as float64
+#       <prefix>Fitnesses     - The fitness of each member
+#
+#   See MappingOperator.getBackingTensorBuffer() for the layout
+#   of a single buffer. The parameters are stored as a JSON
+#   string under 'parameters', and the fitness cache as a
+#   [entries, hash length] array of genome hashes with their
+#   fitnesses.
+# -------------------------------------------------------------
+
+class Checkpoint :
+
+    # Evaluation Module
+    evaluationModule = None
+
+    # Configuration
+    # -------------
+    checkpointInterval = 0
+    checkpointPath = "gavm_checkpoint.npz"
+
+    # Background Writer
+    writerThread = None
+
+    def __init__(self, evaluationModule) :
+
+        # Evaluation Module
+        self.evaluationModule = evaluationModule
+
+        # Set the Checkpoint parameters from the evaluation module
+        self.checkpointInterval = evaluationModule.checkpointInterval
+        self.checkpointPath = evaluationModule.checkpointPath
+
+    # Whether a checkpoint is due after the given number of completed generations
+    def isDue(self, generationCount) :
+        return self.checkpointInterval > 0 and generationCount % self.checkpointInterval == 0
+
+    # Function:
+    # ---------
+    #   save()
+    # --------------------------------------------------------------------------
+    # Description:
+    # ------------
+    #   Saves the state of a Genetic Algorithm run.
+    # --------------------------------------------------------------------------
+    # Parameters:
+    # -----------
+    #   geneticAlgorithm - The Genetic Algorithm whose state is saved
+    #   generationCount - The number of generations the run has completed
+    # --------------------------------------------------------------------------
+    # Result:
+    # --------
+    #   A snapshot of the run has been taken and is being written to the
+    #   checkpoint path in the background.
+    # --------------------------------------------------------------------------
+    # Explanation:
+    # ------------
+    #   The snapshot is taken right away so that the run can carry on changing
+    #   its population while the snapshot is written. Writing happens on a
+    #   background thread. The archive is first written to a temporary file
+    #   next to the checkpoint and then renamed over it, so the checkpoint on
+    #   disk is always either the previous one or the new one in full. Only one
+    #   write is in flight at a time.
+    # --------------------------------------------------------------------------
+    def save(self, geneticAlgorithm, generationCount) :
+
+        snapshot = self.takeSnapshot(geneticAlgorithm, generationCount)
+
+        # Let the previous write finish before starting the next one
+        self.wait()
+
+        self.writerThread = threading.Thread(target = Checkpoint.writeSnapshot, args = (snapshot, self.checkpointPath))
+        self.writerThread.start()
+
+    # Waits for the background write to finish
+    def wait(self) :
+        if self.writerThread is not None :
+            self.writerThread.join()
+            self.writerThread = None
+
+    # Copies everything a checkpoint holds out of the Genetic Algorithm
+    def takeSnapshot(self, geneticAlgorithm, generationCount) :
+
+        snapshot = {}
+        snapshot.update(Checkpoint.packMappingOperators(geneticAlgorithm.population, "population"))
+        snapshot.update(Checkpoint.packMappingOperators(geneticAlgorithm.elites, "elites"))
+        if geneticAlgorithm.bestMappingOperator is not None :
+            snapshot.update(Checkpoint.packMappingOperators([geneticAlgorithm.bestMappingOperator], "best"))
+
+        snapshot['generationCount'] = np.array(generationCount, dtype = np.int64)
+        snapshot['bestFitness'] = np.array(geneticAlgorithm.bestFitness, dtype = np.float64)
+
+        # Evaluation Module parameters
+        snapshot['parameters'] = np.array(json.dumps(self.evaluationModule.getParameters()))
+
+        # Performance metric counters. A run without a fitness gain yet is saved as -1.
+        lastFitnessGainGeneration = geneticAlgorithm.lastFitnessGainGeneration
+        snapshot['lastFitnessGainGeneration'] = np.array(-1 if lastFitnessGainGeneration is None else lastFitnessGainGeneration, dtype = np.int64)
+        snapshot['populationFitnessTotal'] = np.array(geneticAlgorithm.populationFitnessTotal, dtype = np.float64)
+        snapshot['populationFitnessCount'] = np.array(geneticAlgorithm.populationFitnessCount, dtype = np.int64)
+        snapshot['generationCountsBetweenFitnessGains'] = np.array(self.evaluationModule.generationCountsBetweenFitnessGains, dtype = np.int64)
+        snapshot['fitnessGains'] = np.array(self.evaluationModule.fitnessGains, dtype = np.float64)
+
+        # Fitness cache, from least to most recently used. A resumed run that started with an empty cache
+        # would evaluate the members the original run took from the cache.
+        if geneticAlgorithm.fitnessCache is not None :
+            cachedFitnesses = geneticAlgorithm.fitnessCache.fitnesses
+            genomeHashes = [np.frombuffer(genomeHash, dtype = np.uint8) for genomeHash in cachedFitnesses.keys()]
+            snapshot['fitnessCacheHashes'] = np.array(genomeHashes, dtype = np.uint8) if len(genomeHashes) > 0 else np.zeros((0, 0), dtype = np.uint8)
+            snapshot['fitnessCacheFitnesses'] = np.array(list(cachedFitnesses.values()), dtype = np.float64)
+
+        # Random number generator state
+        snapshot['numpyRandomState'] = np.array(json.dumps(self.evaluationModule.getRandomGenerator().bit_generator.state))
+        snapshot['pythonRandomState'] = np.array(json.dumps(random.getstate()))
+
+        # Data Frame. A Data Frame loaded from a file is saved as its path.
+        dataFrame = self.evaluationModule.getDataFrame()
+        if dataFrame.dataFrameFilePath is not None :
+            snapshot['dataFrameFilePath'] = np.array(str(dataFrame.dataFrameFilePath))
+        else :
+            snapshot['stimuli'] = np.array(dataFrame.stimulusVector, dtype = np.float32)
+            snapshot['products'] = np.array(dataFrame.productMatrix, dtype = np.float32)
+
+        return snapshot
+
+    # Writes a snapshot to a temporary file and moves it over the checkpoint
+    @staticmethod
+    def writeSnapshot(snapshot, checkpointPath) :
+        temporaryPath = checkpointPath + ".tmp"
+        with open(temporaryPath, 'wb') as checkpointFile :
+            np.savez(checkpointFile, **snapshot)
+            checkpointFile.flush()
+            os.fsync(checkpointFile.fileno())
+        os.replace(temporaryPath, checkpointPath)
+
+    # Function:
+    # ---------
+    #   load()
+    # --------------------------------------------------------------------------
+    # Description:
+    # ------------
+    #   Loads a checkpoint written by save().
+    # --------------------------------------------------------------------------
+    # Parameters:
+    # -----------
+    #   checkpointPath - The path of the checkpoint
+    # --------------------------------------------------------------------------
+    # Returns:
+    # --------
+    #   A dictionary of the arrays held in the checkpoint.
+    # --------------------------------------------------------------------------
+    @staticmethod
+    def load(checkpointPath) :
+        with np.load(checkpointPath) as checkpointArchive :
+            return {name : checkpointArchive[name] for name in checkpointArchive.files}
+
+    # Returns the Evaluation Module parameters saved in a checkpoint, to build the Evaluation Module of
+    # the resumed run from
+    @staticmethod
+    def loadParameters(checkpointPath) :
+        return json.loads(str(Checkpoint.load(checkpointPath)['parameters']))
+
+    # Function:
+    # ---------
+    #   restore()
+    # --------------------------------------------------------------------------
+    # Description:
+    # ------------
+    #   Puts the state held in a loaded checkpoint back into a Genetic Algorithm.
+    # --------------------------------------------------------------------------
+    # Parameters:
+    # -----------
+    #   geneticAlgorithm - The Genetic Algorithm to restore
+    #   checkpointState - The dictionary returned by load()
+    # --------------------------------------------------------------------------
+    # Returns:
+    # --------
+    #   The number of generations the run had completed.
+    # --------------------------------------------------------------------------
+    def restore(self, geneticAlgorithm, checkpointState) :
+
+        geneticAlgorithm.population = Checkpoint.unpackMappingOperators(checkpointState, "population", self.evaluationModule)
+        geneticAlgorithm.elites = Checkpoint.unpackMappingOperators(checkpointState, "elites", self.evaluationModule)
+        geneticAlgorithm.bestFitness = float(checkpointState['bestFitness'])
+        if 'bestBuffers' in checkpointState :
+            geneticAlgorithm.bestMappingOperator = Checkpoint.unpackMappingOperators(checkpointState, "best", self.evaluationModule)[0]
+
+        # Performance metric counters
+        lastFitnessGainGeneration = int(checkpointState['lastFitnessGainGeneration'])
+        geneticAlgorithm.lastFitnessGainGeneration = None if lastFitnessGainGeneration < 0 else lastFitnessGainGeneration
+        geneticAlgorithm.populationFitnessTotal = float(checkpointState['populationFitnessTotal'])
+        geneticAlgorithm.populationFitnessCount = int(checkpointState['populationFitnessCount'])
+        self.evaluationModule.generationCountsBetweenFitnessGains = []
+        for generationCount in checkpointState['generationCountsBetweenFitnessGains'].tolist() :
+            self.evaluationModule.addGenerationCountAtFitnessGain(generationCount)
+        self.evaluationModule.fitnessGains = []
+        for fitnessGain in checkpointState['fitnessGains'].tolist() :
+            self.evaluationModule.addFitnessGain(fitnessGain)
+
+        # Fitness cache
+        if geneticAlgorithm.fitnessCache is not None and 'fitnessCacheHashes' in checkpointState :
+            geneticAlgorithm.fitnessCache.clear()
+            for genomeHash, fitness in zip(checkpointState['fitnessCacheHashes'], checkpointState['fitnessCacheFitnesses'].tolist()) :
+                geneticAlgorithm.fitnessCache.store(genomeHash.tobytes(), fitness)
+
+        # Random number generator state
+        self.evaluationModule.getRandomGenerator().bit_generator.state = json.loads(str(checkpointState['numpyRandomState']))
+        pythonRandomState = json.loads(str(checkpointState['pythonRandomState']))
+        random.setstate((pythonRandomState[0], tuple(pythonRandomState[1]), pythonRandomState[2]))
+
+        return int(checkpointState['generationCount'])
+
+    # Restores the Data Frame held in a loaded checkpoint
+    def restoreDataFrame(self, checkpointState) :
+        if 'dataFrameFilePath' in checkpointState :
+            self.evaluationModule.getDataFrame().loadDataFrameFromFile(str(checkpointState['dataFrameFilePath']))
+        else :
+            self.evaluationModule.getDataFrame().setDataFrame(checkpointState['stimuli'], checkpointState['products'])
+
+    # Packs a list of Mapping Operators into flat arrays
+    @staticmethod
+    def packMappingOperators(mappingOperators, prefix) :
+
+        buffers = []
+        layerShapes = []
+        depths = []
+        biases = []
+        for mappingOperator in mappingOperators :
+            backingTensor = mappingOperator.getBackingTensor()
+            buffers.append(np.array(mappingOperator.getBackingTensorBuffer(), dtype = np.float32))
+            layerShapes.extend([np.shape(layer) for layer in backingTensor])
+            depths.append(len(backingTensor))
+            biases.extend(np.asarray(mappingOperator.getBackingTensorBiases(), dtype = np.float64).tolist())
+
+        bufferOffsets = np.zeros(len(buffers) + 1, dtype = np.int64)
+        bufferOffsets[1:] = np.cumsum([len(buffer) for buffer in buffers])
+
+        return {
+            prefix + 'Buffers' : np.concatenate(buffers) if len(buffers) > 0 else np.zeros(0, dtype = np.float32),
+            prefix + 'BufferOffsets' : bufferOffsets,
+            prefix + 'LayerShapes' : np.array(layerShapes, dtype = np.int64).reshape(-1, 2),
+            prefix + 'Depths' : np.array(depths, dtype = np.int64),
+            prefix + 'Biases' : np.array(biases, dtype = np.float64),
+            prefix + 'Fitnesses' : np.array([mappingOperator.getFitness() for mappingOperator in mappingOperators], dtype = np.float64)
+        }
+
+    # Rebuilds a list of Mapping Operators from the flat arrays made by packMappingOperators()
+    @staticmethod
+    def unpackMappingOperators(checkpointState, prefix, evaluationModule) :
+
+        buffers = checkpointState[prefix + 'Buffers']
+        bufferOffsets = checkpointState[prefix + 'BufferOffsets']
+        layerShapes = checkpointState[prefix + 'LayerShapes']
+        depths = checkpointState[prefix + 'Depths']
+        biases = checkpointState[prefix + 'Biases']
+        fitnesses = checkpointState[prefix + 'Fitnesses']
+
+        mappingOperators = []
+        layerIndex = 0
+        for i in range(len(depths)) :
+            depth = int(depths[i])
+            memberLayerShapes = [tuple(int(size) for size in layerShape) for layerShape in layerShapes[layerIndex:layerIndex + depth]]
+
+            # Biases mutate in double precision, so they are set again at the precision they were saved at
+            memberBiases = biases[layerIndex:layerIndex + depth].copy()
+            mappingOperator = MappingOperator(evaluationModule, False)
+            mappingOperator.setBackingTensorBuffer(buffers[bufferOffsets[i]:bufferOffsets[i + 1]].copy(), memberLayerShapes, memberBiases)
+            mappingOperator.setBackingTensorBiases(memberBiases.tolist())
+            mappingOperator.setFitness(fitnesses[i])
+            mappingOperators.append(mappingOperator)
+
+            layerIndex = layerIndex + depth
+
+        return mappingOperators
@@ -1,9 +1,12 @@
 
+import struct
 import random as random
+import numpy as np
+from multiprocessing import shared_memory
 
-import tensorflow as tf
-
+import Backend
 import MappingOperator
+from ActivationCache import ActivationCache
 
 # -------------------------------------------------------------
 # File:
@@ -19,6 +22,29 @@ import MappingOperator
 #       2. Evaluate Mapping Operators against the Stimulus
 #          Product pairs contained in the Data Frame
 # -------------------------------------------------------------
+# File Format:
+# ------------
+#   A Data Frame can be written to and loaded from a binary file
+#   laid out as:
+#
+#       Header (64 bytes, little endian):
+#           8 bytes  - The magic bytes "GAVMDATA"
+#           uint32   - The format version
+#           uint32   - The size of the header
+#           uint64   - The number of Stimulus-Product pairs
+#           uint64   - The product vector size
+#           uint64   - The byte offset of the product vectors
+#           padding up to 64 bytes
+#       Stimuli:
+#           float32 X pairs
+#       Product vectors:
+#           float32 X pairs X product vector size, starting at
+#           the product vector offset which is 64 byte aligned
+#
+#   The stimuli and product vectors are loaded with
+#   numpy.memmap, so nothing is read until it is used and product
+#   sets bigger than memory are paged in as they are evaluated.
+# -------------------------------------------------------------
 
 class DataFrame :
 
@@ -27,6 +53,29 @@ class DataFrame :
     stimulusProductPairCount = 0
     productValueLow = 0
     productValueHigh = 1.0
+    batchedEvaluation = True
+    evaluationChunkSize = 0
+    randomGenerator = None
+
+    # Sample:
+    # -------
+    #   The indices of the Stimulus-Product pairs evaluations are restricted
+    #   to. None means every pair. See setSample().
+    sampleIndices = None
+
+    # Activation Cache:
+    # -----------------
+    #   Holds the activations of the leading layers of recently evaluated
+    #   backing tensors. None when the cache is disabled. See
+    #   evaluateMappingOperatorFromActivationCache().
+    activationCacheBudget = 0
+    activationCache = None
+
+    # Compiled Forward Pass:
+    # ----------------------
+    #   Whether batched evaluations run through the compiled evaluator of the
+    #   compute backend when it has one. See Backend.py.
+    compiledForwardPass = True
 
     # Stimuli:
     # --------
@@ -66,6 +115,32 @@ class DataFrame :
     productVectorSize = 0
     productVectors = []
 
+    # Batched Data Frame:
+    # -------------------
+    #   The stimulus vector and product vectors stacked into single tensors so
+    #   that a Mapping Operator can be run against every pair in one pass. The
+    #   stimulus matrix is shaped [pairs, 1, 1] so that it broadcasts over the
+    #   first layer of a backing tensor and the product matrix is shaped
+    #   [pairs, N, 1] to line up with the output of the network.
+    stimulusMatrix = None
+    productMatrix = None
+
+    # Shared Data Frame:
+    # ------------------
+    #   The shared memory block holding the stimuli and product vectors while
+    #   they are shared with evaluator processes. See shareDataFrame().
+    sharedMemoryBlock = None
+
+    # Data Frame File:
+    # ----------------
+    #   The file this Data Frame was loaded from, if any. See the file format
+    #   above.
+    dataFrameFilePath = None
+    dataFrameFileMagic = b"GAVMDATA"
+    dataFrameFileVersion = 1
+    dataFrameFileHeaderFormat = "<8sIIQQQ"
+    dataFrameFileHeaderSize = 64
+
     # Stimulus - Product pair Mapping example:
     # ---------------------------------
     #
@@ -90,9 +165,17 @@ class DataFrame :
         self.productValueLow = evaluationModule.productValueLow
         self.productValueHigh = evaluationModule.productValueHigh
         self.productVectorSize = evaluationModule.productVectorSize
+        self.batchedEvaluation = evaluationModule.batchedEvaluation
+        self.evaluationChunkSize = evaluationModule.evaluationChunkSize
+        self.compiledForwardPass = evaluationModule.compiledForwardPass
+        self.randomGenerator = evaluationModule.getRandomGenerator()
+        self.setActivationCacheBudget(evaluationModule.activationCacheBudget)
         
-        # Generate a random data frame
-        self.generateRandomDataFrame()
+        # Load the data frame from a file or generate a random one
+        if evaluationModule.dataFrameFilePath is not None :
+            self.loadDataFrameFromFile(evaluationModule.dataFrameFilePath)
+        else :
+            self.generateRandomDataFrame()
 
     # Function:
     # --------- 
@@ -115,9 +198,9 @@ class DataFrame :
     # --------------------------------------------------------------------------
     # Explanation:
     # ------------
-    #   This function uses Tensorflow to simulate a neural network where the
-    #   backing tensor in the given Mapping Operator are the weights of the
-    #   network. Recall that it is the Genetic Algorithm's responsibility to
+    #   This function uses the compute backend to simulate a neural network
+    #   where the backing tensor in the given Mapping Operator are the weights
+    #   of the network. See Backend.py. Recall that it is the Genetic Algorithm's responsibility to
     #   evolve the weights of the Mapping Operators in its population to get
     #   a better and better solution. This function serves as the measure for
     #   how well the Mapping Operator maps the given Stimulus Values to the
@@ -125,6 +208,13 @@ class DataFrame :
     #   get a graphical respresentation of the idea.
     # --------------------------------------------------------------------------
     def evaluateMappingOperator(self, mappingOperator) :
+
+        # Run the whole Data Frame through the network at once if we can
+        if self.batchedEvaluation :
+            self.evaluateMappingOperatorBatched(mappingOperator)
+            return
+
+        backend = Backend.getBackend()
         
         # Designate a list of errors that are the result of a stimulus
         # being applied to the mapping operation and measured against
@@ -135,18 +225,18 @@ class DataFrame :
         backingTensorBiases = mappingOperator.getBackingTensorBiases()
         
         # For each stimulus-product vector pair
-        for pairIndex in range(len(self.stimulusVector)) :
+        for pairIndex in self.getPairIndices() :
 
             stimulus = self.stimulusVector[pairIndex]
             productVector = self.productVectors[pairIndex]
 
             # Simulate a neural network
-            resultantMappingOperationProduct = tf.nn.leaky_relu(tf.add(tf.scalar_mul(stimulus, backingTensor[0]), backingTensorBiases[0]))
+            resultantMappingOperationProduct = backend.leaky_relu(backend.add(backend.scalar_mul(stimulus, backingTensor[0]), backingTensorBiases[0]))
             for i in range(1, len(backingTensor)) :
-                resultantMappingOperationProduct = tf.nn.leaky_relu(tf.add(tf.matmul(resultantMappingOperationProduct, backingTensor[i]), backingTensorBiases[i]))
+                resultantMappingOperationProduct = backend.leaky_relu(backend.add(backend.matmul(resultantMappingOperationProduct, backingTensor[i]), backingTensorBiases[i]))
 
-            productVector = productVector.numpy()
-            resultantMappingOperationProduct = resultantMappingOperationProduct.numpy()
+            productVector = np.asarray(productVector)
+            resultantMappingOperationProduct = backend.toNumpy(resultantMappingOperationProduct)
             stimulusProductPairError = 0
             for i in range(len(productVector)) :
                 stimulusProductPairError = stimulusProductPairError + abs(productVector[i] - resultantMappingOperationProduct[i])
@@ -155,17 +245,408 @@ class DataFrame :
             stimulusProductPairErrors.append(stimulusProductPairError)
 
         # Compute the sum total of errors in this compression operator evaluation operation
-        sumOfErrors = tf.reduce_sum(stimulusProductPairErrors)
+        sumOfErrors = backend.reduce_sum(stimulusProductPairErrors)
 
         # Set the sum of the errors over this compression operators as the fitness of
         # the mapping operator
-        sumOfErrors = sumOfErrors.numpy()
+        sumOfErrors = backend.toNumpy(sumOfErrors) * self.getSampleScale()
         mappingOperator.setFitness(sumOfErrors)
 
-    def evaluateFinalMappingOperator(self, finalMappingOperator) :
+    # Function:
+    # --------- 
+    #   evaluateMappingOperatorBatched()
+    # --------------------------------------------------------------------------
+    # Description:
+    # ------------
+    #   Evaluates the given Mapping Operator against every Stimulus-Product pair
+    #   in a single forward pass.
+    # --------------------------------------------------------------------------
+    # Parameters:
+    # -----------
+    #   mappingOperator - The Mapping Operator to be evaluated
+    # --------------------------------------------------------------------------
+    # Result:
+    # --------
+    #   The given Mapping Operator has been evaluated against the data contained
+    #   within this DataFrame.
+    # --------------------------------------------------------------------------
+    # Explanation:
+    # ------------
+    #   This is the same network as in evaluateMappingOperator() but instead of
+    #   feeding the stimuli in one at a time, the stacked stimulus matrix is fed
+    #   in all at once. Each layer is then a single batched operation over every
+    #   pair and the error is reduced in one call, so the cost of an evaluation
+    #   no longer grows with Python overhead per Stimulus-Product pair.
+    #
+    #   If an evaluation chunk size is set the Data Frame is walked in chunks of
+    #   that many pairs and the error is accumulated chunk by chunk. See
+    #   iterateChunks().
+    #
+    #   When the compute backend can compile the network for the shape of the
+    #   backing tensor, each chunk is evaluated with one call to the compiled
+    #   function instead of one backend call per layer. See
+    #   getCompiledEvaluator().
+    # --------------------------------------------------------------------------
+    def evaluateMappingOperatorBatched(self, mappingOperator) :
+
+        if self.isActivationCacheActive() :
+            self.evaluateMappingOperatorFromActivationCache(mappingOperator)
+            return
+
+        backend = Backend.getBackend()
+        backingTensor = mappingOperator.getBackingTensor()
+        backingTensorBiases = mappingOperator.getBackingTensorBiases()
+
+        # Run the whole network as one compiled function if the backend has one for this shape
+        compiledEvaluator = self.getCompiledEvaluator(backingTensor, backingTensorBiases)
+        if compiledEvaluator is not None :
+            sumOfErrors = 0.0
+            for stimulusChunk, productChunk in self.iterateChunks() :
+                sumOfErrors = sumOfErrors + compiledEvaluator(stimulusChunk, productChunk, backingTensor, backingTensorBiases)
+            mappingOperator.setFitness(sumOfErrors * self.getSampleScale())
+            return
+
+        sumOfErrors = 0.0
+        for stimulusChunk, productChunk in self.iterateChunks() :
+
+            # Feed every stimulus in the chunk into the first layer. This gives a [chunk, N, N] batch
+            resultantMappingOperationProducts = backend.leaky_relu(backend.add(backend.multiply(stimulusChunk, backingTensor[0]), backingTensorBiases[0]))
+
+            # Push the batch through the rest of the layers
+            for i in range(1, len(backingTensor)) :
+                resultantMappingOperationProducts = backend.leaky_relu(backend.add(backend.tensordot(resultantMappingOperationProducts, backingTensor[i], axes = [[2], [0]]), backingTensorBiases[i]))
+
+            # Sum the absolute error over every value of every product vector in the chunk
+            sumOfErrors = sumOfErrors + float(backend.reduce_sum(backend.abs(backend.subtract(productChunk, resultantMappingOperationProducts))))
+
+        # Set the sum of the errors as the fitness of the mapping operator
+        mappingOperator.setFitness(sumOfErrors * self.getSampleScale())
+
+    # Function:
+    # --------- 
+    #   evaluateMappingOperatorFromActivationCache()
+    # --------------------------------------------------------------------------
+    # Description:
+    # ------------
+    #   Evaluates a Mapping Operator like evaluateMappingOperatorBatched(),
+    #   starting the forward pass after the deepest run of leading layers whose
+    #   activations are in the activation cache.
+    # --------------------------------------------------------------------------
+    # Parameters:
+    # -----------
+    #   mappingOperator - The Mapping Operator to be evaluated
+    # --------------------------------------------------------------------------
+    # Result:
+    # --------
+    #   The Mapping Operator has been evaluated and the activations of its
+    #   hidden layers have been cached.
+    # --------------------------------------------------------------------------
+    # Explanation:
+    # ------------
+    #   The activations after layer i depend only on layers 0 through i, so
+    #   the cache is searched from the deepest hidden layer up for the
+    #   fingerprint of the Mapping Operator's prefix. See
+    #   ActivationCache.computePrefixFingerprints(). The layers after the
+    #   deepest hit are run as usual and the activations of every hidden layer
+    #   that was run are cached for the Mapping Operators that come after it.
+    #   The output layer is never cached. The cache is shared by every Mapping
+    #   Operator evaluated against this Data Frame. It holds activations over
+    #   the whole Data Frame, so it is bypassed when evaluation is not batched,
+    #   when a fitness sample is set and when the Data Frame is evaluated in
+    #   chunks. See isActivationCacheActive().
+    # --------------------------------------------------------------------------
+    def evaluateMappingOperatorFromActivationCache(self, mappingOperator) :
+
+        backend = Backend.getBackend()
+        backingTensor = mappingOperator.getBackingTensor()
+        backingTensorBiases = mappingOperator.getBackingTensorBiases()
+        prefixFingerprints = ActivationCache.computePrefixFingerprints(backingTensor, backingTensorBiases)
+
+        # Find the deepest hidden layer whose activations are cached
+        resultantMappingOperationProducts = None
+        startLayer = 0
+        for i in reversed(range(len(backingTensor) - 1)) :
+            cachedActivations = self.activationCache.lookup(prefixFingerprints[i])
+            if cachedActivations is not None :
+                resultantMappingOperationProducts = cachedActivations
+                startLayer = i + 1
+                break
+
+        # Run the remaining layers, caching the hidden activations
+        for i in range(startLayer, len(backingTensor)) :
+            if i == 0 :
+                resultantMappingOperationProducts = backend.leaky_relu(backend.add(backend.multiply(self.stimulusMatrix, backingTensor[0]), backingTensorBiases[0]))
+            else :
+                resultantMappingOperationProducts = backend.leaky_relu(backend.add(backend.tensordot(resultantMappingOperationProducts, backingTensor[i], axes = [[2], [0]]), backingTensorBiases[i]))
+            if i < len(backingTensor) - 1 :
+                self.activationCache.store(prefixFingerprints[i], resultantMappingOperationProducts)
+
+        # Sum the absolute error over every value of every product vector
+        sumOfErrors = float(backend.reduce_sum(backend.abs(backend.subtract(self.productMatrix, resultantMappingOperationProducts))))
+        mappingOperator.setFitness(sumOfErrors)
+
+    # Returns the compiled evaluator of the backend for the shape of the given backing tensor, or None if there is not one
+    def getCompiledEvaluator(self, backingTensor, backingTensorBiases) :
+
+        if not self.compiledForwardPass or len(backingTensor) == 0 or len(backingTensor) != len(backingTensorBiases) :
+            return None
+
+        # Compiled evaluators are built for N X N hidden layers and an N X 1 output layer
+        productVectorSize = self.productVectorSize
+        for i in range(len(backingTensor)) :
+            expectedShape = (productVectorSize, productVectorSize) if i < len(backingTensor) - 1 else (productVectorSize, 1)
+            if tuple(np.shape(backingTensor[i])) != expectedShape :
+                return None
+
+        return Backend.getBackend().getCompiledEvaluator(len(backingTensor), productVectorSize)
+
+    # Whether evaluations run through the activation cache: only when it is enabled and every pair is
+    # evaluated in one unsampled batch, which is what the cached activations cover
+    def isActivationCacheActive(self) :
+        if self.activationCache is None or not self.batchedEvaluation or self.sampleIndices is not None :
+            return False
+        return self.evaluationChunkSize <= 0 or self.evaluationChunkSize >= len(self.stimulusVector)
+
+    # Sets the number of bytes of activations the activation cache may hold. 0 disables it.
+    def setActivationCacheBudget(self, activationCacheBudget) :
+        self.activationCacheBudget = activationCacheBudget
+        if activationCacheBudget > 0 :
+            self.activationCache = ActivationCache(activationCacheBudget)
+        else :
+            self.activationCache = None
+
+    # Drops every cached activation. Called whenever the Stimulus-Product pairs change.
+    def clearActivationCache(self) :
+        if self.activationCache is not None :
+            self.activationCache.clear()
+
+    # Function:
+    # --------- 
+    #   evaluateMappingOperators()
+    # --------------------------------------------------------------------------
+    # Description:
+    # ------------
+    #   Evaluates a whole set of Mapping Operators, scoring the ones that share
+    #   a backing tensor shape together in one batched forward pass.
+    # --------------------------------------------------------------------------
+    # Parameters:
+    # -----------
+    #   mappingOperators - The Mapping Operators to be evaluated
+    # --------------------------------------------------------------------------
+    # Result:
+    # --------
+    #   Every given Mapping Operator has been evaluated against the data
+    #   contained within this DataFrame.
+    # --------------------------------------------------------------------------
+    # Explanation:
+    # ------------
+    #   When the topological mutation rate is zero every Mapping Operator in the
+    #   population has the same depth, so their backing tensors can be stacked
+    #   along a new population dimension and run as one network. The Mapping
+    #   Operators are grouped by the shapes of their layers. Each group of two
+    #   or more is scored with evaluateMappingOperatorGroup() and anything left
+    #   on its own, or with a malformed backing tensor, falls back to
+    #   evaluateMappingOperator().
+    #
+    #   When the activation cache is in use every Mapping Operator is evaluated
+    #   on its own instead, so that each one can pick up where the cached
+    #   activations of its leading layers leave off.
+    # --------------------------------------------------------------------------
+    def evaluateMappingOperators(self, mappingOperators) :
+
+        if self.isActivationCacheActive() :
+            for mappingOperator in mappingOperators :
+                self.evaluateMappingOperator(mappingOperator)
+            return
+
+        # Group the Mapping Operators by the shape of their backing tensors
+        groups = {}
+        for mappingOperator in mappingOperators :
+            signature = self.getBackingTensorSignature(mappingOperator)
+            if signature not in groups :
+                groups[signature] = []
+            groups[signature].append(mappingOperator)
+
+        # Score each group
+        for signature, group in groups.items() :
+            if signature is None or len(group) == 1 :
+                for mappingOperator in group :
+                    self.evaluateMappingOperator(mappingOperator)
+            else :
+                self.evaluateMappingOperatorGroup(group)
+
+    # Function:
+    # --------- 
+    #   evaluateMappingOperatorGroup()
+    # --------------------------------------------------------------------------
+    # Description:
+    # ------------
+    #   Evaluates a group of Mapping Operators whose backing tensors all have
+    #   the same shape in a single batched forward pass.
+    # --------------------------------------------------------------------------
+    # Parameters:
+    # -----------
+    #   mappingOperators - The Mapping Operators to be evaluated. Their backing
+    #                      tensors must share the same layer shapes.
+    # --------------------------------------------------------------------------
+    # Result:
+    # --------
+    #   Every given Mapping Operator has been evaluated against the data
+    #   contained within this DataFrame.
+    # --------------------------------------------------------------------------
+    # Explanation:
+    # ------------
+    #   Layer i of every Mapping Operator is stacked into a [group, rows, cols]
+    #   tensor and the biases into a [group, depth] tensor. Together the stacked
+    #   layers make up the [group, depth, N, N] backing tensor of the whole group
+    #   (the output layer is kept apart since it is N X 1). The batched stimulus
+    #   matrix is broadcast over the group so each layer is one batched matmul
+    #   producing [group, pairs, N, N] activations, and the error is reduced
+    #   per Mapping Operator in one call. The Data Frame is walked in chunks
+    #   just like in evaluateMappingOperatorBatched().
+    # --------------------------------------------------------------------------
+    def evaluateMappingOperatorGroup(self, mappingOperators) :
+
+        backend = Backend.getBackend()
+        depth = len(mappingOperators[0].getBackingTensor())
+
+        # Stack the backing tensors and biases of the group. Compact genomes are
+        # stacked buffer by buffer and then sliced into layers.
+        stackedBackingTensor = []
+        if all(mappingOperator.compactGenome for mappingOperator in mappingOperators) :
+            stackedBuffer = np.stack([mappingOperator.getGenome().getBuffer() for mappingOperator in mappingOperators])
+            layerOffsets = mappingOperators[0].getGenome().getLayerOffsets()
+            layerShapes = mappingOperators[0].getGenome().getLayerShapes()
+            for i in range(depth) :
+                stackedBackingTensor.append(stackedBuffer[:, layerOffsets[i]:layerOffsets[i + 1]].reshape((len(mappingOperators),) + layerShapes[i]))
+        else :
+            for i in range(depth) :
+                stackedBackingTensor.append(backend.stack([mappingOperator.getBackingTensor()[i] for mappingOperator in mappingOperators]))
+        stackedBiases = backend.convert_to_tensor([list(mappingOperator.getBackingTensorBiases()) for mappingOperator in mappingOperators], dtype = backend.float32)
+
+        sumsOfErrors = np.zeros(len(mappingOperators), dtype = np.float64)
+        for stimulusChunk, productChunk in self.iterateChunks() :
+
+            # Feed every stimulus in the chunk into the first layer of every Mapping Operator
+            groupBiases = backend.reshape(stackedBiases[:, 0], [len(mappingOperators), 1, 1, 1])
+            resultantMappingOperationProducts = backend.leaky_relu(backend.add(backend.multiply(backend.expand_dims(stimulusChunk, 0), backend.expand_dims(stackedBackingTensor[0], 1)), groupBiases))
+
+            # Push the batch through the rest of the layers
+            for i in range(1, depth) :
+                groupBiases = backend.reshape(stackedBiases[:, i], [len(mappingOperators), 1, 1, 1])
+                resultantMappingOperationProducts = backend.leaky_relu(backend.add(backend.einsum('gpij,gjk->gpik', resultantMappingOperationProducts, stackedBackingTensor[i]), groupBiases))
+
+            # Sum the absolute error of each Mapping Operator over the chunk
+            sumsOfErrors = sumsOfErrors + backend.toNumpy(backend.reduce_sum(backend.abs(backend.subtract(backend.expand_dims(productChunk, 0), resultantMappingOperationProducts)), axis = [1, 2, 3]))
+
+        sumsOfErrors = sumsOfErrors * self.getSampleScale()
+        for i in range(len(mappingOperators)) :
+            mappingOperators[i].setFitness(float(sumsOfErrors[i]))
+
+    # Function:
+    # --------- 
+    #   iterateChunks()
+    # --------------------------------------------------------------------------
+    # Description:
+    # ------------
+    #   Walks the Stimulus-Product pairs of the Data Frame in fixed size chunks.
+    # --------------------------------------------------------------------------
+    # Parameters:
+    # -----------
+    #   None
+    # --------------------------------------------------------------------------
+    # Returns:
+    # --------
+    #   An iterator of (stimulus chunk, product chunk) pairs shaped
+    #   [chunk, 1, 1] and [chunk, N, 1].
+    # --------------------------------------------------------------------------
+    # Explanation:
+    # ------------
+    #   The batched evaluations only ever hold one chunk of activations at a
+    #   time, so their peak memory is bounded by evaluationChunkSize rather than
+    #   by the size of the Data Frame. When the Data Frame is memory mapped from
+    #   a file the chunks are slices of the mapping and each one is only read
+    #   from disk when it is evaluated. A chunk size of zero walks the whole
+    #   Data Frame as a single chunk.
+    # --------------------------------------------------------------------------
+    def iterateChunks(self) :
+
+        # Walk only the sampled pairs if there is a sample
+        if self.sampleIndices is not None :
+            chunkSize = self.evaluationChunkSize if self.evaluationChunkSize > 0 else len(self.sampleIndices)
+            for chunkStart in range(0, len(self.sampleIndices), chunkSize) :
+                chunkIndices = self.sampleIndices[chunkStart:chunkStart + chunkSize]
+                yield DataFrame.takePairs(self.stimulusMatrix, chunkIndices), DataFrame.takePairs(self.productMatrix, chunkIndices)
+            return
+
+        pairCount = len(self.stimulusVector)
+        chunkSize = self.evaluationChunkSize
+        if chunkSize <= 0 or chunkSize >= pairCount :
+            yield self.stimulusMatrix, self.productMatrix
+            return
+
+        for chunkStart in range(0, pairCount, chunkSize) :
+            yield self.stimulusMatrix[chunkStart:chunkStart + chunkSize], self.productMatrix[chunkStart:chunkStart + chunkSize]
+
+    # Takes the given pairs out of a stimulus or product matrix
+    @staticmethod
+    def takePairs(matrix, pairIndices) :
+        if isinstance(matrix, np.ndarray) :
+            return matrix[pairIndices]
+        return Backend.getBackend().gather(matrix, pairIndices)
+
+    # Function:
+    # --------- 
+    #   setSample()
+    # --------------------------------------------------------------------------
+    # Description:
+    # ------------
+    #   Restricts evaluation to a subset of the Stimulus-Product pairs.
+    # --------------------------------------------------------------------------
+    # Parameters:
+    # -----------
+    #   sampleIndices - The indices of the pairs to evaluate against, or None
+    #                   to evaluate against every pair again
+    # --------------------------------------------------------------------------
+    # Explanation:
+    # ------------
+    #   While a sample is set every evaluation only runs the sampled pairs and
+    #   scales the error up by pairs / sample size. The fitness is then an
+    #   unbiased estimate of the error over the whole Data Frame and can be
+    #   compared against fitnesses scored on every pair. The indices are kept
+    #   sorted so a memory mapped Data Frame is read front to back.
+    # --------------------------------------------------------------------------
+    def setSample(self, sampleIndices) :
+        if sampleIndices is None :
+            self.sampleIndices = None
+        else :
+            self.sampleIndices = np.sort(np.asarray(sampleIndices, dtype = np.int64))
+
+    # Returns the indices of the pairs that evaluations run against
+    def getPairIndices(self) :
+        if self.sampleIndices is not None :
+            return self.sampleIndices
+        return range(len(self.stimulusVector))
+
+    # Returns how much a sampled error is scaled up to estimate the error over every pair
+    def getSampleScale(self) :
+        if self.sampleIndices is None or len(self.sampleIndices) == 0 :
+            return 1.0
+        return len(self.stimulusVector) / len(self.sampleIndices)
+
+    # Returns the shapes of the layers of a Mapping Operator's backing tensor, or
+    # None if the backing tensor and biases do not line up
+    def getBackingTensorSignature(self, mappingOperator) :
 
-        tf.enable_eager_execution()
+        backingTensor = mappingOperator.getBackingTensor()
+        if len(backingTensor) == 0 or len(backingTensor) != len(mappingOperator.getBackingTensorBiases()) :
+            return None
+
+        return tuple(tuple(layer.shape) for layer in backingTensor)
+
+    def evaluateFinalMappingOperator(self, finalMappingOperator) :
 
+        backend = Backend.getBackend()
         numberOfIncorrectValues = 0
 
         backingTensor = finalMappingOperator.getBackingTensor()
@@ -177,12 +658,12 @@ class DataFrame :
             productVector = self.productVectors[pairIndex]
 
             # Run the neural network
-            resultantMappingOperationProduct = tf.nn.leaky_relu(tf.add(tf.scalar_mul(stimulus, backingTensor[0]), backingTensorBiases[0]))
+            resultantMappingOperationProduct = backend.leaky_relu(backend.add(backend.scalar_mul(stimulus, backingTensor[0]), backingTensorBiases[0]))
             for i in range(1, len(backingTensor)) :
-                resultantMappingOperationProduct = tf.nn.leaky_relu(tf.add(tf.matmul(resultantMappingOperationProduct, backingTensor[i]), backingTensorBiases[i]))
+                resultantMappingOperationProduct = backend.leaky_relu(backend.add(backend.matmul(resultantMappingOperationProduct, backingTensor[i]), backingTensorBiases[i]))
 
-            productVector = productVector.numpy()
-            resultantProductValues = resultantMappingOperationProduct.numpy()
+            productVector = np.asarray(productVector)
+            resultantProductValues = backend.toNumpy(resultantMappingOperationProduct)
             
             # Detect differences between the vector values
             for valueIndex in range(len(productVector)) :
@@ -193,6 +674,9 @@ class DataFrame :
     
     def generateRandomDataFrame(self) :
 
+        self.stimulusVector = []
+        self.productVectors = []
+
         # Generate the stimuli
         stimulusValue = 1
         for i in range(self.stimulusProductPairCount) :
@@ -204,17 +688,280 @@ class DataFrame :
             stimulusValue = stimulusValue + 1
 
         # Generate the product vectors
+        backend = Backend.getBackend()
         for i in range(self.stimulusProductPairCount) :
-            self.productVectors.append(tf.random.uniform([self.productVectorSize, 1], minval = self.productValueLow, maxval = self.productValueHigh))
+            self.productVectors.append(backend.convert_to_tensor(self.randomGenerator.uniform(self.productValueLow, self.productValueHigh, (self.productVectorSize, 1)).astype(np.float32)))
+
+        self.stackDataFrame()
+
+    # Replaces the Stimulus-Product pairs with the given stimuli and [pairs, N, 1] product vectors
+    def setDataFrame(self, stimuli, products) :
+        backend = Backend.getBackend()
+        self.stimulusProductPairCount = len(stimuli)
+        self.productVectorSize = products.shape[1]
+        self.stimulusVector = [float(stimulus) for stimulus in stimuli]
+        self.productVectors = [backend.convert_to_tensor(productVector) for productVector in products]
+        self.stackDataFrame()
+
+    # Stacks the stimulus vector and product vectors into the batched Data Frame
+    def stackDataFrame(self) :
+        backend = Backend.getBackend()
+        self.stimulusMatrix = backend.reshape(backend.convert_to_tensor(self.stimulusVector, dtype = backend.float32), [len(self.stimulusVector), 1, 1])
+        self.productMatrix = backend.stack(self.productVectors)
+        self.clearActivationCache()
+
+    # Function:
+    # --------- 
+    #   shareDataFrame()
+    # --------------------------------------------------------------------------
+    # Description:
+    # ------------
+    #   Places the stimuli and product vectors of this Data Frame in a shared
+    #   memory block that other processes can attach to.
+    # --------------------------------------------------------------------------
+    # Parameters:
+    # -----------
+    #   None
+    # --------------------------------------------------------------------------
+    # Returns:
+    # --------
+    #   A small descriptor of the shared memory block that can be handed to
+    #   attachSharedDataFrame() in another process.
+    # --------------------------------------------------------------------------
+    # Explanation:
+    # ------------
+    #   The block holds the stimuli as float32 values followed by the product
+    #   vectors as a contiguous [pairs, N] float32 block. Evaluator processes
+    #   attach to it read only instead of being sent a pickled copy of the
+    #   Data Frame, so the cost of starting a worker does not grow with the
+    #   size of the data and every worker reads the same physical memory.
+    #   The block must be released with releaseSharedDataFrame().
+    #
+    #   A Data Frame that was loaded from a file is already on disk, so no
+    #   block is made and the other processes map the same file instead.
+    # --------------------------------------------------------------------------
+    def shareDataFrame(self) :
+
+        # A Data Frame loaded from a file is shared by mapping the same file
+        if self.dataFrameFilePath is not None :
+            return {
+                'filePath' : self.dataFrameFilePath,
+                'batchedEvaluation' : self.batchedEvaluation,
+                'evaluationChunkSize' : self.evaluationChunkSize,
+                'activationCacheBudget' : self.activationCacheBudget,
+                'compiledForwardPass' : self.compiledForwardPass,
+                'computeBackend' : Backend.getBackend().name
+            }
+
+        stimuli = np.asarray(self.stimulusVector, dtype = np.float32)
+        products = np.asarray(self.productMatrix, dtype = np.float32).reshape(len(stimuli), self.productVectorSize)
+
+        # Copy the data into a new shared memory block
+        self.sharedMemoryBlock = shared_memory.SharedMemory(create = True, size = max(1, stimuli.nbytes + products.nbytes))
+        sharedStimuli, sharedProducts = DataFrame.viewSharedMemoryBlock(self.sharedMemoryBlock, len(stimuli), self.productVectorSize)
+        sharedStimuli[:] = stimuli
+        sharedProducts[:] = products
+
+        return {
+            'name' : self.sharedMemoryBlock.name,
+            'stimulusProductPairCount' : len(stimuli),
+            'productVectorSize' : self.productVectorSize,
+            'batchedEvaluation' : self.batchedEvaluation,
+            'evaluationChunkSize' : self.evaluationChunkSize,
+            'activationCacheBudget' : self.activationCacheBudget,
+            'compiledForwardPass' : self.compiledForwardPass,
+            'computeBackend' : Backend.getBackend().name
+        }
+
+    # Frees the shared memory block created by shareDataFrame()
+    def releaseSharedDataFrame(self) :
+        if self.sharedMemoryBlock is not None :
+            self.sharedMemoryBlock.close()
+            self.sharedMemoryBlock.unlink()
+            self.sharedMemoryBlock = None
 
+    # Function:
+    # --------- 
+    #   attachSharedDataFrame()
+    # --------------------------------------------------------------------------
+    # Description:
+    # ------------
+    #   Builds a Data Frame in this process on top of a shared memory block
+    #   created by shareDataFrame() in another process.
+    # --------------------------------------------------------------------------
+    # Parameters:
+    # -----------
+    #   descriptor - The descriptor returned by shareDataFrame()
+    # --------------------------------------------------------------------------
+    # Returns:
+    # --------
+    #   A Data Frame whose stimuli and product vectors are read only views of
+    #   the shared memory block. Nothing is copied.
+    # --------------------------------------------------------------------------
+    @staticmethod
+    def attachSharedDataFrame(descriptor) :
+
+        Backend.selectBackend(descriptor['computeBackend'])
+
+        dataFrame = DataFrame.__new__(DataFrame)
+        dataFrame.batchedEvaluation = descriptor['batchedEvaluation']
+        dataFrame.evaluationChunkSize = descriptor['evaluationChunkSize']
+        dataFrame.compiledForwardPass = descriptor['compiledForwardPass']
+        dataFrame.setActivationCacheBudget(descriptor['activationCacheBudget'])
+
+        if 'filePath' in descriptor :
+            dataFrame.loadDataFrameFromFile(descriptor['filePath'])
+            return dataFrame
+
+        dataFrame.stimulusProductPairCount = descriptor['stimulusProductPairCount']
+        dataFrame.productVectorSize = descriptor['productVectorSize']
+
+        # Attach to the block and view the data in place. The attached block is
+        # kept on the Data Frame so the views stay valid.
+        dataFrame.sharedMemoryBlock = shared_memory.SharedMemory(name = descriptor['name'])
+        stimuli, products = DataFrame.viewSharedMemoryBlock(dataFrame.sharedMemoryBlock, dataFrame.stimulusProductPairCount, dataFrame.productVectorSize)
+        stimuli.flags.writeable = False
+        products.flags.writeable = False
+
+        dataFrame.stimulusVector = stimuli
+        dataFrame.productVectors = products.reshape(dataFrame.stimulusProductPairCount, dataFrame.productVectorSize, 1)
+        dataFrame.stimulusMatrix = stimuli.reshape(dataFrame.stimulusProductPairCount, 1, 1)
+        dataFrame.productMatrix = dataFrame.productVectors
+
+        return dataFrame
+
+    # Returns NumPy views of the stimuli and product vectors held in a shared memory block
+    @staticmethod
+    def viewSharedMemoryBlock(sharedMemoryBlock, stimulusProductPairCount, productVectorSize) :
+        stimuli = np.ndarray((stimulusProductPairCount,), dtype = np.float32, buffer = sharedMemoryBlock.buf)
+        products = np.ndarray((stimulusProductPairCount, productVectorSize), dtype = np.float32, buffer = sharedMemoryBlock.buf, offset = stimuli.nbytes)
+        return stimuli, products
+
+    # Function:
+    # ---------
+    #   packDataFrame()
+    # --------------------------------------------------------------------------
+    # Description:
+    # ------------
+    #   Packs the Stimulus-Product pairs and evaluation settings of this Data
+    #   Frame so they can be sent to another machine.
+    # --------------------------------------------------------------------------
+    # Returns:
+    # --------
+    #   A dictionary of plain NumPy arrays and values that can be handed to
+    #   unpackDataFrame() on the other side. Unlike shareDataFrame() the data
+    #   itself is in it, so the receiver does not need this machine's memory
+    #   or files.
+    # --------------------------------------------------------------------------
+    def packDataFrame(self) :
+        stimuli = np.asarray(self.stimulusVector, dtype = np.float32)
+        return {
+            'stimuli' : stimuli,
+            'products' : np.asarray(self.productMatrix, dtype = np.float32).reshape(len(stimuli), self.productVectorSize),
+            'batchedEvaluation' : self.batchedEvaluation,
+            'evaluationChunkSize' : self.evaluationChunkSize,
+            'activationCacheBudget' : self.activationCacheBudget,
+            'compiledForwardPass' : self.compiledForwardPass,
+            'computeBackend' : Backend.getBackend().name
+        }
+
+    # Builds a Data Frame in this process from the dictionary returned by packDataFrame()
+    @staticmethod
+    def unpackDataFrame(packedDataFrame) :
+
+        Backend.selectBackend(packedDataFrame['computeBackend'])
+
+        dataFrame = DataFrame.__new__(DataFrame)
+        dataFrame.batchedEvaluation = packedDataFrame['batchedEvaluation']
+        dataFrame.evaluationChunkSize = packedDataFrame['evaluationChunkSize']
+        dataFrame.compiledForwardPass = packedDataFrame['compiledForwardPass']
+        dataFrame.setActivationCacheBudget(packedDataFrame['activationCacheBudget'])
+
+        products = packedDataFrame['products']
+        dataFrame.setDataFrame(packedDataFrame['stimuli'], products.reshape(products.shape[0], products.shape[1], 1))
+
+        return dataFrame
+
+    # Function:
+    # --------- 
+    #   loadDataFrameFromFile()
+    # --------------------------------------------------------------------------
+    # Description:
+    # ------------
+    #   Loads the Stimulus-Product pairs from a Data Frame file.
+    # --------------------------------------------------------------------------
+    # Parameters:
+    # -----------
+    #   filePath - The path of a file written by writeDataToFile()
+    # --------------------------------------------------------------------------
+    # Result:
+    # --------
+    #   The stimuli and product vectors of this Data Frame are read only
+    #   memory mapped views of the file. See the file format above.
+    # --------------------------------------------------------------------------
     def loadDataFrameFromFile(self, filePath) :
-        return 0
-        #Implement Me
 
+        # Read and check the header
+        with open(filePath, 'rb') as dataFrameFile :
+            header = dataFrameFile.read(self.dataFrameFileHeaderSize)
+        if len(header) < self.dataFrameFileHeaderSize :
+            raise ValueError("The Data Frame file " + str(filePath) + " is too short to hold a header")
+
+        magic, version, headerSize, stimulusProductPairCount, productVectorSize, productVectorOffset = struct.unpack_from(self.dataFrameFileHeaderFormat, header)
+        if magic != self.dataFrameFileMagic :
+            raise ValueError("The file " + str(filePath) + " is not a Data Frame file")
+        if version != self.dataFrameFileVersion :
+            raise ValueError("The Data Frame file " + str(filePath) + " has unsupported version " + str(version))
+
+        self.dataFrameFilePath = filePath
+        self.stimulusProductPairCount = stimulusProductPairCount
+        self.productVectorSize = productVectorSize
+
+        # Map the stimuli and product vectors
+        stimuli = np.memmap(filePath, dtype = np.float32, mode = 'r', offset = headerSize, shape = (stimulusProductPairCount,))
+        products = np.memmap(filePath, dtype = np.float32, mode = 'r', offset = productVectorOffset, shape = (stimulusProductPairCount, productVectorSize, 1))
+
+        self.stimulusVector = stimuli
+        self.productVectors = products
+        self.stimulusMatrix = stimuli.reshape(stimulusProductPairCount, 1, 1)
+        self.productMatrix = products
+        self.clearActivationCache()
+
+    # Function:
+    # --------- 
+    #   writeDataToFile()
+    # --------------------------------------------------------------------------
+    # Description:
+    # ------------
+    #   Writes the Stimulus-Product pairs to a Data Frame file.
+    # --------------------------------------------------------------------------
+    # Parameters:
+    # -----------
+    #   filePath - The path of the file to write
+    # --------------------------------------------------------------------------
+    # Result:
+    # --------
+    #   The Data Frame has been written in the file format described above.
+    # --------------------------------------------------------------------------
     def writeDataToFile(self, filePath) :
-        return 0
-        #Implement Me
+
+        stimuli = np.asarray(self.stimulusVector, dtype = np.float32)
+        products = np.asarray(self.productMatrix, dtype = np.float32).reshape(len(stimuli), self.productVectorSize)
+
+        # Start the product vectors on a 64 byte boundary
+        productVectorOffset = -(-(self.dataFrameFileHeaderSize + stimuli.nbytes) // 64) * 64
+
+        header = struct.pack(self.dataFrameFileHeaderFormat, self.dataFrameFileMagic, self.dataFrameFileVersion, self.dataFrameFileHeaderSize, len(stimuli), self.productVectorSize, productVectorOffset)
+
+        with open(filePath, 'wb') as dataFrameFile :
+            dataFrameFile.write(header.ljust(self.dataFrameFileHeaderSize, b"\0"))
+            dataFrameFile.write(stimuli.tobytes())
+            dataFrameFile.write(b"\0" * (productVectorOffset - self.dataFrameFileHeaderSize - stimuli.nbytes))
+            dataFrameFile.write(products.tobytes())
 
     def getProductVectorSize(self) :
         return self.productVectorSize
 
+    def getStimulusProductPairCount(self) :
+        return self.stimulusProductPairCount
+
@@ -0,0 +1,805 @@
+import itertools
+import os
+import queue
+import socket
+import struct
+import threading
+import time
+from collections import deque
+from multiprocessing import Process
+
+import numpy as np
+
+from DataFrame import DataFrame
+from MappingOperator import MappingOperator
+
+# -------------------------------------------------------------
+# File:
+# -----
+#   DistributedEvaluation.py
+# -------------------------------------------------------------
+# Description:
+# ------------
+#   The DistributedEvaluation file contains the
+#   DistributedEvaluator class and the evaluation worker that it
+#   hands Mapping Operators to. Where EvaluatorPool.py is limited
+#   to the cpus of one machine, the distributed evaluator
+#   listens on a socket and any number of workers, on this
+#   machine or others, connect to it and evaluate a share of
+#   every generation:
+#
+#       1. A worker connects and is sent the Data Frame once. It
+#          keeps its own copy for the life of the connection.
+#       2. Every generation the population is split into tasks.
+#          Each task is sent to an idle worker as compact genomes:
+#          one flat float32 buffer, the layer shapes and the biases
+#          per Mapping Operator.
+#       3. The worker sends back (population index, fitness) pairs
+#          and is handed the next task, so faster workers take on
+#          more of the generation.
+#
+#   Workers send a heartbeat every heartbeatInterval seconds, even
+#   while evaluating. A worker that disconnects, or that has not
+#   been heard from for heartbeatTimeout seconds, is dropped and
+#   its task is given to another worker.
+#
+#   Messages are plain numbers laid out with fixed struct
+#   layouts. Nothing received is unpickled or executed. Messages
+#   are not authenticated or encrypted, though, so a coordinator
+#   listens on 127.0.0.1 unless it is given another interface,
+#   and should only be opened to a network its workers trust.
+# -------------------------------------------------------------
+# Addresses:
+# ----------
+#   "port" or ":port" - A TCP socket on 127.0.0.1
+#   "host:port"       - A TCP socket on the given interface. Port
+#                       0 on the coordinator picks a free port
+#   Anything else     - The path of a Unix domain socket
+# -------------------------------------------------------------
+# Messages:
+# ---------
+#   Every message is an 8 byte payload length and a 1 byte
+#   message type followed by the payload. See encodeMessage()
+#   for the layout of each payload. A compact genome is sent as
+#   its population index, its layer shapes, its biases and its
+#   buffer as raw float32 values. Fitnesses come back as
+#   (population index, float64) pairs.
+#
+#   Worker to coordinator:
+#       ('hello', host name, process id)
+#       ('heartbeat',)
+#       ('result', task id, [(population index, fitness), ...])
+#       ('rejected', task id, reason)
+#
+#   A worker rejects a task that is framed correctly but cannot
+#   be evaluated, such as a genome whose layer shapes do not
+#   chain or do not add up to its buffer, or a sample index past
+#   the end of the Data Frame. It stays connected for the next
+#   task. The coordinator built the task itself, so it fails the
+#   evaluation rather than handing the task to another worker.
+#
+#   Coordinator to worker:
+#       ('welcome', packed Data Frame, tensorized evaluation, heartbeat interval)
+#       ('evaluate', task id, sample indices, [(population index, compact genome), ...])
+#       ('stop',)
+# -------------------------------------------------------------
+
+# Message Types
+# -------------
+HELLO = 1
+HEARTBEAT = 2
+RESULT = 3
+WELCOME = 4
+EVALUATE = 5
+STOP = 6
+REJECTED = 7
+messageNames = {HELLO : 'hello', HEARTBEAT : 'heartbeat', RESULT : 'result', WELCOME : 'welcome', EVALUATE : 'evaluate', STOP : 'stop', REJECTED : 'rejected'}
+messageTypes = {name : messageType for messageType, name in messageNames.items()}
+
+# Message Layouts
+# ---------------
+#   Every field is big endian. Arrays follow their fields as raw little
+#   endian values.
+messageHeader = struct.Struct("!QB") # Payload length, message type
+helloFields = struct.Struct("!QH") # Process id, host name length
+resultFields = struct.Struct("!QI") # Task id, fitness count
+resultPair = struct.Struct("!Qd") # Population index, fitness
+welcomeFields = struct.Struct("!???dQQQQH") # Batched, compiled, tensorized, heartbeat interval, chunk size, activation cache budget, pairs, N, backend name length
+evaluateFields = struct.Struct("!Q?I") # Task id, has a sample, genome count
+sampleFields = struct.Struct("!Q") # Sample size
+genomeFields = struct.Struct("!QIQ") # Population index, layer count, buffer length
+rejectedFields = struct.Struct("!QH") # Task id, reason length
+
+# The largest message accepted. A longer length prefix is treated as a broken connection.
+maximumMessageLength = 1 << 34
+
+# The error raised for a message that does not follow the layouts above
+class ProtocolError(ConnectionError) :
+    pass
+
+# The error raised for an evaluate message that is framed correctly but holds a task that cannot be evaluated
+class TaskError(ProtocolError) :
+
+    def __init__(self, taskId, reason) :
+        super().__init__(reason)
+        self.taskId = taskId
+
+# Reads fields and arrays from the payload of a message in order
+class PayloadReader :
+
+    def __init__(self, payload) :
+        self.payload = payload
+        self.offset = 0
+
+    def readFields(self, fields) :
+        if self.offset + fields.size > len(self.payload) :
+            raise ProtocolError("The message is too short")
+        values = fields.unpack_from(self.payload, self.offset)
+        self.offset = self.offset + fields.size
+        return values
+
+    def readBytes(self, byteCount) :
+        if self.offset + byteCount > len(self.payload) :
+            raise ProtocolError("The message is too short")
+        value = self.payload[self.offset:self.offset + byteCount]
+        self.offset = self.offset + byteCount
+        return value
+
+    # Reads a little endian array and returns it in the native byte order
+    def readArray(self, dtype, count) :
+        dtype = np.dtype(dtype)
+        return np.frombuffer(self.readBytes(dtype.itemsize * count), dtype = dtype.newbyteorder('<')).astype(dtype)
+
+    def finish(self) :
+        if self.offset != len(self.payload) :
+            raise ProtocolError("The message has trailing bytes")
+
+# Returns the raw little endian bytes of an array
+def arrayBytes(array, dtype) :
+    return np.ascontiguousarray(array, dtype = np.dtype(dtype).newbyteorder('<')).tobytes()
+
+# Function:
+# ---------
+#   encodeMessage()
+# --------------------------------------------------------------------------
+# Description:
+# ------------
+#   Lays a message tuple out as a message type and a payload of bytes. See
+#   the Messages section above for the tuples.
+# --------------------------------------------------------------------------
+def encodeMessage(message) :
+
+    messageType = messageTypes[message[0]]
+    if messageType == HELLO :
+        hostName = message[1].encode('utf-8')
+        return messageType, helloFields.pack(message[2], len(hostName)) + hostName
+
+    if messageType == REJECTED :
+        reason = message[2].encode('utf-8')[:65535]
+        return messageType, rejectedFields.pack(message[1], len(reason)) + reason
+
+    if messageType == RESULT :
+        taskId, indexedFitnesses = message[1], message[2]
+        return messageType, resultFields.pack(taskId, len(indexedFitnesses)) + b"".join(resultPair.pack(populationIndex, fitness) for populationIndex, fitness in indexedFitnesses)
+
+    if messageType == WELCOME :
+        packedDataFrame, tensorizedPopulationEvaluation, heartbeatInterval = message[1], message[2], message[3]
+        stimuli = packedDataFrame['stimuli']
+        products = packedDataFrame['products']
+        backendName = packedDataFrame['computeBackend'].encode('utf-8')
+        return messageType, b"".join((
+            welcomeFields.pack(packedDataFrame['batchedEvaluation'], packedDataFrame['compiledForwardPass'], tensorizedPopulationEvaluation, heartbeatInterval,
+                               int(packedDataFrame['evaluationChunkSize']), int(packedDataFrame['activationCacheBudget']), len(stimuli), products.shape[1], len(backendName)),
+            backendName,
+            arrayBytes(stimuli, np.float32),
+            arrayBytes(products, np.float32)))
+
+    if messageType == EVALUATE :
+        taskId, sampleIndices, indexedGenomes = message[1], message[2], message[3]
+        parts = [evaluateFields.pack(taskId, sampleIndices is not None, len(indexedGenomes))]
+        if sampleIndices is not None :
+            parts.append(sampleFields.pack(len(sampleIndices)))
+            parts.append(arrayBytes(sampleIndices, np.int64))
+        for populationIndex, (buffer, layerShapes, biases) in indexedGenomes :
+            parts.append(genomeFields.pack(populationIndex, len(layerShapes), len(buffer)))
+            parts.append(arrayBytes(np.array(layerShapes, dtype = np.uint32).reshape(-1), np.uint32))
+            parts.append(arrayBytes(biases, np.float32))
+            parts.append(arrayBytes(buffer, np.float32))
+        return messageType, b"".join(parts)
+
+    # Heartbeat and stop carry nothing
+    return messageType, b""
+
+# Function:
+# ---------
+#   decodeMessage()
+# --------------------------------------------------------------------------
+# Description:
+# ------------
+#   Turns a message type and payload laid out by encodeMessage() back into
+#   the message tuple.
+# --------------------------------------------------------------------------
+# Explanation:
+# ------------
+#   Nothing in a message is ever executed or used to build objects of an
+#   arbitrary type. Each field is read with a fixed layout and each array
+#   as plain numbers, and a message that does not match its layout raises
+#   a ProtocolError, which is handled like a dropped connection. An evaluate
+#   message whose task id can be read but whose genomes are inconsistent
+#   raises a TaskError instead, so the worker can reject the task and carry
+#   on. See checkGenome().
+# --------------------------------------------------------------------------
+def decodeMessage(messageType, payload) :
+
+    reader = PayloadReader(payload)
+    if messageType == HELLO :
+        processId, hostNameLength = reader.readFields(helloFields)
+        message = ('hello', reader.readBytes(hostNameLength).decode('utf-8', 'replace'), processId)
+
+    elif messageType == RESULT :
+        taskId, fitnessCount = reader.readFields(resultFields)
+        message = ('result', taskId, [reader.readFields(resultPair) for i in range(fitnessCount)])
+
+    elif messageType == WELCOME :
+        batchedEvaluation, compiledForwardPass, tensorizedPopulationEvaluation, heartbeatInterval, evaluationChunkSize, activationCacheBudget, pairCount, productVectorSize, backendNameLength = reader.readFields(welcomeFields)
+        packedDataFrame = {
+            'computeBackend' : reader.readBytes(backendNameLength).decode('utf-8'),
+            'stimuli' : reader.readArray(np.float32, pairCount),
+            'products' : reader.readArray(np.float32, pairCount * productVectorSize).reshape(pairCount, productVectorSize),
+            'batchedEvaluation' : batchedEvaluation,
+            'evaluationChunkSize' : evaluationChunkSize,
+            'activationCacheBudget' : activationCacheBudget,
+            'compiledForwardPass' : compiledForwardPass
+        }
+        message = ('welcome', packedDataFrame, tensorizedPopulationEvaluation, heartbeatInterval)
+
+    elif messageType == REJECTED :
+        taskId, reasonLength = reader.readFields(rejectedFields)
+        message = ('rejected', taskId, reader.readBytes(reasonLength).decode('utf-8', 'replace'))
+
+    elif messageType == EVALUATE :
+        taskId, hasSample, genomeCount = reader.readFields(evaluateFields)
+
+        # The frame holds the whole message, so a task that cannot be read leaves the stream intact
+        try :
+            sampleIndices = None
+            if hasSample :
+                sampleSize, = reader.readFields(sampleFields)
+                sampleIndices = reader.readArray(np.int64, sampleSize)
+            indexedGenomes = []
+            for i in range(genomeCount) :
+                populationIndex, layerCount, bufferLength = reader.readFields(genomeFields)
+                layerShapes = [tuple(int(dimension) for dimension in layerShape) for layerShape in reader.readArray(np.uint32, 2 * layerCount).reshape(layerCount, 2)]
+                biases = reader.readArray(np.float32, layerCount)
+                buffer = reader.readArray(np.float32, bufferLength)
+                checkGenome(layerShapes, buffer)
+                indexedGenomes.append((populationIndex, (buffer, layerShapes, biases)))
+            reader.finish()
+        except ProtocolError as error :
+            raise TaskError(taskId, str(error))
+        message = ('evaluate', taskId, sampleIndices, indexedGenomes)
+
+    elif messageType in (HEARTBEAT, STOP) :
+        message = (messageNames[messageType],)
+
+    else :
+        raise ProtocolError("Unknown message type " + str(messageType))
+
+    reader.finish()
+    return message
+
+# Raises a ProtocolError unless the layer shapes of a genome make up a network that can be run: every
+# layer takes the columns of the one before it as rows, the last has a single column, and together they
+# fill the buffer exactly
+def checkGenome(layerShapes, buffer) :
+    if len(layerShapes) == 0 :
+        raise ProtocolError("A genome has no layers")
+    for i in range(len(layerShapes)) :
+        rows, columns = layerShapes[i]
+        if rows == 0 or columns == 0 :
+            raise ProtocolError("A genome has an empty layer")
+        if i > 0 and rows != layerShapes[i - 1][1] :
+            raise ProtocolError("A genome's layer shapes do not chain")
+    if layerShapes[-1][1] != 1 :
+        raise ProtocolError("A genome's last layer has more than one column")
+    if sum(rows * columns for rows, columns in layerShapes) != len(buffer) :
+        raise ProtocolError("A genome's layer shapes do not match its buffer")
+
+# Raises a TaskError unless a decoded task can be evaluated against the given Data Frame
+def checkTask(dataFrame, taskId, sampleIndices, indexedGenomes) :
+    if sampleIndices is not None and len(sampleIndices) > 0 and (np.min(sampleIndices) < 0 or np.max(sampleIndices) >= dataFrame.getStimulusProductPairCount()) :
+        raise TaskError(taskId, "A sample index is outside the Data Frame")
+    for populationIndex, (buffer, layerShapes, biases) in indexedGenomes :
+        if layerShapes[0][0] != dataFrame.getProductVectorSize() :
+            raise TaskError(taskId, "A genome's first layer does not match the product vector size")
+
+# Sends a message tuple with its length and type in front
+def sendMessage(connection, message) :
+    messageType, payload = encodeMessage(message)
+    connection.sendall(messageHeader.pack(len(payload), messageType) + payload)
+
+# Receives one message sent by sendMessage(). Raises ConnectionError if the other side hung up or broke the protocol.
+def receiveMessage(connection) :
+    payloadLength, messageType = messageHeader.unpack(receiveExactly(connection, messageHeader.size))
+    if payloadLength > maximumMessageLength :
+        raise ProtocolError("The message is too long")
+    return decodeMessage(messageType, receiveExactly(connection, payloadLength))
+
+# Receives exactly the given number of bytes
+def receiveExactly(connection, byteCount) :
+    chunks = []
+    while byteCount > 0 :
+        chunk = connection.recv(min(byteCount, 1 << 20))
+        if len(chunk) == 0 :
+            raise ConnectionError("The connection was closed")
+        chunks.append(chunk)
+        byteCount = byteCount - len(chunk)
+    return b"".join(chunks)
+
+# Returns the socket family and socket address of an address. A bare port, or a "host:port" without the
+# host, is 127.0.0.1 on that port. Anything that is not a port is the path of a Unix domain socket.
+def parseAddress(address) :
+    if address.isdigit() :
+        return socket.AF_INET, ("127.0.0.1", int(address))
+    host, separator, port = address.rpartition(":")
+    if separator != "" and port.isdigit() :
+        return socket.AF_INET, (host or "127.0.0.1", int(port))
+    return socket.AF_UNIX, address
+
+# Packs a Mapping Operator into a compact genome of (buffer, layer shapes, biases)
+def packMappingOperator(mappingOperator) :
+    backingTensor = mappingOperator.getBackingTensor()
+    return (np.asarray(mappingOperator.getBackingTensorBuffer(), dtype = np.float32),
+            [tuple(np.shape(layer)) for layer in backingTensor],
+            np.asarray(mappingOperator.getBackingTensorBiases(), dtype = np.float32))
+
+# Builds a Mapping Operator from a compact genome that can be evaluated but not evolved
+def unpackMappingOperator(packedMappingOperator) :
+    buffer, layerShapes, biases = packedMappingOperator
+    mappingOperator = MappingOperator.__new__(MappingOperator)
+    mappingOperator.compactGenome = True
+    mappingOperator.backingTensorDepth = len(layerShapes)
+    mappingOperator.productVectorSize = layerShapes[0][0]
+    mappingOperator.setBackingTensorBuffer(buffer, layerShapes, biases)
+    return mappingOperator
+
+# Function:
+# ---------
+#   runEvaluationWorker()
+# --------------------------------------------------------------------------
+# Description:
+# ------------
+#   Connects to a coordinator and evaluates the tasks it sends until it is
+#   told to stop or the connection is lost.
+# --------------------------------------------------------------------------
+# Parameters:
+# -----------
+#   address - The address the coordinator listens on
+#   connectTimeout - The number of seconds to keep retrying the connection
+#                    while the coordinator is starting up
+# --------------------------------------------------------------------------
+# Explanation:
+# ------------
+#   The heartbeats are sent from a thread of their own so they keep coming
+#   while a long task is evaluated. The socket is shared with that thread,
+#   so every send holds a lock.
+# --------------------------------------------------------------------------
+def runEvaluationWorker(address, connectTimeout = 30.0) :
+
+    family, socketAddress = parseAddress(address)
+    connectDeadline = time.monotonic() + connectTimeout
+    while True :
+        connection = socket.socket(family, socket.SOCK_STREAM)
+        try :
+            connection.connect(socketAddress)
+            break
+        except OSError :
+            connection.close()
+            if time.monotonic() >= connectDeadline :
+                raise
+            time.sleep(.2)
+
+    sendLock = threading.Lock()
+    stopped = threading.Event()
+
+    def send(message) :
+        with sendLock :
+            sendMessage(connection, message)
+
+    def sendHeartbeats(heartbeatInterval) :
+        while not stopped.wait(heartbeatInterval) :
+            try :
+                send(('heartbeat',))
+            except OSError :
+                return
+
+    try :
+        send(('hello', socket.gethostname(), os.getpid()))
+        welcome = receiveMessage(connection)
+        dataFrame = DataFrame.unpackDataFrame(welcome[1])
+        tensorizedPopulationEvaluation = welcome[2]
+        threading.Thread(target = sendHeartbeats, args = (welcome[3],), daemon = True).start()
+
+        while True :
+            try :
+                message = receiveMessage(connection)
+                if message[0] == 'stop' :
+                    return
+                taskId, sampleIndices, indexedGenomes = message[1], message[2], message[3]
+                checkTask(dataFrame, taskId, sampleIndices, indexedGenomes)
+            except TaskError as error :
+                send(('rejected', error.taskId, str(error)))
+                continue
+
+            subPopulation = [unpackMappingOperator(packedMappingOperator) for populationIndex, packedMappingOperator in indexedGenomes]
+
+            dataFrame.setSample(sampleIndices)
+            if tensorizedPopulationEvaluation :
+                dataFrame.evaluateMappingOperators(subPopulation)
+            else :
+                for mappingOperator in subPopulation :
+                    dataFrame.evaluateMappingOperator(mappingOperator)
+            dataFrame.setSample(None)
+
+            send(('result', taskId, [(indexedGenomes[i][0], float(subPopulation[i].getFitness())) for i in range(len(subPopulation))]))
+
+    except ConnectionError :
+        return
+    finally :
+        stopped.set()
+        connection.close()
+
+class DistributedEvaluator :
+
+    # Evaluation Module
+    evaluationModule = None
+
+    # Configuration
+    # -------------
+    coordinatorAddress = None
+    localEvaluationWorkerCount = 0
+    minimumEvaluationWorkerCount = 1
+    heartbeatInterval = 1.0
+    heartbeatTimeout = 10.0
+    tasksPerWorker = 2 # Each generation is split into this many tasks per connected worker
+
+    # Sockets
+    listeningSocket = None
+    listeningAddress = None
+
+    # Workers
+    #   Worker id -> {'connection', 'lastSeen', 'task'}. Guarded by workerLock.
+    workers = None
+    workerLock = None
+    workerIds = None
+
+    # Worker events, read by the thread that evaluates:
+    #   ('joined', worker id), ('result', worker id, task id, fitnesses),
+    #   ('rejected', worker id, task id, reason), ('lost', worker id)
+    events = None
+
+    # Worker processes started on this machine
+    localWorkerProcesses = None
+
+    # Tasks
+    #   Task id -> (sample indices, [(key, compact genome), ...]) of every task
+    #   that has not finished. Task ids are unique for the life of the evaluator.
+    tasks = None
+    taskIds = None
+    waitingTasks = None
+    idleWorkers = None
+
+    def __init__(self, evaluationModule) :
+
+        # Evaluation Module
+        self.evaluationModule = evaluationModule
+
+        # Set the distributed evaluation parameters from the evaluation module
+        self.coordinatorAddress = evaluationModule.coordinatorAddress
+        self.localEvaluationWorkerCount = evaluationModule.localEvaluationWorkerCount
+        self.minimumEvaluationWorkerCount = evaluationModule.minimumEvaluationWorkerCount
+        self.heartbeatInterval = evaluationModule.heartbeatInterval
+        self.heartbeatTimeout = evaluationModule.heartbeatTimeout
+        self.tensorizedPopulationEvaluation = evaluationModule.tensorizedPopulationEvaluation
+
+        self.workers = {}
+        self.workerLock = threading.Lock()
+        self.workerIds = itertools.count()
+        self.events = queue.Queue()
+        self.localWorkerProcesses = []
+        self.tasks = {}
+        self.taskIds = itertools.count()
+        self.waitingTasks = deque()
+        self.idleWorkers = deque()
+
+    # Function:
+    # ---------
+    #   start()
+    # --------------------------------------------------------------------------
+    # Description:
+    # ------------
+    #   Starts listening for workers, starts the local workers and waits until
+    #   the minimum number of workers have connected.
+    # --------------------------------------------------------------------------
+    # Explanation:
+    # ------------
+    #   Workers are accepted on a thread of their own for the whole run, so a
+    #   worker that connects later joins in at the next task it can be given.
+    #   Each connected worker also gets a thread that reads its messages and
+    #   turns them into events for evaluate().
+    # --------------------------------------------------------------------------
+    def start(self) :
+
+        self.packedDataFrame = self.evaluationModule.getDataFrame().packDataFrame()
+
+        # Listen for workers
+        family, socketAddress = parseAddress(self.coordinatorAddress)
+        if family == socket.AF_UNIX and os.path.exists(socketAddress) :
+            os.unlink(socketAddress)
+        self.listeningSocket = socket.socket(family, socket.SOCK_STREAM)
+        if family == socket.AF_INET :
+            self.listeningSocket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listeningSocket.bind(socketAddress)
+        self.listeningSocket.listen()
+
+        # The address workers connect to, with the port filled in if one was picked
+        if family == socket.AF_INET :
+            host, port = self.listeningSocket.getsockname()[:2]
+            self.listeningAddress = host + ":" + str(port)
+        else :
+            self.listeningAddress = socketAddress
+        print("Evaluation coordinator listening on ", self.listeningAddress)
+
+        threading.Thread(target = self.acceptWorkers, daemon = True).start()
+
+        # Start the workers on this machine
+        for i in range(self.localEvaluationWorkerCount) :
+            workerProcess = Process(target = runEvaluationWorker, args = (self.listeningAddress,), daemon = True)
+            workerProcess.start()
+            self.localWorkerProcesses.append(workerProcess)
+
+        # Wait for enough workers to join
+        while self.getWorkerCount() < max(1, self.minimumEvaluationWorkerCount) :
+            time.sleep(.05)
+
+    # Stops the workers and stops listening
+    def close(self) :
+
+        with self.workerLock :
+            workers = list(self.workers.values())
+            self.workers = {}
+        for worker in workers :
+            try :
+                sendMessage(worker['connection'], ('stop',))
+            except OSError :
+                pass
+            worker['connection'].close()
+
+        if self.listeningSocket is not None :
+            self.listeningSocket.close()
+            self.listeningSocket = None
+            if parseAddress(self.coordinatorAddress)[0] == socket.AF_UNIX and os.path.exists(self.listeningAddress) :
+                os.unlink(self.listeningAddress)
+
+        for workerProcess in self.localWorkerProcesses :
+            workerProcess.join(timeout = 5)
+            if workerProcess.is_alive() :
+                workerProcess.terminate()
+        self.localWorkerProcesses = []
+
+    def getWorkerCount(self) :
+        with self.workerLock :
+            return len(self.workers)
+
+    # Accepts worker connections until the listening socket is closed
+    def acceptWorkers(self) :
+        while True :
+            try :
+                connection, peerAddress = self.listeningSocket.accept()
+            except (OSError, AttributeError) :
+                return
+            threading.Thread(target = self.serveWorker, args = (connection,), daemon = True).start()
+
+    # Greets a new worker and turns its messages into events until it is lost
+    def serveWorker(self, connection) :
+
+        workerId = next(self.workerIds)
+        try :
+            receiveMessage(connection)
+            sendMessage(connection, ('welcome', self.packedDataFrame, self.tensorizedPopulationEvaluation, self.heartbeatInterval))
+        except (OSError, ConnectionError) :
+            connection.close()
+            return
+
+        with self.workerLock :
+            self.workers[workerId] = {'connection' : connection, 'lastSeen' : time.monotonic(), 'task' : None}
+        self.events.put(('joined', workerId))
+
+        try :
+            while True :
+                message = receiveMessage(connection)
+                with self.workerLock :
+                    if workerId in self.workers :
+                        self.workers[workerId]['lastSeen'] = time.monotonic()
+                if message[0] == 'result' :
+                    self.events.put(('result', workerId, message[1], message[2]))
+                elif message[0] == 'rejected' :
+                    self.events.put(('rejected', workerId, message[1], message[2]))
+        except (OSError, ConnectionError) :
+            self.events.put(('lost', workerId))
+
+    # Drops a worker and returns the id of the task it was evaluating, if any
+    def dropWorker(self, workerId) :
+        with self.workerLock :
+            worker = self.workers.pop(workerId, None)
+        if worker is None :
+            return None
+        worker['connection'].close()
+        print("Evaluation worker ", workerId, " was lost")
+        return worker['task']
+
+    # Function:
+    # ---------
+    #   evaluate()
+    # --------------------------------------------------------------------------
+    # Description:
+    # ------------
+    #   Evaluates the given population on the connected workers.
+    # --------------------------------------------------------------------------
+    # Parameters:
+    # -----------
+    #   population - The Mapping Operators to evaluate
+    #   sampleIndices - The sample of the Data Frame to evaluate against, or
+    #                   None to use every pair. See DataFrame.setSample().
+    # --------------------------------------------------------------------------
+    # Result:
+    # --------
+    #   Every Mapping Operator in the population has had its fitness set.
+    # --------------------------------------------------------------------------
+    # Explanation:
+    # ------------
+    #   The population is split into a few tasks per worker and the tasks are
+    #   queued. See waitForResult() for how they are handed out. Whenever a
+    #   result comes in its fitnesses are written onto the population by index.
+    # --------------------------------------------------------------------------
+    def evaluate(self, population, sampleIndices = None) :
+
+        # Split the population into tasks of compact genomes
+        taskCount = max(1, self.getWorkerCount() * self.tasksPerWorker)
+        chunkLength = (len(population) + taskCount - 1) // taskCount
+        remainingTasks = set()
+        for i in range(0, len(population), chunkLength) :
+            indexedGenomes = [(populationIndex, packMappingOperator(population[populationIndex])) for populationIndex in range(i, min(i + chunkLength, len(population)))]
+            remainingTasks.add(self.submitTask(indexedGenomes, sampleIndices))
+
+        while len(remainingTasks) > 0 :
+            taskId, indexedFitnesses = self.waitForResult()
+            remainingTasks.discard(taskId)
+            for populationIndex, fitness in indexedFitnesses :
+                population[populationIndex].setFitness(fitness)
+
+    # The number of evaluations to keep submitted so that every worker is busy
+    def getCapacity(self) :
+        return max(1, self.getWorkerCount())
+
+    # Starts evaluating one Mapping Operator on every Stimulus-Product pair. Its fitness is returned by nextResult() under the key.
+    def submit(self, mappingOperator, key) :
+        self.submitTask([(key, packMappingOperator(mappingOperator))], None)
+
+    # Waits for the next evaluation started with submit() to finish and returns its (key, fitness)
+    def nextResult(self) :
+        taskId, indexedFitnesses = self.waitForResult()
+        return indexedFitnesses[0]
+
+    # Queues a task of (key, compact genome) pairs and returns its task id
+    def submitTask(self, indexedGenomes, sampleIndices) :
+        taskId = next(self.taskIds)
+        self.tasks[taskId] = (sampleIndices, indexedGenomes)
+        self.waitingTasks.append(taskId)
+        return taskId
+
+    # Function:
+    # ---------
+    #   waitForResult()
+    # --------------------------------------------------------------------------
+    # Description:
+    # ------------
+    #   Hands the queued tasks to the idle workers and waits for any task to
+    #   finish.
+    # --------------------------------------------------------------------------
+    # Returns:
+    # --------
+    #   The (task id, [(key, fitness), ...]) of the finished task.
+    # --------------------------------------------------------------------------
+    # Explanation:
+    # ------------
+    #   Each idle worker is given one task at a time, and a worker is idle
+    #   again as soon as its result comes in, so faster workers take on more of
+    #   the tasks. Between events the heartbeats are checked, and the task of a
+    #   worker that was lost or went quiet goes back to the front of the queue.
+    #   If every worker is lost this waits heartbeatTimeout seconds for one to
+    #   connect before it gives up.
+    # --------------------------------------------------------------------------
+    def waitForResult(self) :
+
+        lastWorkerTime = time.monotonic()
+        while True :
+
+            # Drop the workers that have gone quiet
+            now = time.monotonic()
+            with self.workerLock :
+                quietWorkers = [workerId for workerId, worker in self.workers.items() if now - worker['lastSeen'] > self.heartbeatTimeout]
+            for workerId in quietWorkers :
+                self.requeueTask(self.dropWorker(workerId))
+
+            # Give up if no worker has been connected for too long
+            if self.getWorkerCount() > 0 :
+                lastWorkerTime = now
+            elif now - lastWorkerTime > self.heartbeatTimeout :
+                raise RuntimeError("No evaluation workers are connected to " + self.listeningAddress)
+
+            # Hand the waiting tasks to the idle workers
+            while len(self.waitingTasks) > 0 and len(self.idleWorkers) > 0 :
+                workerId = self.idleWorkers.popleft()
+                taskId = self.waitingTasks.popleft()
+                if taskId not in self.tasks :
+                    # A lost worker's result came in after its task was queued again
+                    self.idleWorkers.appendleft(workerId)
+                    continue
+                sampleIndices, indexedGenomes = self.tasks[taskId]
+                if not self.assignTask(workerId, taskId, sampleIndices, indexedGenomes) :
+                    self.waitingTasks.appendleft(taskId)
+
+            # Wait for the next event
+            try :
+                event = self.events.get(timeout = self.heartbeatInterval)
+            except queue.Empty :
+                continue
+
+            if event[0] == 'joined' :
+                self.idleWorkers.append(event[1])
+            elif event[0] == 'lost' :
+                self.requeueTask(self.dropWorker(event[1]))
+            elif event[0] == 'result' :
+                workerId, taskId, indexedFitnesses = event[1], event[2], event[3]
+                if taskId in self.tasks and sorted(populationIndex for populationIndex, fitness in indexedFitnesses) != sorted(populationIndex for populationIndex, packedMappingOperator in self.tasks[taskId][1]) :
+                    # A result that does not answer its task is treated like a lost worker
+                    self.requeueTask(self.dropWorker(workerId))
+                    continue
+                with self.workerLock :
+                    if workerId in self.workers :
+                        self.workers[workerId]['task'] = None
+                        self.idleWorkers.append(workerId)
+                if taskId in self.tasks :
+                    del self.tasks[taskId]
+                    return taskId, indexedFitnesses
+            elif event[0] == 'rejected' :
+                workerId, taskId, reason = event[1], event[2], event[3]
+                with self.workerLock :
+                    if workerId in self.workers :
+                        self.workers[workerId]['task'] = None
+                        self.idleWorkers.append(workerId)
+                if taskId in self.tasks :
+                    # Every worker would reject the task the same way, so it is not handed out again
+                    del self.tasks[taskId]
+                    raise RuntimeError("Evaluation worker " + str(workerId) + " rejected task " + str(taskId) + ": " + reason)
+
+    # Puts the task of a lost worker back at the front of the queue
+    def requeueTask(self, taskId) :
+        if taskId in self.tasks :
+            self.waitingTasks.appendleft(taskId)
+
+    # Sends a task to a worker. Returns False if the worker could not be reached.
+    def assignTask(self, workerId, taskId, sampleIndices, indexedGenomes) :
+        with self.workerLock :
+            worker = self.workers.get(workerId)
+        if worker is None :
+            return False
+        try :
+            sendMessage(worker['connection'], ('evaluate', taskId, sampleIndices, indexedGenomes))
+        except OSError :
+            self.dropWorker(workerId)
+            return False
+        with self.workerLock :
+            worker['task'] = taskId
+        return True
@@ -1,4 +1,9 @@
 
+import numbers
+import random as random
+import numpy as np
+
+import Backend
 from DataFrame import DataFrame
 
 # -------------------------------------------------------------
@@ -32,8 +37,8 @@ from DataFrame import DataFrame
 # -------------------------------------------------------------
 # Notes:
 # ------
-#   Performance metrics are included here but have not been
-#   implemented in the algorithm.
+#   Performance metrics are filled in by the Genetic Algorithm
+#   at the end of each run.
 #
 #   **The default values in each of the relevant files are overriden
 #   by the values here.**
@@ -49,13 +54,19 @@ class EvaluationModule :
     #   ** This is the best Mapping Operator that is the result of training
     bestMappingOperator = None
 
+    # Random Generator
+    #   ** The NumPy random generator shared by the algorithm. It is seeded with randomSeed
+    randomGenerator = None
+
     # Algorithm Parameters
     #   ** These parameters are the source of truth for the parameters throughout the algorithm
     # --------------------
     
     # GA Parameters
     populationSizeFactor = 5 # This value is multiplied by the cpu count to size the population
+    populationSize = 0 # The number of members in the population. 0 = Size the population with populationSizeFactor
     maxGenerations = 1000000000 # The maximum number of generations the GA will run before quiting
+    maxRunSeconds = 0 # The wall time in seconds after which the GA stops at the end of the current generation. 0 = No time limit
     crossoverRate = .9  # The rate at which the members of the population are crossed over per iteration of the GA
     mutationRate = .3   # The rate at which the members of the population are mutated per iteration of the GA
     mutationLikelihood = .01 # The rate at which the weights of a member Mapping Operator are mutated
@@ -65,22 +76,61 @@ class EvaluationModule :
     mutationMagnitudeLow = .00001 # The lowest possible adjustment value that can happen to a weight during mutation
     mutationMagnitudeHigh = .1 # The highest possible adjustment value that can happen to a weight during mutation
     elitismWeight = 0 # The proportion of the population that will be saved as elite members and injected at the next generation
+    randomSeed = None # The seed for the random number generators so that runs can be reproduced. None = Seed from the operating system
 
     # GA Algorithm Parameters
+    evolutionModeIndicator = 0 # 0 = Generational, 1 = Steady State :: Whether the population is replaced a generation at a time, or each child joins the population as soon as it is evaluated. See GeneticAlgorithm.evolveSteadyState()
     selectionMethodIndicator = 1 # 0 = Roulette Wheel Selection, 1 = Tournament Selection :: The selection algorithm used in the GA
+    crossoverMethodIndicator = 0 # 0 = Uniform, 1 = Single Point, 2 = Layer-wise, 3 = Blend (Arithmetic) :: The crossover operator used in the GA
     rouletteWheelselectionBias = .08 # The bias towards fitter members in Roulette Wheel Selection. Lower values favor fitter members
+    rouletteWheelMethodIndicator = 0 # 0 = Fitness Proportional, 1 = Rank Based :: How the slices of the wheel are sized in Roulette Wheel Selection
     tournamentPopulationProportion = .3 # The proportion of the population that is to compete in Tournament Selection
+    tournamentSize = 0 # The number of members that compete in each tournament in Tournament Selection. 0 = Use tournamentPopulationProportion
+    tournamentReplacement = True # Whether a member can be drawn into the same tournament more than once in Tournament Selection
+    tensorizedPopulationEvaluation = True # Score Mapping Operators of the same depth together in stacked batches instead of one at a time
+    evaluationProcessCount = 0 # The number of evaluator processes started for a run. 0 = One per cpu, 1 = Evaluate in the main process
+    computeBackend = "numpy" # "numpy" or "tensorflow" :: The library that runs the math. TensorFlow is only imported when it is selected. See Backend.py
+    compiledForwardPass = True # Evaluate a Mapping Operator with one compiled function per backing tensor shape (numba or tf.function) when the backend can build one
     
+    # Island Model Parameters
+    islandCount = 1 # The number of populations evolved side by side in their own processes. 1 = One population. See IslandModel.py
+    migrationInterval = 10 # The number of generations each island evolves between migrations
+    migrationTopologyIndicator = 0 # 0 = Ring, 1 = Fully Connected :: Which islands each island sends its migrants to
+    migrantCount = 2 # The number of its fittest members each island sends to each of its neighbours at a migration
+
+    # Distributed Evaluation Parameters
+    coordinatorAddress = None # The "host:port", bare port (on 127.0.0.1) or Unix socket path that evaluation workers connect to. None = Evaluate on this machine only. See DistributedEvaluation.py
+    localEvaluationWorkerCount = 0 # The number of evaluation workers started on this machine when a coordinator address is set
+    minimumEvaluationWorkerCount = 1 # The number of evaluation workers that must connect before the first generation is evaluated
+    heartbeatInterval = 1.0 # The number of seconds between the heartbeats of an evaluation worker
+    heartbeatTimeout = 10.0 # The number of seconds without a message after which an evaluation worker is dropped and its task given to another
+
     # Data Frame Parameters
     stimulusProductPairCount = 2 # The number of Stimulus-Product Pairs that will be generated to train on. See DataFrame.py.
     productVectorSize = 2 # The dimension of the Product Vectors
     productValueLow = 0.0 # The lowest possible value that a value in a Product Vector can take on
     productValueHigh = 1 # The highest possible value that a value in a Product Vector can take on
+    dataFrameFilePath = None # A Data Frame file to train on instead of randomly generated data. See DataFrame.py for the format. None = Generate random data
+    batchedEvaluation = True # Evaluate a Mapping Operator against every Stimulus-Product Pair in one batched pass instead of one pair at a time
+    evaluationChunkSize = 0 # The number of Stimulus-Product Pairs held in memory at once by a batched evaluation. 0 = The whole Data Frame at once
+    fitnessSampleSize = 0 # The number of randomly sampled Stimulus-Product Pairs each generation is scored on. 0 = Score every generation on every pair
+    fullRescoringInterval = 10 # When sampling, the number of generations between re-scoring the elites and the best member on every pair. 0 = Only at the end of the run
+    fitnessCacheSize = 4096 # The number of fitnesses remembered so identical Mapping Operators are not evaluated again. 0 = No fitness cache
+    activationCacheBudget = 0 # The number of bytes of layer activations kept so a Mapping Operator with unchanged leading layers restarts its forward pass after them. Shared by every Mapping Operator and bypassed while sampling or evaluating in chunks. 0 = No activation cache
 
     # Mapping Operator Paremeters
     backingTensorDepth = 20 # The depth of the backing tensor that the Mapping Operator represents. Think of this as layers of weights
     backingTensorValueLow = 0 # The lowest possible weight value in a backing tensor
     backingTensorValueHigh = 1.0 # The highest possible weight in a backing tensor
+    compactGenome = False # Hold each Mapping Operator's layers and biases in one flat float32 buffer instead of lists of tensors. See Genome.py
+
+    # Checkpoint Parameters
+    checkpointInterval = 0 # The number of generations between checkpoints of the run. 0 = Never checkpoint. See Checkpoint.py
+    checkpointPath = "gavm_checkpoint.npz" # The file checkpoints are written to and resumed from
+
+    # Profiling Parameters
+    profileGenerations = False # Time every phase of every generation and print a summary table at the end of the run. See Profiler.py
+    profilePath = None # The file the per phase records are written to. A path ending in .csv is written as CSV, anything else as JSON lines. None = Only print the summary
 
     # Performance Metrics
     totalGenerations = -1.0 # A count of how many generations were run
@@ -91,13 +141,104 @@ class EvaluationModule :
     averageFitnessGain = 99999999 # The average fitness gain per generation over the life of the GA
     fitnessGains = [] # A list of fitness gains the algorithm made
 
-    def __init__(self) :
-        # Generate and set a default data frame
-        self.generateAndSetNewDataFrame()
+    # Non Parameters
+    #   ** The attributes above that are state or performance metrics rather than parameters
+    nonParameterNames = ('dataFrame', 'bestMappingOperator', 'randomGenerator',
+                         'totalGenerations', 'bestFitness', 'averageFitness',
+                         'averageNumberOfGenerationsBetweenFitnessGains', 'generationCountsBetweenFitnessGains',
+                         'averageFitnessGain', 'fitnessGains', 'nonParameterNames')
+
+    # Builds an Evaluation Module from the default parameters overridden by the given ones. A Data Frame
+    # that is given is used as is, otherwise one is generated, or loaded from dataFrameFilePath.
+    def __init__(self, parameters = None, dataFrame = None) :
+        # Every Evaluation Module collects its own performance metrics
+        self.generationCountsBetweenFitnessGains = []
+        self.fitnessGains = []
+
+        # Override the default parameters before anything is generated from them
+        if parameters is not None :
+            self.setParameters(parameters)
+
+        # Select the compute backend before any tensors are made
+        Backend.selectBackend(self.computeBackend)
+
+        # Seed the random number generators
+        self.seedRandomGenerators()
+
+        # Generate and set a default data frame unless one was given
+        if dataFrame is None :
+            self.generateAndSetNewDataFrame()
+        else :
+            self.dataFrame = dataFrame
+
+    # Returns the names of every parameter of the simulation in the order they are declared
+    @staticmethod
+    def getParameterNames() :
+        return [name for name, value in vars(EvaluationModule).items()
+                if not name.startswith('_') and name not in EvaluationModule.nonParameterNames
+                and not callable(value) and not isinstance(value, (staticmethod, classmethod))]
+
+    # Returns the current value of every parameter
+    def getParameters(self) :
+        return {name : getattr(self, name) for name in EvaluationModule.getParameterNames()}
+
+    # Function:
+    # ---------
+    #   setParameters()
+    # --------------------------------------------------------------------------
+    # Description:
+    # ------------
+    #   Overrides the default values of the given parameters on this Evaluation
+    #   Module.
+    # --------------------------------------------------------------------------
+    # Parameters:
+    # -----------
+    #   parameters - A dictionary of parameter names to values
+    # --------------------------------------------------------------------------
+    # Result:
+    # --------
+    #   The parameters have been set on this Evaluation Module only. The class
+    #   defaults are left alone. A name that is not a parameter raises a
+    #   ValueError so a misspelled setting in a config file is never ignored,
+    #   and a value of the wrong type raises a TypeError so it is rejected here
+    #   rather than failing somewhere in the middle of a run.
+    # --------------------------------------------------------------------------
+    def setParameters(self, parameters) :
+        parameterNames = EvaluationModule.getParameterNames()
+        for name, value in parameters.items() :
+            if name not in parameterNames :
+                raise ValueError("Unknown Evaluation Module parameter: " + str(name))
+            if not EvaluationModule.isValidParameterValue(getattr(EvaluationModule, name), value) :
+                raise TypeError("Evaluation Module parameter " + str(name) + " must be of type " + type(getattr(EvaluationModule, name)).__name__ + ", not " + repr(value))
+            setattr(self, name, value)
+
+    # Whether a value has the type of a parameter's default. Numbers stand in for each other, since a
+    # whole number default such as maxRunSeconds = 0 may be set to a fraction, and a parameter that
+    # defaults to None takes any value.
+    @staticmethod
+    def isValidParameterValue(default, value) :
+        if default is None :
+            return True
+        if isinstance(default, bool) or isinstance(value, bool) :
+            return isinstance(default, bool) and isinstance(value, (bool, np.bool_))
+        if isinstance(default, numbers.Real) :
+            return isinstance(value, numbers.Real)
+        return isinstance(value, type(default))
+
+    def seedRandomGenerators(self) :
+        random.seed(self.randomSeed)
+        self.randomGenerator = np.random.default_rng(self.randomSeed)
+
+    def getRandomGenerator(self) :
+        return self.randomGenerator
 
     def generateAndSetNewDataFrame(self) :
         self.dataFrame = DataFrame(self)
 
+        # A Data Frame loaded from a file decides the dimensions of the data
+        self.stimulusProductPairCount = self.dataFrame.getStimulusProductPairCount()
+        self.productVectorSize = self.dataFrame.getProductVectorSize()
+
     def getDataFrame(self) :
         return self.dataFrame
 
@@ -0,0 +1,205 @@
+import queue
+from multiprocessing import Pool, cpu_count
+
+from DataFrame import DataFrame
+
+# -------------------------------------------------------------
+# File:
+# -----
+#   EvaluatorPool.py
+# -------------------------------------------------------------
+# Description:
+# ------------
+#   The EvaluatorPool file contains the EvaluatorPool class. The
+#   EvaluatorPool class owns a long lived pool of processes that
+#   evaluate Mapping Operators against the Data Frame. The pool
+#   is started once per run of the Genetic Algorithm and reused
+#   for every generation so no process is started or torn down
+#   between generations.
+#
+#   The Data Frame is placed in shared memory when the pool starts
+#   and each worker process attaches to it read only. After that
+#   only Mapping Operators are sent to the workers and only
+#   (population index, fitness) pairs come back.
+# -------------------------------------------------------------
+
+# Evaluator Process State
+# -----------------------
+#   These are set once in each worker process by initializeEvaluator()
+evaluatorDataFrame = None
+evaluatorTensorizedPopulationEvaluation = True
+
+# Function:
+# ---------
+#   initializeEvaluator()
+# --------------------------------------------------------------------------
+# Description:
+# ------------
+#   Runs once in each worker process when the pool starts and attaches to
+#   the shared Data Frame that the worker evaluates against.
+# --------------------------------------------------------------------------
+def initializeEvaluator(sharedDataFrameDescriptor, tensorizedPopulationEvaluation) :
+
+    global evaluatorDataFrame
+    global evaluatorTensorizedPopulationEvaluation
+
+    evaluatorDataFrame = DataFrame.attachSharedDataFrame(sharedDataFrameDescriptor)
+    evaluatorTensorizedPopulationEvaluation = tensorizedPopulationEvaluation
+
+# Function:
+# ---------
+#   evaluateSubPopulation()
+# --------------------------------------------------------------------------
+# Description:
+# ------------
+#   Evaluates a portion of the population in a worker process.
+# --------------------------------------------------------------------------
+# Parameters:
+# -----------
+#   evaluationTask - A (sample indices, indexed sub population) pair. The
+#                    sample indices restrict the evaluation to a sample of the
+#                    Data Frame, or are None to use every pair. The indexed sub
+#                    population is the portion of the population to evaluate
+#                    in this process as (population index, Mapping Operator)
+#                    pairs.
+# --------------------------------------------------------------------------
+# Returns:
+# --------
+#   A list of (population index, fitness) pairs. The evaluated Mapping
+#   Operators themselves are never sent back.
+# --------------------------------------------------------------------------
+def evaluateSubPopulation(evaluationTask) :
+
+    sampleIndices, indexedSubPopulation = evaluationTask
+    evaluatorDataFrame.setSample(sampleIndices)
+
+    subPopulation = [mappingOperator for populationIndex, mappingOperator in indexedSubPopulation]
+
+    if evaluatorTensorizedPopulationEvaluation :
+        evaluatorDataFrame.evaluateMappingOperators(subPopulation)
+    else :
+        for mappingOperator in subPopulation :
+            evaluatorDataFrame.evaluateMappingOperator(mappingOperator)
+
+    return [(populationIndex, float(mappingOperator.getFitness())) for populationIndex, mappingOperator in indexedSubPopulation]
+
+class EvaluatorPool :
+
+    # Evaluation Module
+    evaluationModule = None
+
+    # Configuration
+    # -------------
+    processCount = cpu_count()
+
+    # Process Pool
+    processPool = None
+
+    # Finished Evaluations
+    #   The results of the evaluations started with submit(), in the order they finish
+    finishedEvaluations = None
+
+    def __init__(self, evaluationModule) :
+
+        # Evaluation Module
+        self.evaluationModule = evaluationModule
+
+        # A process count of zero means one process per cpu
+        self.processCount = evaluationModule.evaluationProcessCount
+        if self.processCount <= 0 :
+            self.processCount = cpu_count()
+
+    # Shares the Data Frame and starts the worker processes
+    def start(self) :
+        if self.processPool is None :
+            sharedDataFrameDescriptor = self.evaluationModule.getDataFrame().shareDataFrame()
+            self.processPool = Pool(processes = self.processCount,
+                                    initializer = initializeEvaluator,
+                                    initargs = (sharedDataFrameDescriptor, self.evaluationModule.tensorizedPopulationEvaluation))
+            self.finishedEvaluations = queue.Queue()
+
+    # Stops the worker processes and releases the shared Data Frame
+    def close(self) :
+        if self.processPool is not None :
+            self.processPool.close()
+            self.processPool.join()
+            self.processPool = None
+            self.evaluationModule.getDataFrame().releaseSharedDataFrame()
+
+    # Function:
+    # ---------
+    #   evaluate()
+    # --------------------------------------------------------------------------
+    # Description:
+    # ------------
+    #   Evaluates the given population on the worker processes.
+    # --------------------------------------------------------------------------
+    # Parameters:
+    # -----------
+    #   population - The Mapping Operators to evaluate
+    #   sampleIndices - The sample of the Data Frame to evaluate against, or
+    #                   None to use every pair. See DataFrame.setSample().
+    # --------------------------------------------------------------------------
+    # Result:
+    # --------
+    #   Every Mapping Operator in the population has had its fitness set.
+    # --------------------------------------------------------------------------
+    # Explanation:
+    # ------------
+    #   The population is split into one contiguous chunk per worker and each
+    #   Mapping Operator is sent along with its index in the population. The
+    #   workers send back (index, fitness) pairs, so what comes back is a
+    #   handful of scalars per chunk no matter how large the backing tensors
+    #   are. The chunks are collected in whatever order they finish and each
+    #   fitness is written onto the parent's own Mapping Operator at its index,
+    #   so the population keeps its order.
+    # --------------------------------------------------------------------------
+    def evaluate(self, population, sampleIndices = None) :
+
+        # Split the indexed population into one chunk per process
+        indexedPopulation = list(enumerate(population))
+        chunkLength = (len(indexedPopulation) + self.processCount - 1) // self.processCount
+        evaluationTasks = [(sampleIndices, indexedPopulation[i:i + chunkLength]) for i in range(0, len(indexedPopulation), chunkLength)]
+
+        # Evaluate the chunks in parallel and set each fitness by its index
+        for indexedFitnesses in self.processPool.imap_unordered(evaluateSubPopulation, evaluationTasks) :
+            for populationIndex, fitness in indexedFitnesses :
+                population[populationIndex].setFitness(fitness)
+
+    # The number of evaluations to keep submitted so that every process is busy
+    def getCapacity(self) :
+        return self.processCount
+
+    # Function:
+    # ---------
+    #   submit()
+    # --------------------------------------------------------------------------
+    # Description:
+    # ------------
+    #   Starts evaluating one Mapping Operator on every Stimulus-Product pair
+    #   and returns without waiting for it.
+    # --------------------------------------------------------------------------
+    # Parameters:
+    # -----------
+    #   mappingOperator - The Mapping Operator to evaluate
+    #   key - What the result is returned under by nextResult()
+    # --------------------------------------------------------------------------
+    # Explanation:
+    # ------------
+    #   The evaluation is queued on the pool as a task of its own and its
+    #   result is put on the finished evaluations queue by the pool's result
+    #   thread as soon as a process is done with it, whatever order the
+    #   evaluations were submitted in. Errors are put on the queue too and
+    #   raised by nextResult().
+    # --------------------------------------------------------------------------
+    def submit(self, mappingOperator, key) :
+        self.processPool.apply_async(evaluateSubPopulation, ((None, [(key, mappingOperator)]),),
+                                     callback = self.finishedEvaluations.put,
+                                     error_callback = self.finishedEvaluations.put)
+
+    # Waits for the next evaluation started with submit() to finish and returns its (key, fitness)
+    def nextResult(self) :
+        result = self.finishedEvaluations.get()
+        if isinstance(result, BaseException) :
+            raise result
+        return result[0]
@@ -0,0 +1,80 @@
+from collections import OrderedDict
+
+# -------------------------------------------------------------
+# File:
+# -----
+#   FitnessCache.py
+# -------------------------------------------------------------
+# Description:
+# ------------
+#   The FitnessCache file contains the FitnessCache class. The
+#   FitnessCache class remembers the fitness of Mapping Operators
+#   that have already been evaluated so that an identical Mapping
+#   Operator is never evaluated twice.
+#
+#   Many members of a generation are exact copies of a member
+#   that was scored before:
+#
+#       1. Children that crossover passed over are copies of a
+#          parent.
+#       2. Members that mutation passed over are unchanged.
+#       3. Elites are injected unchanged every generation.
+#
+#   Fitnesses are keyed by a hash of the backing tensor and the
+#   biases. See MappingOperator.getGenomeHash(). The cache holds
+#   a fixed number of fitnesses and evicts the least recently
+#   used one when it is full.
+# -------------------------------------------------------------
+
+class FitnessCache :
+
+    # Configuration
+    # -------------
+    capacity = 0
+
+    # Cached Fitnesses
+    #   Genome hash -> fitness, ordered from least to most recently used
+    fitnesses = None
+
+    # Counters
+    hits = 0
+    misses = 0
+
+    def __init__(self, capacity) :
+        self.capacity = capacity
+        self.fitnesses = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    # Returns the cached fitness for a genome hash, or None if it has not been seen
+    def lookup(self, genomeHash) :
+        fitness = self.fitnesses.get(genomeHash)
+        if fitness is None :
+            self.misses = self.misses + 1
+            return None
+        self.fitnesses.move_to_end(genomeHash)
+        self.hits = self.hits + 1
+        return fitness
+
+    # Caches the fitness for a genome hash, evicting the least recently used fitness when full
+    def store(self, genomeHash, fitness) :
+        self.fitnesses[genomeHash] = fitness
+        self.fitnesses.move_to_end(genomeHash)
+        while len(self.fitnesses) > self.capacity :
+            self.fitnesses.popitem(last = False)
+
+    def clear(self) :
+        self.fitnesses.clear()
+
+    def getHits(self) :
+        return self.hits
+
+    def getMisses(self) :
+        return self.misses
+
+    # The share of lookups that were answered from the cache
+    def getHitRate(self) :
+        lookups = self.hits + self.misses
+        if lookups == 0 :
+            return 0.0
+        return self.hits / lookups
@@ -1,13 +1,19 @@
 
-import sys
+import itertools
 import math as math
 import random as random
-from itertools import product
-from multiprocessing import Pool, Queue, cpu_count, Manager
-import tensorflow as tf
+import time
+import numpy as np
+from multiprocessing import cpu_count
 
+from Checkpoint import Checkpoint
 from DataFrame import DataFrame
+from DistributedEvaluation import DistributedEvaluator
+from EvaluatorPool import EvaluatorPool
+from FitnessCache import FitnessCache
+from Genome import Genome
 from MappingOperator import MappingOperator
+from Profiler import Profiler
 
 # -------------------------------------------------------------
 # File:
@@ -41,17 +47,55 @@ class GeneticAlgorithm :
     # Population
     population = []
     populationSize = cpu_count() * 5
+
+    # Fitness Index
+    #   The fitnesses of the population and the population indices ordered by
+    #   fitness in DESCENDING order. See sortPopulation().
+    populationFitnesses = None
+    populationRanking = None
     
     # Fitnesses
     bestFitness = 99999999
+    bestMappingOperator = None
 
     # Generations
     maxGenerations = 10000000
+    maxRunSeconds = 0 # 0 = No time limit
+    stopReason = None # Why the last run stopped: "maxGenerations", "solved" or "maxRunSeconds"
 
     # Algorithm
+    evolutionModeIndicator = 0 # 0 = Generational, 1 = Steady State
     selectionMethodIndicator = 0 # 0 = Roulette Wheel, 1 = Tournament
+    crossoverMethodIndicator = 0 # 0 = Uniform, 1 = Single Point, 2 = Layer-wise, 3 = Blend
     rouletteWheelSelectionBias = .08
+    rouletteWheelMethodIndicator = 0 # 0 = Fitness Proportional, 1 = Rank Based
     tournamentPopulationProportion = .04    
+    tournamentSize = 0 # 0 = Derive the size from tournamentPopulationProportion
+    tournamentReplacement = True
+    tensorizedPopulationEvaluation = True
+
+    # Evaluation
+    evaluationProcessCount = 0 # 0 = One process per cpu, 1 = Evaluate in this process
+    evaluatorPool = None
+
+    # Fitness Sampling
+    fitnessSampleSize = 0 # 0 = Score every generation on every Stimulus-Product pair
+    fullRescoringInterval = 10
+
+    # Fitness Cache
+    fitnessCache = None
+
+    # Checkpointing
+    checkpoint = None
+
+    # Profiling
+    profiler = None
+
+    # Performance Metrics
+    #   Collected over the run and reported to the Evaluation Module at the end
+    lastFitnessGainGeneration = None
+    populationFitnessTotal = 0.0
+    populationFitnessCount = 0
     
     # Hyperparameters
     crossoverRate = .9
@@ -72,10 +116,19 @@ class GeneticAlgorithm :
         # Set the evaluation module
         self.evaluationModule = evaluationModule
 
+        # Every Genetic Algorithm gets its own population and elites
+        self.population = []
+        self.elites = []
+
         # Set the parameters of the GA from the evaluation module
-        self.populationSize = cpu_count() * evaluationModule.populationSizeFactor
+        self.populationSize = evaluationModule.populationSize
+        if self.populationSize <= 0 :
+            self.populationSize = cpu_count() * evaluationModule.populationSizeFactor
         self.maxGenerations = evaluationModule.maxGenerations
+        self.maxRunSeconds = evaluationModule.maxRunSeconds
+        self.evolutionModeIndicator = evaluationModule.evolutionModeIndicator
         self.selectionMethodIndicator = evaluationModule.selectionMethodIndicator
+        self.crossoverMethodIndicator = evaluationModule.crossoverMethodIndicator
         self.crossoverRate = evaluationModule.crossoverRate
         self.mutationRate = evaluationModule.mutationRate
         self.mutationLikelihood = evaluationModule.mutationLikelihood
@@ -85,45 +138,374 @@ class GeneticAlgorithm :
         self.mutationMagnitudeLow = evaluationModule.mutationMagnitudeLow
         self.mutationMagnitudeHigh = evaluationModule.mutationMagnitudeHigh
         self.rouletteWheelSelectionBias = evaluationModule.rouletteWheelselectionBias
+        self.rouletteWheelMethodIndicator = evaluationModule.rouletteWheelMethodIndicator
         self.tournamentPopulationProportion = evaluationModule.tournamentPopulationProportion
+        self.tournamentSize = evaluationModule.tournamentSize
+        self.tournamentReplacement = evaluationModule.tournamentReplacement
+        self.tensorizedPopulationEvaluation = evaluationModule.tensorizedPopulationEvaluation
+        self.evaluationProcessCount = evaluationModule.evaluationProcessCount
+        self.fitnessSampleSize = evaluationModule.fitnessSampleSize
+        if self.evolutionModeIndicator == 1 :
+            # Children join the population one at a time, so they are scored on every pair
+            self.fitnessSampleSize = 0
+        self.fullRescoringInterval = evaluationModule.fullRescoringInterval
+        if evaluationModule.fitnessCacheSize > 0 :
+            self.fitnessCache = FitnessCache(evaluationModule.fitnessCacheSize)
         self.elitismWeight = evaluationModule.elitismWeight
                 
-    def run(self) :
+    # Function:
+    # --------- 
+    #   run()
+    # --------------------------------------------------------------------------
+    # Description:
+    # ------------
+    #   Runs the Genetic Algorithm, either from a freshly generated population
+    #   or from a checkpoint saved by an earlier run.
+    # --------------------------------------------------------------------------
+    # Parameters:
+    # -----------
+    #   checkpointPath - The checkpoint to resume from. None starts a new run.
+    # --------------------------------------------------------------------------
+    # Result:
+    # --------
+    #   The best Mapping Operator found has been set on the Evaluation Module.
+    # --------------------------------------------------------------------------
+    # Explanation:
+    # ------------
+    #   A checkpoint is written every checkpointInterval generations and once
+    #   more when the run ends. See Checkpoint.py. When resuming, the Data Frame
+    #   saved in the checkpoint replaces the one in the Evaluation Module before
+    #   the evaluator processes start so that they evaluate against the same
+    #   data as the original run.
+    # --------------------------------------------------------------------------
+    def run(self, checkpointPath = None) :
+
+        self.checkpoint = Checkpoint(self.evaluationModule)
+        self.profiler = Profiler(self.evaluationModule)
+
+        # Load the checkpoint to resume from
+        checkpointState = None
+        if checkpointPath is not None :
+            checkpointState = Checkpoint.load(checkpointPath)
+            self.checkpoint.restoreDataFrame(checkpointState)
+
+        # Start the evaluator processes for the life of the run
+        self.startEvaluatorPool()
+        try :
+            self.evolve(checkpointState)
+        finally :
+            self.stopEvaluatorPool()
+            self.checkpoint.wait()
+            self.profiler.close()
+
+    def evolve(self, checkpointState = None) :
+
+        runStartTime = time.perf_counter()
+
+        if checkpointState is None :
+            # Generate the population
+            self.generatePopulation()
+            # Evaluate and sort it for the first time
+            self.evaluatePopulation()
+            self.sortPopulation()
+            generationCount = 0
+
+            # Sampled fitnesses are estimates, so the best is tracked on full scores
+            if self.isSampling() :
+                self.saveElites()
+                self.rescoreBestMembers(generationCount)
+        else :
+            # Pick the population up where the checkpoint left it. The checkpoint holds the re-scored
+            # elites and best fitness, so they are not saved or re-scored again.
+            generationCount = self.checkpoint.restore(self, checkpointState)
+            self.sortPopulation()
+
+        if self.evolutionModeIndicator == 1 :
+            generationCount = self.evolveSteadyState(generationCount, runStartTime)
+        else :
+            generationCount = self.evolveGenerations(generationCount, runStartTime)
+
+        # Save the final state of the run
+        if self.checkpoint.checkpointInterval > 0 and not self.checkpoint.isDue(generationCount) :
+            self.checkpoint.save(self, generationCount)
+
+        # Set the best Mapping Operator on the Evaluation Module
+        if self.isSampling() :
+            self.rescoreBestMembers(generationCount)
+            self.evaluationModule.setBestMappingOperator(self.bestMappingOperator)
+        else :
+            self.evaluationModule.setBestMappingOperator(self.getBestMember())
+
+        # Report the performance metrics of the run
+        self.evaluationModule.setTotalGenerations(generationCount)
+        self.evaluationModule.setBestFitness(self.evaluationModule.getBestMappingOperator().getFitness())
+        if self.populationFitnessCount > 0 :
+            self.evaluationModule.setAverageFitness(self.populationFitnessTotal / self.populationFitnessCount)
+
+        if self.fitnessCache is not None :
+            print("Fitness Cache : ", self.fitnessCache.getHits(), " hits, ", self.fitnessCache.getMisses(), " misses")
+
+        activationCache = self.evaluationModule.getDataFrame().activationCache
+        if activationCache is not None and self.evaluatorPool is None :
+            print("Activation Cache : ", activationCache.getHits(), " hits, ", activationCache.getMisses(), " misses")
+
+    # Runs whole generations until the run is finished and returns the generation count
+    def evolveGenerations(self, generationCount, runStartTime) :
 
-        # Generate the population
-        self.generatePopulation()
-        # Evaluate and sort it for the first time
-        self.evaluatePopulation()
-        self.sortPopulation()
-        
         # Main GA algortihm loop
-        generationCount = 0
-        while generationCount < self.maxGenerations and self.population[-1].getFitness() > 0:
+        while not self.isFinished(generationCount, runStartTime) :
 
             # Run GA functions
+            self.runGeneration(generationCount)
+
+            # Check fitnesses
+            self.populationFitnessTotal = self.populationFitnessTotal + float(np.mean(self.populationFitnesses))
+            self.populationFitnessCount = self.populationFitnessCount + 1
+            currentBestFitness = self.getBestMember().getFitness()
+            if self.isSampling() :
+                print("Generation ", generationCount, " : Sampled Fitness = ", currentBestFitness)
+            else :
+                print("Generation ", generationCount, " : Fitness = ", currentBestFitness)
+                if currentBestFitness < self.bestFitness :
+                    self.setNewBestFitness(currentBestFitness, generationCount)
+            
+            generationCount = generationCount + 1
+
+            # Re-score the elites on every pair when it is due. The end of the run is re-scored by evolve()
+            # after the last checkpoint, so that a checkpoint holds the same state whether or not the run
+            # stops there.
+            if self.isSampling() and self.fullRescoringInterval > 0 and generationCount % self.fullRescoringInterval == 0 :
+                self.rescoreBestMembers(generationCount)
+
+            # Save a checkpoint when one is due
+            if self.checkpoint.isDue(generationCount) :
+                self.checkpoint.save(self, generationCount)
+
+        return generationCount
+
+    # Function:
+    # ---------
+    #   evolveSteadyState()
+    # --------------------------------------------------------------------------
+    # Description:
+    # ------------
+    #   Evolves the population one child at a time, without waiting for a
+    #   whole generation to be evaluated, until the run is finished.
+    # --------------------------------------------------------------------------
+    # Parameters:
+    # -----------
+    #   generationCount - The generation the run starts at
+    #   runStartTime - The time the run started. See isFinished().
+    # --------------------------------------------------------------------------
+    # Returns:
+    # --------
+    #   The generation count the run finished at.
+    # --------------------------------------------------------------------------
+    # Explanation:
+    # ------------
+    #   The generational loop waits for every member of a generation to be
+    #   evaluated before the next selection, so the evaluator processes that
+    #   finish early sit idle while the slowest ones, such as those holding
+    #   the deepest Mapping Operators, catch up.
+    #
+    #   In steady state every evaluator is kept busy with a child of its own:
+    #
+    #       1. A child is bred from two parents picked by tournament, crossed
+    #          over and mutated. See breedChild().
+    #       2. The child is submitted to the evaluator processes, or the
+    #          distributed evaluation workers, and the next child is bred
+    #          until every one of them has a child to evaluate.
+    #       3. As soon as any child's fitness comes back the child takes the
+    #          place of the least fit member of the population if it is
+    #          fitter, and a new child is bred for the free evaluator.
+    #
+    #   A child that is a copy of a member, or whose fitness is in the fitness
+    #   cache, joins the population without being evaluated. Without evaluator
+    #   processes each child is evaluated in this process as soon as it is
+    #   bred.
+    #
+    #   Every populationSize children that join the population count as one
+    #   generation for maxGenerations, the printed fitness, the performance
+    #   metrics, checkpoints and the profiler, which records the breedChild,
+    #   submitChild or evaluateChild, waitForChild and insertChild phases of
+    #   every child. Children that are still being evaluated when
+    #   the run finishes are collected before it returns.
+    # --------------------------------------------------------------------------
+    def evolveSteadyState(self, generationCount, runStartTime) :
+
+        profiler = self.profiler
+        pendingChildren = {}
+        childKeys = itertools.count()
+        childCount = 0
+
+        profiler.beginGeneration(generationCount)
+        while not self.isFinished(generationCount, runStartTime) :
+
+            # Keep every evaluator busy with a child
+            capacity = 1 if self.evaluatorPool is None else self.evaluatorPool.getCapacity()
+            if len(pendingChildren) < capacity :
+                with profiler.phase("breedChild") :
+                    child = self.breedChild()
+                if child.isDirty() and not self.setCachedFitness(child) :
+                    if self.evaluatorPool is not None :
+                        childKey = next(childKeys)
+                        pendingChildren[childKey] = child
+                        with profiler.phase("submitChild") :
+                            self.evaluatorPool.submit(child, childKey)
+                        continue
+                    with profiler.phase("evaluateChild") :
+                        self.evaluateInProcess([child])
+                    self.cacheFitness(child)
+            else :
+                # Wait for whichever child finishes first
+                with profiler.phase("waitForChild") :
+                    childKey, fitness = self.evaluatorPool.nextResult()
+                child = pendingChildren.pop(childKey)
+                child.setFitness(fitness)
+                self.cacheFitness(child)
+
+            with profiler.phase("insertChild") :
+                self.insertChild(child)
+            childCount = childCount + 1
+            if childCount % self.populationSize != 0 :
+                continue
+
+            # Check fitnesses once per generation's worth of children
+            self.populationFitnessTotal = self.populationFitnessTotal + float(np.mean(self.populationFitnesses))
+            self.populationFitnessCount = self.populationFitnessCount + 1
+            currentBestFitness = self.getBestMember().getFitness()
+            print("Generation ", generationCount, " : Fitness = ", currentBestFitness)
+            if currentBestFitness < self.bestFitness :
+                self.setNewBestFitness(currentBestFitness, generationCount)
+
+            profiler.endGeneration()
+            generationCount = generationCount + 1
+            profiler.beginGeneration(generationCount)
+
+            # Save a checkpoint when one is due
+            if self.checkpoint.isDue(generationCount) :
+                self.saveElites()
+                self.checkpoint.save(self, generationCount)
+
+        # Collect the children that are still being evaluated
+        while len(pendingChildren) > 0 :
+            with profiler.phase("waitForChild") :
+                childKey, fitness = self.evaluatorPool.nextResult()
+            child = pendingChildren.pop(childKey)
+            child.setFitness(fitness)
+            self.cacheFitness(child)
+            with profiler.phase("insertChild") :
+                self.insertChild(child)
+
+        with profiler.phase("saveElites") :
+            self.saveElites()
+        profiler.endGeneration()
+        return generationCount
+
+    # Breeds one child from two distinct parents picked by tournament, crossed over and mutated
+    def breedChild(self) :
+        randomGenerator = self.evaluationModule.getRandomGenerator()
+        parentAIndex = self.drawTournamentChampions(1)[0]
+        parentBIndex = self.drawOtherTournamentChampion(parentAIndex, randomGenerator)
+        parentA = self.population[parentAIndex]
+        parentB = self.population[parentBIndex]
+
+        # A pair that is not crossed over passes on a parent, which must not be mutated in place
+        child = self.crossoverParents(parentA, parentB, randomGenerator)
+        if child is parentA or child is parentB :
+            child = child.clone()
+
+        self.mutateMember(child)
+        return child
+
+    # Runs a tournament among every member but the given one and returns the population index of the
+    # champion. Drawing from the other members rather than redrawing on a collision keeps the second
+    # parent distinct even when the tournament takes in the whole population.
+    def drawOtherTournamentChampion(self, excludedIndex, randomGenerator) :
+        populationSize = len(self.population)
+        if populationSize < 2 :
+            return excludedIndex
+
+        otherIndices = np.delete(np.arange(populationSize), excludedIndex)
+        tournamentSize = min(self.getTournamentSize(), populationSize - 1)
+        competitorIndices = randomGenerator.choice(otherIndices, size = tournamentSize, replace = self.tournamentReplacement)
+        return competitorIndices[np.argmin(self.populationFitnesses[competitorIndices])]
+
+    # Puts an evaluated child in the place of the least fit member of the population if it is fitter
+    def insertChild(self, child) :
+        leastFitIndex = self.populationRanking[0]
+        if child.getFitness() < self.populationFitnesses[leastFitIndex] :
+            self.population[leastFitIndex] = child
+            self.sortPopulation()
+
+    # Sets the fitness of a Mapping Operator from the fitness cache. Returns whether it was there.
+    def setCachedFitness(self, mappingOperator) :
+        if self.fitnessCache is None :
+            return False
+        fitness = self.fitnessCache.lookup(mappingOperator.getGenomeHash())
+        if fitness is None :
+            return False
+        mappingOperator.setFitness(fitness)
+        return True
+
+    # Stores the fitness of an evaluated Mapping Operator in the fitness cache
+    def cacheFitness(self, mappingOperator) :
+        if self.fitnessCache is not None :
+            self.fitnessCache.store(mappingOperator.getGenomeHash(), mappingOperator.getFitness())
+
+    # Runs the GA functions for one generation, timing each of them with the profiler
+    def runGeneration(self, generationCount) :
+        profiler = self.profiler
+        profiler.beginGeneration(generationCount)
+        with profiler.phase("selection") :
             if self.selectionMethodIndicator == 0 :
                 self.selectRouletteWheel()
             else :
                 self.selectTournament()
+        with profiler.phase("crossover") :
             self.crossover()
+        with profiler.phase("mutate") :
             self.mutate()
+        with profiler.phase("injectElites") :
             self.injectElites()
+        with profiler.phase("evaluatePopulation") :
             self.evaluatePopulation()
+        with profiler.phase("sortPopulation") :
             self.sortPopulation()
+        with profiler.phase("saveElites") :
             self.saveElites()
+        profiler.endGeneration()
+
+    # Whether the run should stop before the next generation. Records why it stopped.
+    def isFinished(self, generationCount, runStartTime) :
+        if generationCount >= self.maxGenerations :
+            self.stopReason = "maxGenerations"
+        elif self.getReportedBestFitness() <= 0 :
+            self.stopReason = "solved"
+        elif self.maxRunSeconds > 0 and time.perf_counter() - runStartTime >= self.maxRunSeconds :
+            self.stopReason = "maxRunSeconds"
+        else :
+            return False
+        return True
+
+    # Starts the long lived evaluator processes, or the coordinator of the distributed evaluation workers,
+    # unless evaluation happens in this process
+    def startEvaluatorPool(self) :
+        if self.evaluatorPool is not None :
+            return
+        if self.evaluationModule.coordinatorAddress is not None :
+            self.evaluatorPool = DistributedEvaluator(self.evaluationModule)
+            self.evaluatorPool.start()
+        elif self.evaluationProcessCount != 1 :
+            self.evaluatorPool = EvaluatorPool(self.evaluationModule)
+            self.evaluatorPool.start()
+
+    # Stops the evaluator processes
+    def stopEvaluatorPool(self) :
+        if self.evaluatorPool is not None :
+            self.evaluatorPool.close()
+            self.evaluatorPool = None
 
-            # Check fitnesses
-            currentBestFitness = self.population[-1].getFitness()
-            print("Generation ", generationCount, " : Fitness = ", currentBestFitness)
-            if currentBestFitness < self.bestFitness :
-                self.bestFitness = currentBestFitness
-                print(" --------------------------------- New Best Fitness = ", self.bestFitness)
-            
-            generationCount = generationCount + 1
-
-        # Set the best Mapping Operator on the Evaluation Module
-        self.evaluationModule.setBestMappingOperator(self.population[-1])
-        
     # Function:
     # --------- 
     #   generatePopulation()
@@ -169,8 +551,8 @@ class GeneticAlgorithm :
     # ------------
     #   Selects members of the population to cross over.
     #
-    #   Relies in the population being sorted by fitness value in DESCENDING order
-    #   at this point
+    #   Relies on the population having been ranked by fitness value in DESCENDING
+    #   order at this point
     # --------------------------------------------------------------------------
     # Parameters:
     # -----------
@@ -200,8 +582,23 @@ class GeneticAlgorithm :
     #   piece of the probability pie; they have a higher likelihood of being
     #   selected.
     #
-    #   This algorithm only works in the population at the beginning of it is
-    #   sorted in DESCENDING order
+    #   This algorithm walks the population in the ranked order set up by
+    #   sortPopulation()
+    #
+    #   The wheel is built once per generation as a cumulative distribution over
+    #   the population in ranked order, fittest first. Every pick is then a
+    #   binary search of that distribution and all 2 * populationSize picks are
+    #   drawn together, so the cost of selection grows as N log N with the size
+    #   of the population. There are two kinds of wheel, chosen with
+    #   rouletteWheelMethodIndicator:
+    #
+    #       0. Fitness Proportional: Each member's slice of the wheel is its share
+    #          of the population's total fitness. Picks are drawn from the first
+    #          rouletteWheelSelectionBias of the wheel, starting from the fittest
+    #          member, so lower bias values favor fitter members.
+    #       1. Rank Based: Each member's slice of the wheel is proportional to its
+    #          rank. The fittest of N members gets N shares and the least fit gets
+    #          one. Picks are drawn from the whole wheel.
     #
     #   More information about selection in general:
     #   --------------------------------------------
@@ -218,36 +615,31 @@ class GeneticAlgorithm :
     # --------------------------------------------------------------------------
     def selectRouletteWheel(self) :
 
-        selectedPopulation = []
-
-        # Load the fitness values from the population
-        fitnessValues = []
-        for mappingOperator in self.population :
-            fitnessValues.append(mappingOperator.getFitness())
-
-        # Sum the fitnesses of the population
-        populationFitnessSum = 0
-        for value in fitnessValues :
-            populationFitnessSum = populationFitnessSum + value
-
-        # Compute normalized fitness values
-        for i in range(len(fitnessValues)) :
-            fitnessValues[i] = fitnessValues[i] / populationFitnessSum
-
-        # Compute cumulative normalized fitness values
-        for i in reversed(range(len(fitnessValues) - 1)) :
-            fitnessValues[i] = fitnessValues[i] + fitnessValues[i + 1]
+        randomGenerator = self.evaluationModule.getRandomGenerator()
+        selectionCount = len(self.population) * 2
+
+        # Order the population from the fittest member to the least fit
+        fittestFirstRanking = self.populationRanking[::-1]
+
+        # Build the wheel as a cumulative distribution
+        if self.rouletteWheelMethodIndicator == 1 :
+            rankWeights = np.arange(len(fittestFirstRanking), 0, -1, dtype = np.float64)
+            cumulativeDistribution = np.cumsum(rankWeights) / rankWeights.sum()
+            randomFitnesses = randomGenerator.random(selectionCount)
+            selectedRanks = np.searchsorted(cumulativeDistribution, randomFitnesses, side = 'right')
+        else :
+            fitnessValues = self.populationFitnesses[fittestFirstRanking]
+            populationFitnessSum = fitnessValues.sum()
+            if populationFitnessSum > 0 :
+                cumulativeDistribution = np.cumsum(fitnessValues / populationFitnessSum)
+            else :
+                cumulativeDistribution = np.arange(1, len(fitnessValues) + 1) / len(fitnessValues)
+            randomFitnesses = randomGenerator.uniform(0.0, self.rouletteWheelSelectionBias, selectionCount)
+            selectedRanks = np.searchsorted(cumulativeDistribution, randomFitnesses, side = 'left')
 
         # Perform roulette wheel selection
-        for i in reversed(range(len(self.population) * 2)) :
-            randomFitness = random.uniform(0.0, self.rouletteWheelSelectionBias)
-
-            k = len(fitnessValues) - 1
-            while randomFitness > fitnessValues[k] :
-                k = k - 1
-            selectedPopulation.append(self.population[k])
-
-        self.population = selectedPopulation
+        selectedRanks = np.minimum(selectedRanks, len(fittestFirstRanking) - 1)
+        self.population = [self.population[populationIndex] for populationIndex in fittestFirstRanking[selectedRanks]]
 
     # Function:
     # --------- 
@@ -285,25 +677,58 @@ class GeneticAlgorithm :
     #   select N members at random and take the member with the highest fitness.
     #   The research says that picking two members will suffice instead of many.
     #   This increases variance in the fitness level.
+    #
+    #   Every tournament of the generation is run at once. The competitors are
+    #   drawn as a [2 * populationSize, tournamentSize] matrix of population
+    #   indices and the champion of each row is found with a single argmin over
+    #   the fitness index. The tournament size is tournamentSize if it is set and
+    #   otherwise the tournamentPopulationProportion of the population. With
+    #   tournamentReplacement a member can be drawn into the same tournament
+    #   more than once. Without it each tournament is made up of distinct
+    #   members.
     # --------------------------------------------------------------------------
     def selectTournament(self) :
-        
-        selectedPopulation = []
-
-        for i in range(len(self.population) * 2) :
-
-            selectedCompetitors = []
-            for j in range(math.floor(len(self.population) * self.tournamentPopulationProportion)) :
-                selectedCompetitors.append(self.population[random.randint(0, len(self.population) - 1)])
-
-            championIndex = 0
-            for j in range(len(selectedCompetitors)) :
-                if selectedCompetitors[j].fitness < selectedCompetitors[championIndex].fitness :
-                    championIndex = j
-
-            selectedPopulation.append(selectedCompetitors[championIndex])
-                
-        self.population = selectedPopulation
+        championIndices = self.drawTournamentChampions(len(self.population) * 2)
+        self.population = [self.population[populationIndex] for populationIndex in championIndices]
+
+    # Runs the given number of tournaments and returns the population index of each champion
+    def drawTournamentChampions(self, selectionCount) :
+
+        randomGenerator = self.evaluationModule.getRandomGenerator()
+        populationSize = len(self.population)
+        tournamentSize = self.getTournamentSize()
+
+        # Draw the competitors of every tournament
+        if self.tournamentReplacement :
+            competitorIndices = randomGenerator.integers(0, populationSize, size = (selectionCount, tournamentSize))
+        else :
+            competitorIndices = self.drawDistinctCompetitors(selectionCount, tournamentSize, randomGenerator)
+
+        # Find the champion of every tournament
+        championColumns = np.argmin(self.populationFitnesses[competitorIndices], axis = 1)
+        return competitorIndices[np.arange(selectionCount), championColumns]
+
+    # Returns the number of competitors in each tournament
+    def getTournamentSize(self) :
+        tournamentSize = self.tournamentSize
+        if tournamentSize <= 0 :
+            tournamentSize = math.floor(len(self.population) * self.tournamentPopulationProportion)
+        return max(1, min(tournamentSize, len(self.population)))
+
+    # Draws tournaments of distinct competitors. Each row takes the competitors with
+    # the smallest of a row of random keys. The rows are drawn in blocks so that the
+    # keys never take up more than about a million values at once.
+    def drawDistinctCompetitors(self, selectionCount, tournamentSize, randomGenerator) :
+        populationSize = len(self.population)
+        competitorIndices = np.empty((selectionCount, tournamentSize), dtype = np.int64)
+
+        blockLength = max(1, (1 << 20) // populationSize)
+        for blockStart in range(0, selectionCount, blockLength) :
+            blockEnd = min(blockStart + blockLength, selectionCount)
+            randomKeys = randomGenerator.random((blockEnd - blockStart, populationSize))
+            competitorIndices[blockStart:blockEnd] = np.argpartition(randomKeys, tournamentSize - 1, axis = 1)[:, :tournamentSize]
+
+        return competitorIndices
     
     # Function:
     # --------- 
@@ -333,18 +758,32 @@ class GeneticAlgorithm :
     #
     #   Crossover methodology:
     #   ----------------------
-    #   This first iteration of the crossover algorithm only crosses over the
-    #   values in the Mapping Operator Tensor by simply picking one of
-    #   the two values in each parent to pass on to the single child. This
-    #   random picking happens at a rate represented by the crossover rate
-    #   that is global to the Genetic Algorithm.
-    #
-    #       Methodology example:
-    #       --------------------
+    #   The backing tensors of both parents are laid out as flat buffers. When
+    #   the parents differ in depth the shorter parent is the primary parent and
+    #   the longer parent's layers are cut down to line up with it. The child
+    #   is then built from the two buffers by the crossover operator selected by
+    #   crossoverMethodIndicator. Each operator is a handful of array
+    #   operations per child:
+    #
+    #       0. Uniform: Each value is picked from one of the two parents with
+    #          even odds.
+    #       1. Single Point: Values before a random point come from the primary
+    #          parent and values after it from the other parent.
+    #       2. Layer-wise: Each whole layer, along with its bias, is picked from
+    #          one of the two parents with even odds.
+    #       3. Blend: Every value is the same random weighted average of the
+    #          two parents' values.
+    #
+    #       Methodology example (Uniform):
+    #       ------------------------------
     #       Parent A Tensor: [1, 2, 3, 9]
     #       Parent B Tensor: [4, 5, 6, 8]
     #       Child Tensor:    [1, 5, 3, 8]
     #
+    #   Whether a pair is crossed over at all happens at a rate represented by
+    #   the crossover rate that is global to the Genetic Algorithm. A pair that
+    #   is not crossed over passes on the fitter parent.
+    #
     #   General Crossover information:
     #   ------------------------------
     #   Crossover occurs based on the specified crossover rate. Crossover rates are 
@@ -369,88 +808,82 @@ class GeneticAlgorithm :
     def crossover(self) :
         
         crossedOverPopulation = []
+        randomGenerator = self.evaluationModule.getRandomGenerator()
 
         # Go through the double-sized population
         for i in range(int(len(self.population) / 2)) :
-
-            # Extract the parents to be crossed over
-            parentA = self.population[i]
-            i = i + 1
-            parentB = self.population[i]
-
-            # Determine whether to crossover or not
-            if random.uniform(0, 1) > self.crossoverRate :
-                # If we dont then take the stronger parent
-                if parentA.getFitness() <= parentB.getFitness() :
-                    crossedOverPopulation.append(parentA)
-                else :
-                    crossedOverPopulation.append(parentB)
-                continue
-
-            newPopulationMemberBackingTensor = []
-
-            # Get the backing tensors
-            parentABackingTensor = parentA.getBackingTensor()
-            parentABackingTensorBiases = parentA.getBackingTensorBiases()
-
-            # Get the backing tensor biases
-            parentBBackingTensor = parentB.getBackingTensor()
-            parentBBackingTensorBiases = parentB.getBackingTensorBiases()
-
-            # Set the primary parent to be the one with the shorter tensor
-            if len(parentABackingTensor) > len(parentBBackingTensor) :
-                # Set the backing tensors
-                temp = parentABackingTensor
-                parentABackingTensor = parentBBackingTensor
-                parentBBackingTensor = temp
-
-                # Set the backing tensor biases
-                temp = parentABackingTensorBiases
-                parentABackingTensorBiases = parentBBackingTensorBiases
-                parentBBackingTensorBiases = temp
-            
-            # Crossover values in the backing tensor between the two parents
-            for j in range(len(parentABackingTensor)) :
-
-                newPopulationMemberBackingTensorRank2TensorMember = []
-                parentABackingTensorRank2TensorMember = parentABackingTensor[j].numpy()
-                parentBBackingTensorRank2TensorMember = parentBBackingTensor[j].numpy()
-
-                for k in range(len(parentABackingTensorRank2TensorMember)) :
-
-                    newPopulationMemberBackingTensorRank1TensorMember = []
-                    parentABackingTensorRank1TensorMember = parentABackingTensorRank2TensorMember[k]
-                    parentBBackingTensorRank1TensorMember = parentBBackingTensorRank2TensorMember[k]
-                    
-                    for l in range(len(parentABackingTensorRank1TensorMember)) :
-                        
-                        if random.uniform(0, 1) < .5 :
-                            newPopulationMemberBackingTensorRank1TensorMember.append(parentBBackingTensorRank1TensorMember[l])
-                        else :
-                            newPopulationMemberBackingTensorRank1TensorMember.append(parentABackingTensorRank1TensorMember[l])
-
-                    newPopulationMemberBackingTensorRank2TensorMember.append(newPopulationMemberBackingTensorRank1TensorMember)
-                    
-                newLayer = tf.convert_to_tensor(newPopulationMemberBackingTensorRank2TensorMember)
-                newPopulationMemberBackingTensor.append(newLayer)    
-
-            # Crossover the values in the backing tensor bias tensors
-            newPopulationMemberBackingTensorBiases = []
-            for j in range(len(parentABackingTensorBiases)) :
-
-                if random.uniform(0, 1) < .5 :
-                    newPopulationMemberBackingTensorBiases.append(parentBBackingTensorBiases[j])
-                else :
-                    newPopulationMemberBackingTensorBiases.append(parentABackingTensorBiases[j])
-            
-            newPopulationMember = MappingOperator(self.evaluationModule)
-            newPopulationMember.setBackingTensor(newPopulationMemberBackingTensor)
-            newPopulationMember.setBackingTensorBiases(newPopulationMemberBackingTensorBiases)
-
-            crossedOverPopulation.append(newPopulationMember)
+            crossedOverPopulation.append(self.crossoverParents(self.population[2 * i], self.population[2 * i + 1], randomGenerator))
 
         self.population = crossedOverPopulation
 
+    # Returns the child of two parents. A pair that is not crossed over returns the stronger parent itself,
+    # still clean, which is what lets evaluatePopulation() skip it.
+    def crossoverParents(self, parentA, parentB, randomGenerator) :
+
+        # Determine whether to crossover or not
+        if randomGenerator.random() > self.crossoverRate :
+            # If we dont then take the stronger parent
+            if parentA.getFitness() <= parentB.getFitness() :
+                return parentA
+            return parentB
+
+        # Set the primary parent to be the one with the shorter tensor
+        if len(parentA.getBackingTensor()) > len(parentB.getBackingTensor()) :
+            parentA, parentB = parentB, parentA
+
+        # Lay both parents out as flat buffers shaped like the primary parent
+        layerShapes = [tuple(np.shape(layer)) for layer in parentA.getBackingTensor()]
+        layerOffsets = Genome.computeLayerOffsets(layerShapes)
+        parentABuffer = parentA.getBackingTensorBuffer(layerShapes)
+        parentBBuffer = parentB.getBackingTensorBuffer(layerShapes)
+        parentABiases = np.asarray(parentA.getBackingTensorBiases(), dtype = np.float32)
+        parentBBiases = np.asarray(parentB.getBackingTensorBiases(), dtype = np.float32)[:len(parentABiases)]
+
+        # Crossover the parents with the selected operator
+        if self.crossoverMethodIndicator == 1 :
+            childBuffer, childBiases = self.crossoverSinglePoint(parentABuffer, parentBBuffer, parentABiases, parentBBiases, layerOffsets, randomGenerator)
+        elif self.crossoverMethodIndicator == 2 :
+            childBuffer, childBiases = self.crossoverLayerwise(parentABuffer, parentBBuffer, parentABiases, parentBBiases, layerOffsets, randomGenerator)
+        elif self.crossoverMethodIndicator == 3 :
+            childBuffer, childBiases = self.crossoverBlend(parentABuffer, parentBBuffer, parentABiases, parentBBiases, layerOffsets, randomGenerator)
+        else :
+            childBuffer, childBiases = self.crossoverUniform(parentABuffer, parentBBuffer, parentABiases, parentBBiases, layerOffsets, randomGenerator)
+
+        child = MappingOperator(self.evaluationModule, False)
+        child.setBackingTensorBuffer(childBuffer, layerShapes, childBiases)
+        return child
+
+    # Crossover Operators
+    # --------------------------------------------------------------------------
+    #   Each operator takes the flat buffers and biases of the two parents along
+    #   with the offsets of the layers in the buffers and returns the buffer and
+    #   biases of the child. See crossover() above.
+    # --------------------------------------------------------------------------
+    def crossoverUniform(self, parentABuffer, parentBBuffer, parentABiases, parentBBiases, layerOffsets, randomGenerator) :
+        childBuffer = np.where(randomGenerator.random(len(parentABuffer)) < .5, parentBBuffer, parentABuffer)
+        childBiases = np.where(randomGenerator.random(len(parentABiases)) < .5, parentBBiases, parentABiases)
+        return childBuffer, childBiases
+
+    def crossoverSinglePoint(self, parentABuffer, parentBBuffer, parentABiases, parentBBiases, layerOffsets, randomGenerator) :
+        crossoverPoint = int(randomGenerator.integers(0, len(parentABuffer) + 1))
+        childBuffer = np.concatenate((parentABuffer[:crossoverPoint], parentBBuffer[crossoverPoint:]))
+
+        # A layer's bias goes with the parent its first value came from
+        childBiases = np.where(layerOffsets[:-1] >= crossoverPoint, parentBBiases, parentABiases)
+        return childBuffer, childBiases
+
+    def crossoverLayerwise(self, parentABuffer, parentBBuffer, parentABiases, parentBBiases, layerOffsets, randomGenerator) :
+        layerMask = randomGenerator.random(len(parentABiases)) < .5
+        childBuffer = np.where(np.repeat(layerMask, np.diff(layerOffsets)), parentBBuffer, parentABuffer)
+        childBiases = np.where(layerMask, parentBBiases, parentABiases)
+        return childBuffer, childBiases
+
+    def crossoverBlend(self, parentABuffer, parentBBuffer, parentABiases, parentBBiases, layerOffsets, randomGenerator) :
+        blendWeight = np.float32(randomGenerator.random())
+        childBuffer = blendWeight * parentABuffer + (1 - blendWeight) * parentBBuffer
+        childBiases = blendWeight * parentABiases + (1 - blendWeight) * parentBBiases
+        return childBuffer, childBiases
+
     # Function:
     # --------- 
     #   mutate()
@@ -541,13 +974,18 @@ class GeneticAlgorithm :
     def mutate(self) :
         
         for mappingOperator in self.population :
-            mappingOperator.mutate(self.mutationRate,
-                                   self.mutationLikelihood,
-                                   self.biasMutationLikelihood,
-                                   self.mutationMagnitudeLow,
-                                   self.mutationMagnitudeHigh,
-                                   self.topologicalMutationRate,
-                                   self.valueReplacementBias)
+            self.mutateMember(mappingOperator)
+
+    # Mutates one Mapping Operator with the mutation parameters of the GA
+    def mutateMember(self, mappingOperator) :
+        mappingOperator.mutate(self.mutationRate,
+                               self.mutationLikelihood,
+                               self.biasMutationLikelihood,
+                               self.mutationMagnitudeLow,
+                               self.mutationMagnitudeHigh,
+                               self.topologicalMutationRate,
+                               self.valueReplacementBias)
+
     # Function:
     # --------- 
     #   evaluatePopulation()
@@ -573,71 +1011,172 @@ class GeneticAlgorithm :
     #   function in the Data Frame sets the measured fitness value on the 
     #   Mapping Operator that is passed into it.
     #
-    #   This implementation uses Python's multiprocessing library to evaluate
-    #   the members of the population on all available processors.
+    #   The population is evaluated by a pool of worker processes that is
+    #   started once at the beginning of run() and reused every generation. The
+    #   workers send back only the fitness of each Mapping Operator, which is
+    #   written onto the population in place. See EvaluatorPool.py. When a
+    #   coordinator address is set the workers are evaluation workers that
+    #   connect over a socket, possibly from other machines, instead. See
+    #   DistributedEvaluation.py.
+    #
+    #   When tensorized population evaluation is enabled the Mapping Operators
+    #   are handed to the Data Frame together. It groups them by depth and
+    #   scores each group with batched matmuls, so the time it takes to evaluate
+    #   a generation scales with the work done rather than with the number of
+    #   Mapping Operators. See DataFrame.evaluateMappingOperators().
+    #
+    #   When a fitness sample size is set every generation is scored on a fresh
+    #   random sample of the Stimulus-Product pairs instead of all of them. See
+    #   DataFrame.setSample() and rescoreBestMembers().
+    #
+    #   Only dirty Mapping Operators are evaluated. Elites are clones of a
+    #   member that was already evaluated and keep its fitness along with the
+    #   version it was evaluated at. A pair that is not crossed over passes on
+    #   the parent object itself, not a copy of it, so a child that mutation
+    #   then leaves alone is still clean and is not evaluated again. See
+    #   MappingOperator.isDirty() and crossoverParents().
+    #   The dirty members that turn out to be copies of a Mapping Operator that
+    #   was scored before take their fitness from the fitness cache, and
+    #   identical members of one generation are evaluated once. Only the rest
+    #   are sent to the Data Frame. See FitnessCache.py.
     # --------------------------------------------------------------------------
     def evaluatePopulation(self) :
 
-        # Define the population accumulator
-        multiprocessingManager = Manager()
-        populationAccumulator = multiprocessingManager.Queue()
-       
-        # Danger check
-        if len(self.population) % cpu_count() != 0 :
-            print("The population is not divisible by the CPU count!")
-            print("The CPU count is: ", cpu_count())
-            print("Exiting...")
-            sys.exit()
-
-        # Split the population into equal parts in accordance with the cpu count
-        splitLength = cpu_count()
-        splitPopulation = [self.population[i * splitLength:(i + 1) * splitLength] for i in range((len(self.population) + splitLength - 1) // splitLength)]
-            
-        # Initialize the process pool
-        with Pool(processes = cpu_count()) as processPool :
+        sampleIndices = self.drawFitnessSample()
 
-            # Map the population to a process in the pool and execute it
-            for subPopulation in splitPopulation :
-                processPool.apply(self.evaluateSubPopulation, (subPopulation, populationAccumulator))
+        # Sampled fitnesses differ from one sample to the next so every member is
+        # scored on the new sample and nothing is cached
+        if sampleIndices is not None :
+            self.evaluateMappingOperators(self.population, sampleIndices)
+            return
 
-        # Set the accumulated evaluated population back to the global population
-        accumulatedPopulation = []
-        while populationAccumulator.empty() != True :
-            accumulatedPopulation.append(populationAccumulator.get())
-        
-        self.population = accumulatedPopulation
+        # Members that have not changed since they were evaluated keep their fitness
+        dirtyMembers = [mappingOperator for mappingOperator in self.population if mappingOperator.isDirty()]
+
+        if self.fitnessCache is None :
+            self.evaluateMappingOperators(dirtyMembers, None)
+            return
+
+        # Take what fitnesses we can from the cache and evaluate one of each unseen genome
+        unseenGenomes = {}
+        for mappingOperator in dirtyMembers :
+            genomeHash = mappingOperator.getGenomeHash()
+            if genomeHash in unseenGenomes :
+                unseenGenomes[genomeHash].append(mappingOperator)
+                continue
+            fitness = self.fitnessCache.lookup(genomeHash)
+            if fitness is None :
+                unseenGenomes[genomeHash] = [mappingOperator]
+            else :
+                mappingOperator.setFitness(fitness)
+
+        self.evaluateMappingOperators([duplicates[0] for duplicates in unseenGenomes.values()], None)
+
+        for genomeHash, duplicates in unseenGenomes.items() :
+            fitness = duplicates[0].getFitness()
+            self.fitnessCache.store(genomeHash, fitness)
+            for mappingOperator in duplicates[1:] :
+                mappingOperator.setFitness(fitness)
+
+    # Evaluates the given Mapping Operators on the worker processes, or in this process if there are none
+    def evaluateMappingOperators(self, mappingOperators, sampleIndices) :
+
+        if len(mappingOperators) == 0 :
+            return
+
+        # Evaluate on the worker processes if there are any
+        if self.evaluatorPool is not None :
+            self.evaluatorPool.evaluate(mappingOperators, sampleIndices)
+            return
+
+        # Otherwise evaluate in this process
+        dataFrame = self.evaluationModule.getDataFrame()
+        dataFrame.setSample(sampleIndices)
+        try :
+            self.evaluateInProcess(mappingOperators)
+        finally :
+            dataFrame.setSample(None)
+
+    # Evaluates the given Mapping Operators against the Data Frame in this process
+    def evaluateInProcess(self, mappingOperators) :
+        dataFrame = self.evaluationModule.getDataFrame()
+        if self.tensorizedPopulationEvaluation :
+            dataFrame.evaluateMappingOperators(mappingOperators)
+        else :
+            for mappingOperator in mappingOperators :
+                dataFrame.evaluateMappingOperator(mappingOperator)
+
+    # Whether each generation is scored on a sample of the Data Frame
+    def isSampling(self) :
+        return 0 < self.fitnessSampleSize < self.evaluationModule.getDataFrame().getStimulusProductPairCount()
+
+    # Draws the Stimulus-Product pairs the next generation is scored on, or None to score on every pair
+    def drawFitnessSample(self) :
+        if not self.isSampling() :
+            return None
+        pairCount = self.evaluationModule.getDataFrame().getStimulusProductPairCount()
+        return np.sort(self.evaluationModule.getRandomGenerator().choice(pairCount, self.fitnessSampleSize, replace = False))
+
+    # The best fitness the run reports and stops on. Sampled fitnesses are only estimates.
+    def getReportedBestFitness(self) :
+        if self.isSampling() :
+            return self.bestFitness
+        return self.getBestMember().getFitness()
 
     # Function:
     # --------- 
-    #   evaluateSubPopulation()
+    #   rescoreBestMembers()
     # --------------------------------------------------------------------------
     # Description:
     # ------------
-    #   Evaluates the sub popuation passed to it and places it in the accumulator
-    #   queue.
+    #   Scores the elites and the best member on every Stimulus-Product pair.
     # --------------------------------------------------------------------------
     # Parameters:
     # -----------
-    #   subPopulation - The portion of the population to evaluate in this Process.
-    #   accumulator - A Python multiprocessing.Queue() object that acts as an
-    #                 accumulator for the evaluated Mapping Operators
+    #   None
     # --------------------------------------------------------------------------
     # Result:
     # --------
-    #   The evaluated members of the sub population have been placed in the
-    #   accumulator queue.
+    #   The elites carry their full fitness. If one of them beats the best
+    #   fitness so far, a copy of it is kept as the best Mapping Operator.
     # --------------------------------------------------------------------------
     # Explanation:
     # ------------
-    #   This function evaluates the members of a portion of the global population.
-    #   It is set off as a Process in Python's multiprocessing library.
+    #   When the population is scored on a sample of the Data Frame the fitness
+    #   of each Mapping Operator is an estimate, and the member that looks best
+    #   on one sample may just have been lucky. Selection can live with that
+    #   noise but the best fitness the run reports should not, so it is only
+    #   ever taken from full scores. Re-scoring runs in this process every
+    #   fullRescoringInterval generations, if it is above 0, and once more at
+    #   the end of the run,
+    #   and generationCount is the generation the re-score is recorded under.
+    #   It only touches the elites, so it costs a small fraction of a full
+    #   generation.
     # --------------------------------------------------------------------------
-    def evaluateSubPopulation(self, subPopulation, accumulator) :
-        
-        for mappingOperator in subPopulation :
-            self.evaluationModule.getDataFrame().evaluateMappingOperator(mappingOperator)
-            accumulator.put(mappingOperator)
-            
+    def rescoreBestMembers(self, generationCount) :
+
+        candidates = list(self.elites)
+        if len(candidates) == 0 :
+            candidates = [self.getBestMember().clone()]
+        self.evaluateInProcess(candidates)
+
+        bestCandidate = min(candidates, key = lambda mappingOperator : mappingOperator.getFitness())
+        if self.bestMappingOperator is None or bestCandidate.getFitness() < self.bestFitness :
+            self.bestMappingOperator = bestCandidate.clone()
+            self.setNewBestFitness(bestCandidate.getFitness(), generationCount)
+
+    # Records a new best fitness and the fitness gain it made in the performance metrics
+    def setNewBestFitness(self, newBestFitness, generationCount) :
+
+        # The first best fitness of a run is not a gain over anything
+        if self.lastFitnessGainGeneration is not None :
+            self.evaluationModule.addFitnessGain(self.bestFitness - newBestFitness)
+            self.evaluationModule.addGenerationCountAtFitnessGain(generationCount - self.lastFitnessGainGeneration)
+        self.lastFitnessGainGeneration = generationCount
+
+        self.bestFitness = newBestFitness
+        print(" --------------------------------- New Best Fitness = ", self.bestFitness)
+
     # Function:
     # --------- 
     #   saveElites()
@@ -669,9 +1208,10 @@ class GeneticAlgorithm :
 
         numberToSave = int(self.elitismWeight * self.populationSize)
 
+        # The fittest members are at the end of the ranking
         startSavingPoint = len(self.population) - numberToSave
-        for i in range(startSavingPoint, len(self.population)) :
-            self.elites.append(self.population[i].clone())
+        for populationIndex in self.populationRanking[startSavingPoint:] :
+            self.elites.append(self.population[populationIndex].clone())
 
     # Function:
     # --------- 
@@ -707,7 +1247,7 @@ class GeneticAlgorithm :
     # ---------------------------------------------------------------------------
     # Description:
     # ------------
-    #   Sorts the Mapping Operators in the population by their fitness level
+    #   Ranks the Mapping Operators in the population by their fitness level
     #   in DESCENDING order.
     # ---------------------------------------------------------------------------
     # Parameters:
@@ -716,15 +1256,24 @@ class GeneticAlgorithm :
     # ---------------------------------------------------------------------------
     # Result: 
     # --------
-    #   The population has been sorted by fitness in DESCENDING order.
+    #   The fitness index of the population has been rebuilt. The population
+    #   list itself is left in place.
     # ---------------------------------------------------------------------------
     # Explanation:
     # ------------
-    #   Uses Merge Sort to sort the evaluated population to get set up for
-    #   the Selection process in the next iteration of the algorithm.
+    #   Gathers the fitnesses of the population into an array and argsorts it.
+    #   The resulting ranking holds population indices from the least fit to
+    #   the fittest, so the best member is at populationRanking[-1]. Best member
+    #   lookup, elite extraction and selection read the ranking instead of the
+    #   population being reordered every generation.
     # ---------------------------------------------------------------------------
     def sortPopulation(self) :
-        self.population = self.mergeSort(self.population)
+        self.populationFitnesses = np.array([mappingOperator.getFitness() for mappingOperator in self.population], dtype = np.float64)
+        self.populationRanking = np.argsort(-self.populationFitnesses, kind = 'stable')
+
+    # Returns the fittest member of the population as of the last sortPopulation()
+    def getBestMember(self) :
+        return self.population[self.populationRanking[-1]]
 
     # Function:
     # --------- 
@@ -754,86 +1303,44 @@ class GeneticAlgorithm :
         self.population.clear()
         for i in range(self.populationSize) :
             self.population.append(bestMember.clone())
-        
-    # Function:
-    # --------- 
-    #   mergeSort()
-    # ---------------------------------------------------------------------------
-    # Description:
-    # ------------
-    #   The sorting portion of the Merge Sort algorithm.
-    # ---------------------------------------------------------------------------
-    # Parameters:
-    # -----------
-    #   mergingPopulation - The population as it stands after the Evaluation process.
-    # ---------------------------------------------------------------------------
-    # Returns: 
-    # --------
-    #   Portions of the population based on the recursive depth. The shallowest
-    #   depth returns the fully sorted population.
-    # ---------------------------------------------------------------------------
-    # Explanation:
-    # ------------
-    #   Performs the sorting portion of Merge Sort. Merge Sort is used as the
-    #   sorting algorithm to order the Mapping Operators in the population
-    #   by fitness value.
-    #
-    #   Merging is done in DESCENDING ORDER
-    # ---------------------------------------------------------------------------
-    def mergeSort(self, mergingPopulation) :
-
-        if len(mergingPopulation) == 1 :
-            return mergingPopulation
-
-        mid = len(mergingPopulation) // 2
-        a = mergingPopulation[:mid]
-        b = mergingPopulation[mid:]
-
-        sortedA = self.mergeSort(a)
-        sortedB = self.mergeSort(b)
-
-        return self.merge(sortedA, sortedB)
 
     # Function:
     # --------- 
-    #   merge()
-    # ---------------------------------------------------------------------------
+    #   receiveMigrants()
+    # --------------------------------------------------------------------------
     # Description:
     # ------------
-    #   The merging portion of the Merge Sort algorithm.
-    # ---------------------------------------------------------------------------
+    #   Replaces the least fit members of the population with Mapping Operators
+    #   that migrated from another population.
+    # --------------------------------------------------------------------------
     # Parameters:
     # -----------
-    #   a - The first half of the population to be merged
-    #   b - The second half of the population to be merged
-    # ---------------------------------------------------------------------------
-    # Returns: 
+    #   migrants - The Mapping Operators to take in. They keep the fitness they
+    #              were evaluated at.
+    # --------------------------------------------------------------------------
+    # Result:
     # --------
-    #   The merged population halves in sorted order.
-    # ---------------------------------------------------------------------------
-    # Explanation:
-    # ------------
-    #   Performs the merging portion of Merge Sort. Merge Sort is used as the
-    #   sorting algorithm to order the Mapping Operators in the population
-    #   by fitness value. This is one of two functions used in the algorithm.
-    #
-    #   Merges in DESCENDING ORDER!
-    # ---------------------------------------------------------------------------
-    def merge(self, a, b) :
-
-        merged = []
-
-        while len(a) > 0 and len(b) > 0 :
-
-            if a[0].getFitness() > b[0].getFitness() :
-                merged.append(a.pop(0))
-            else :
-                merged.append(b.pop(0))
+    #   The migrants have taken the places of as many of the least fit members
+    #   and the population has been ranked again. See IslandModel.py.
+    # --------------------------------------------------------------------------
+    def receiveMigrants(self, migrants) :
 
-        while len(a) > 0 :
-            merged.append(a.pop(0))
+        migrants = migrants[:len(self.population)]
+        for i in range(len(migrants)) :
+            # Migrants arrive without an Evaluation Module. See MappingOperator.__getstate__().
+            migrants[i].evaluationModule = self.evaluationModule
+            self.population[self.populationRanking[i]] = migrants[i]
 
-        while len(b) > 0 :
-            merged.append(b.pop(0))
+        self.sortPopulation()
 
-        return merged
\ No newline at end of file
+    # Returns copies of the fittest members of the population, fittest first
+    def getMigrants(self, migrantCount) :
+        return [self.population[populationIndex].clone() for populationIndex in self.populationRanking[::-1][:migrantCount]]
+
+    # Returns the best Mapping Operator of the run so far and its fitness on every Stimulus-Product pair
+    def getFullyScoredBest(self, generationCount) :
+        if self.isSampling() :
+            self.rescoreBestMembers(generationCount)
+            return self.bestMappingOperator, self.bestFitness
+        bestMember = self.getBestMember()
+        return bestMember, bestMember.getFitness()
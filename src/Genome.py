@@ -0,0 +1,123 @@
+import numpy as np
+
+# -------------------------------------------------------------
+# File:
+# -----
+#   Genome.py
+# -------------------------------------------------------------
+# Description:
+# ------------
+#   The Genome file contains the Genome class. The Genome class
+#   is a compact representation of the backing tensor and biases
+#   of a Mapping Operator:
+#
+#       1. Every layer of the backing tensor is held in one flat
+#          float32 buffer. An offset table records where each
+#          layer starts and ends in the buffer.
+#       2. The biases are held in a float32 array.
+#       3. The layers handed out for the forward pass are views
+#          into the buffer, so nothing is copied to run the
+#          network.
+#
+#   Copying, pickling, mutating and crossing over a Genome are
+#   operations on a single buffer instead of on nested lists of
+#   Python objects. See MappingOperator.py for how it is used.
+#
+#   Buffer layout example:
+#   ----------------------
+#   productVectorSize = 2
+#   backingTensorDepth = 3
+#
+#       Layer shapes:  [(2, 2), (2, 2), (2, 1)]
+#       Layer offsets: [0, 4, 8, 10]
+#       Buffer:        [a a a a | b b b b | c c]
+# -------------------------------------------------------------
+
+class Genome :
+
+    # Genome Buffer
+    buffer = None
+
+    # Layer Layout
+    layerShapes = []
+    layerOffsets = None
+
+    # Biases
+    biases = None
+
+    def __init__(self, layers, biases) :
+
+        # Lay out the layers
+        self.layerShapes = [tuple(np.shape(layer)) for layer in layers]
+        self.layerOffsets = Genome.computeLayerOffsets(self.layerShapes)
+
+        # Pack the layers into the buffer
+        self.buffer = np.empty(self.layerOffsets[-1], dtype = np.float32)
+        for i in range(len(layers)) :
+            self.buffer[self.layerOffsets[i]:self.layerOffsets[i + 1]] = np.asarray(layers[i], dtype = np.float32).ravel()
+
+        self.biases = np.array(biases, dtype = np.float32)
+
+    # Builds a Genome around an existing buffer and biases without copying them
+    @staticmethod
+    def fromBuffer(buffer, layerShapes, biases) :
+        genome = Genome.__new__(Genome)
+        genome.buffer = buffer
+        genome.layerShapes = list(layerShapes)
+        genome.layerOffsets = Genome.computeLayerOffsets(genome.layerShapes)
+        genome.biases = biases
+        return genome
+
+    # Computes the offset of each layer in the buffer. The last entry is the length of the buffer.
+    @staticmethod
+    def computeLayerOffsets(layerShapes) :
+        layerOffsets = np.zeros(len(layerShapes) + 1, dtype = np.int64)
+        for i in range(len(layerShapes)) :
+            layerOffsets[i + 1] = layerOffsets[i] + int(np.prod(layerShapes[i]))
+        return layerOffsets
+
+    def getDepth(self) :
+        return len(self.layerShapes)
+
+    def getLayer(self, index) :
+        return self.buffer[self.layerOffsets[index]:self.layerOffsets[index + 1]].reshape(self.layerShapes[index])
+
+    def getLayers(self) :
+        return [self.getLayer(i) for i in range(len(self.layerShapes))]
+
+    def getLayerShapes(self) :
+        return self.layerShapes
+
+    def getLayerOffsets(self) :
+        return self.layerOffsets
+
+    def getBuffer(self) :
+        return self.buffer
+
+    def setBuffer(self, buffer) :
+        self.buffer = buffer
+
+    def getBiases(self) :
+        return self.biases
+
+    def setBiases(self, biases) :
+        self.biases = np.array(biases, dtype = np.float32)
+
+    def copy(self) :
+        return Genome.fromBuffer(self.buffer.copy(), self.layerShapes, self.biases.copy())
+
+    # Inserts a layer and its bias at the given depth
+    def insertLayer(self, index, layer, bias) :
+        layers = self.getLayers()
+        layers.insert(index, layer)
+        biases = list(self.biases)
+        biases.insert(index, bias)
+        self.__init__(layers, biases)
+
+    # Deletes the layer and bias at the given depth
+    def deleteLayer(self, index) :
+        layers = self.getLayers()
+        del layers[index]
+        biases = list(self.biases)
+        del biases[index]
+        self.__init__(layers, biases)
@@ -0,0 +1,328 @@
+import queue
+import time
+import traceback
+import numpy as np
+from multiprocessing import Process, Queue
+
+from Checkpoint import Checkpoint
+from DataFrame import DataFrame
+from EvaluationModule import EvaluationModule
+from GeneticAlgorithm import GeneticAlgorithm
+from Profiler import Profiler
+
+# -------------------------------------------------------------
+# File:
+# -----
+#   IslandModel.py
+# -------------------------------------------------------------
+# Description:
+# ------------
+#   The IslandModel file contains the IslandModel class. The
+#   IslandModel class runs several Genetic Algorithms side by
+#   side, each evolving its own population (an island) in its
+#   own process. Every island runs the whole generation
+#   (selection, crossover, mutation and evaluation) so every
+#   core is busy for the whole generation and not only while the
+#   population is evaluated.
+#
+#   Every migrationInterval generations the islands stop, report
+#   their best fitness and hand copies of their fittest members
+#   (migrants) to the coordinator, which passes them on to the
+#   neighbouring islands:
+#
+#       Ring            - Island i sends its migrants to island
+#                         i + 1, and the last island to the first
+#       Fully Connected - Every island sends its migrants to
+#                         every other island
+#
+#   An island takes its migrants in by replacing its least fit
+#   members with them. See GeneticAlgorithm.receiveMigrants().
+#
+#   The Data Frame is placed in shared memory once and every
+#   island evaluates against it, just like the evaluator
+#   processes of EvaluatorPool.py. The population size is the
+#   size of each island.
+#
+#   With steady state evolution each island breeds a migration
+#   interval's worth of children one at a time between
+#   migrations. See GeneticAlgorithm.evolveSteadyState().
+# -------------------------------------------------------------
+# Messages:
+# ---------
+#   Coordinator to island, on the island's own queue:
+#       ('evolve', generations, migrants) - Take in the migrants,
+#                                           evolve for the given
+#                                           number of generations
+#                                           and report
+#       ('stop',)                         - Send the best Mapping
+#                                           Operator and exit
+#
+#   Island to coordinator, on the shared report queue:
+#       ('report', island, bestFitness, migrants,
+#        populationFitnessTotal, populationFitnessCount)
+#       ('final', island, bestMappingOperator, bestFitness)
+#       ('error', island, traceback)
+# -------------------------------------------------------------
+
+# Function:
+# ---------
+#   runIsland()
+# --------------------------------------------------------------------------
+# Description:
+# ------------
+#   The body of an island process.
+# --------------------------------------------------------------------------
+# Parameters:
+# -----------
+#   islandIndex - The index of this island
+#   parameters - The Evaluation Module parameters of this island
+#   sharedDataFrameDescriptor - The shared Data Frame to evaluate against
+#   commandQueue - The queue this island receives commands on
+#   reportQueue - The queue shared by every island to report on
+# --------------------------------------------------------------------------
+def runIsland(islandIndex, parameters, sharedDataFrameDescriptor, commandQueue, reportQueue) :
+
+    try :
+        # The island evaluates against the shared Data Frame and never builds one of its own
+        evaluationModule = EvaluationModule(parameters, DataFrame.attachSharedDataFrame(sharedDataFrameDescriptor))
+
+        ga = GeneticAlgorithm(evaluationModule)
+        ga.profiler = Profiler(evaluationModule)
+        ga.checkpoint = Checkpoint(evaluationModule)
+
+        # Generate, evaluate and rank the population of this island
+        ga.generatePopulation()
+        ga.evaluatePopulation()
+        ga.sortPopulation()
+        ga.saveElites()
+        generationCount = 0
+
+        while True :
+            command = commandQueue.get()
+
+            if command[0] == 'stop' :
+                bestMappingOperator, bestFitness = ga.getFullyScoredBest(generationCount)
+                reportQueue.put(('final', islandIndex, bestMappingOperator, bestFitness))
+                return
+
+            generations, migrants = command[1], command[2]
+            if len(migrants) > 0 :
+                ga.receiveMigrants(migrants)
+
+            if ga.evolutionModeIndicator == 1 :
+                # Breed a migration interval's worth of children one at a time
+                ga.maxGenerations = generationCount + generations
+                generationCount = ga.evolveSteadyState(generationCount, time.perf_counter())
+            else :
+                for i in range(generations) :
+                    ga.runGeneration(generationCount)
+                    ga.populationFitnessTotal = ga.populationFitnessTotal + float(np.mean(ga.populationFitnesses))
+                    ga.populationFitnessCount = ga.populationFitnessCount + 1
+                    generationCount = generationCount + 1
+
+            bestMappingOperator, bestFitness = ga.getFullyScoredBest(generationCount)
+            reportQueue.put(('report', islandIndex, bestFitness, ga.getMigrants(ga.evaluationModule.migrantCount), ga.populationFitnessTotal, ga.populationFitnessCount))
+
+    except Exception :
+        reportQueue.put(('error', islandIndex, traceback.format_exc()))
+
+class IslandModel :
+
+    # Evaluation Module
+    evaluationModule = None
+
+    # Configuration
+    # -------------
+    islandCount = 1
+    migrationInterval = 10
+    migrationTopologyIndicator = 0 # 0 = Ring, 1 = Fully Connected
+    maxGenerations = 10000000
+    maxRunSeconds = 0
+
+    # Fitnesses
+    bestFitness = 99999999
+    stopReason = None # Why the last run stopped: "maxGenerations", "solved" or "maxRunSeconds"
+
+    # Island Processes
+    islandProcesses = None
+    reportPollInterval = 1.0 # Seconds between checks that every island still waiting on is alive
+    commandQueues = None
+    reportQueue = None
+
+    def __init__(self, evaluationModule) :
+
+        # Evaluation Module
+        self.evaluationModule = evaluationModule
+
+        # Set the Island Model parameters from the evaluation module
+        self.islandCount = evaluationModule.islandCount
+        self.migrationInterval = max(1, evaluationModule.migrationInterval)
+        self.migrationTopologyIndicator = evaluationModule.migrationTopologyIndicator
+        self.maxGenerations = evaluationModule.maxGenerations
+        self.maxRunSeconds = evaluationModule.maxRunSeconds
+
+    # Function:
+    # ---------
+    #   run()
+    # --------------------------------------------------------------------------
+    # Description:
+    # ------------
+    #   Evolves the islands until the generation or time budget runs out or
+    #   an island maps the Data Frame perfectly.
+    # --------------------------------------------------------------------------
+    # Parameters:
+    # -----------
+    #   checkpointPath - Must be None. Island runs are not checkpointed.
+    # --------------------------------------------------------------------------
+    # Result:
+    # --------
+    #   The best Mapping Operator of every island has been set on the
+    #   Evaluation Module along with the performance metrics of the run.
+    # --------------------------------------------------------------------------
+    # Explanation:
+    # ------------
+    #   The islands are kept in step: each one evolves for one migration
+    #   interval and reports, and only when every island has reported are the
+    #   migrants routed and the next interval started. Each island is its own
+    #   process with its own random seed (randomSeed + island index) and
+    #   evaluates its population in that process.
+    # --------------------------------------------------------------------------
+    def run(self, checkpointPath = None) :
+
+        if checkpointPath is not None :
+            raise ValueError("Island model runs cannot be resumed from a checkpoint")
+
+        runStartTime = time.perf_counter()
+        dataFrame = self.evaluationModule.getDataFrame()
+        sharedDataFrameDescriptor = dataFrame.shareDataFrame()
+        try :
+            self.startIslands(sharedDataFrameDescriptor)
+
+            generationCount = 0
+            lastFitnessGainGeneration = None
+            migrants = [[] for i in range(self.islandCount)]
+            populationFitnessTotal = 0
+            populationFitnessCount = 0
+            while True :
+
+                # Evolve every island for one migration interval
+                generations = min(self.migrationInterval, self.maxGenerations - generationCount)
+                for islandIndex in range(self.islandCount) :
+                    self.commandQueues[islandIndex].put(('evolve', generations, migrants[islandIndex]))
+                reports = self.collectReports('report')
+                generationCount = generationCount + generations
+
+                # Check fitnesses
+                islandFitnesses = [reports[islandIndex][0] for islandIndex in range(self.islandCount)]
+                print("Generation ", generationCount - 1, " : Island Fitnesses = ", islandFitnesses)
+                currentBestFitness = min(islandFitnesses)
+                if currentBestFitness < self.bestFitness :
+                    if lastFitnessGainGeneration is not None :
+                        self.evaluationModule.addFitnessGain(self.bestFitness - currentBestFitness)
+                        self.evaluationModule.addGenerationCountAtFitnessGain(generationCount - lastFitnessGainGeneration)
+                    lastFitnessGainGeneration = generationCount
+                    self.bestFitness = currentBestFitness
+                    print(" --------------------------------- New Best Fitness = ", self.bestFitness)
+
+                # Every island reports its running population fitness total and count
+                populationFitnessTotal = sum(reports[islandIndex][2] for islandIndex in range(self.islandCount))
+                populationFitnessCount = sum(reports[islandIndex][3] for islandIndex in range(self.islandCount))
+
+                if self.isFinished(generationCount, runStartTime) :
+                    break
+
+                migrants = self.routeMigrants([reports[islandIndex][1] for islandIndex in range(self.islandCount)])
+
+            # Collect the best Mapping Operator of every island
+            for islandIndex in range(self.islandCount) :
+                self.commandQueues[islandIndex].put(('stop',))
+            finals = self.collectReports('final')
+
+        finally :
+            self.stopIslands()
+            dataFrame.releaseSharedDataFrame()
+
+        bestMappingOperator, bestFitness = min(finals.values(), key = lambda final : final[1])
+        bestMappingOperator.evaluationModule = self.evaluationModule
+        self.bestFitness = min(self.bestFitness, bestFitness)
+
+        # Set the best Mapping Operator and the performance metrics on the Evaluation Module
+        self.evaluationModule.setBestMappingOperator(bestMappingOperator)
+        self.evaluationModule.setTotalGenerations(generationCount)
+        self.evaluationModule.setBestFitness(bestFitness)
+        if populationFitnessCount > 0 :
+            self.evaluationModule.setAverageFitness(populationFitnessTotal / populationFitnessCount)
+
+    # Whether the run should stop after the current migration interval. Records why it stopped.
+    def isFinished(self, generationCount, runStartTime) :
+        if generationCount >= self.maxGenerations :
+            self.stopReason = "maxGenerations"
+        elif self.bestFitness <= 0 :
+            self.stopReason = "solved"
+        elif self.maxRunSeconds > 0 and time.perf_counter() - runStartTime >= self.maxRunSeconds :
+            self.stopReason = "maxRunSeconds"
+        else :
+            return False
+        return True
+
+    # Returns the migrants each island receives, given the migrants each island sent
+    def routeMigrants(self, sentMigrants) :
+        receivedMigrants = [[] for i in range(self.islandCount)]
+        for islandIndex in range(self.islandCount) :
+            if self.migrationTopologyIndicator == 0 :
+                receivedMigrants[(islandIndex + 1) % self.islandCount].extend(sentMigrants[islandIndex])
+            else :
+                for neighbourIndex in range(self.islandCount) :
+                    if neighbourIndex != islandIndex :
+                        receivedMigrants[neighbourIndex].extend(sentMigrants[islandIndex])
+        return receivedMigrants
+
+    # Starts one process per island
+    def startIslands(self, sharedDataFrameDescriptor) :
+
+        self.reportQueue = Queue()
+        self.commandQueues = []
+        self.islandProcesses = []
+        for islandIndex in range(self.islandCount) :
+            parameters = self.evaluationModule.getParameters()
+            if parameters['randomSeed'] is not None :
+                parameters['randomSeed'] = parameters['randomSeed'] + islandIndex
+            parameters.update({'islandCount' : 1, 'evaluationProcessCount' : 1, 'checkpointInterval' : 0, 'profileGenerations' : False, 'coordinatorAddress' : None, 'maxRunSeconds' : 0})
+
+            commandQueue = Queue()
+            islandProcess = Process(target = runIsland, args = (islandIndex, parameters, sharedDataFrameDescriptor, commandQueue, self.reportQueue), daemon = True)
+            islandProcess.start()
+            self.commandQueues.append(commandQueue)
+            self.islandProcesses.append(islandProcess)
+
+    # Waits for the given kind of message from every island and returns them by island index. An island
+    # process that dies without reporting, for instance when it is killed for running out of memory,
+    # fails the run instead of leaving the coordinator waiting on it forever.
+    def collectReports(self, kind) :
+        reports = {}
+        exitedIslands = set()
+        while len(reports) < self.islandCount :
+            try :
+                message = self.reportQueue.get(timeout = self.reportPollInterval)
+            except queue.Empty :
+                # An island's last report can still be on its way when the island is seen to have
+                # exited, so it is only given up on if nothing more arrives over the next interval
+                for islandIndex in exitedIslands :
+                    if islandIndex not in reports :
+                        raise RuntimeError("Island " + str(islandIndex) + " exited with code " + str(self.islandProcesses[islandIndex].exitcode) + " without reporting")
+                exitedIslands = {islandIndex for islandIndex in range(self.islandCount) if not self.islandProcesses[islandIndex].is_alive()}
+                continue
+            if message[0] == 'error' :
+                raise RuntimeError("Island " + str(message[1]) + " failed:\n" + message[2])
+            if message[0] == kind :
+                reports[message[1]] = message[2:]
+        return reports
+
+    # Stops every island process
+    def stopIslands(self) :
+        if self.islandProcesses is not None :
+            for islandProcess in self.islandProcesses :
+                islandProcess.join(timeout = 5)
+                if islandProcess.is_alive() :
+                    islandProcess.terminate()
+            self.islandProcesses = None
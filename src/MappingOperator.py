@@ -1,8 +1,10 @@
 
 import random as random
+import hashlib
 import numpy as np
 
-import tensorflow as tf
+import Backend
+from Genome import Genome
 
 # -------------------------------------------------------------
 # File:
@@ -41,6 +43,14 @@ class MappingOperator :
     # Fitness
     fitness = 99999999
 
+    # Modification Tracking
+    #   The modification version is bumped every time the backing tensor or
+    #   biases change and the evaluated version records the modification
+    #   version that the fitness was measured at. A Mapping Operator whose
+    #   versions differ is dirty and has to be evaluated again. See isDirty().
+    modificationVersion = 0
+    evaluatedVersion = -1
+
     # Product Vector Dimensions
     #   The Product vector is one dimensional in this implementation
     productVectorSize = 20
@@ -56,7 +66,16 @@ class MappingOperator :
     backingTensor = []
     backingTensorBiases = []
 
-    def __init__(self, evaluationModule) :
+    # Compact Genome
+    # --------------
+    #   When the compact genome is enabled the backing tensor and biases are
+    #   held in a single Genome instead of the lists above, and the layers
+    #   handed out by getBackingTensor() are views into its buffer. See
+    #   Genome.py.
+    compactGenome = False
+    genome = None
+
+    def __init__(self, evaluationModule, generateBackingTensor = True) :
 
         # Evaluation Module
         self.evaluationModule = evaluationModule
@@ -66,113 +85,171 @@ class MappingOperator :
         self.backingTensorValueLow = evaluationModule.backingTensorValueLow
         self.backingTensorValueHigh = evaluationModule.backingTensorValueHigh
         self.productVectorSize = evaluationModule.productVectorSize
+        self.compactGenome = evaluationModule.compactGenome
 
-        # Generation a random backing tensor
-        self.generateRandomBackingTensor()
+        # Generation a random backing tensor unless the caller is about to set one
+        if generateBackingTensor :
+            self.generateRandomBackingTensor()
 
     def generateRandomBackingTensor(self) :
 
+        randomGenerator = self.evaluationModule.getRandomGenerator()
+
         # Generate the random backing tensor
-        self.backingTensor.clear()
+        self.backingTensor = []
         for i in range(self.backingTensorDepth - 1) :
-            self.backingTensor.append(tf.random.uniform([self.productVectorSize, self.productVectorSize]))
+            self.backingTensor.append(Backend.getBackend().convert_to_tensor(randomGenerator.random((self.productVectorSize, self.productVectorSize), dtype = np.float32)))
 
         # Tack on the output layer
-        self.backingTensor.append(tf.random.uniform([self.productVectorSize, 1]))
+        self.backingTensor.append(Backend.getBackend().convert_to_tensor(randomGenerator.random((self.productVectorSize, 1), dtype = np.float32)))
         
         # Generate random biases
-        self.backingTensorBiases.clear()
+        self.backingTensorBiases = []
         for i in range(self.backingTensorDepth) :
             self.backingTensorBiases.append(random.uniform(self.backingTensorValueLow, self.backingTensorValueHigh))
+
+        # Pack everything into a single buffer if the compact genome is enabled
+        if self.compactGenome :
+            self.genome = Genome(self.backingTensor, self.backingTensorBiases)
+            self.backingTensor = None
+            self.backingTensorBiases = None
             
     # Function:
     # --------- 
-    #   evaluateMappingOperator()
+    #   mutate()
     # --------------------------------------------------------------------------
     # Description:
     # ------------
     #   See GeneticAlgorithm.py for an explanation on mutation.
     # --------------------------------------------------------------------------
-    def mutate(self, mutationRate, mutationLikelihood, biasMutationLikelihood, mutationMagnitudeLow, mutationMagnitudeHigh, topologicalMutationRate, valueReplacementBias) :
+    # Explanation:
+    # ------------
+    #   The values of the backing tensor are mutated a whole layer at a time.
+    #   See mutateValues(). A compact genome is mutated as one buffer. All of
+    #   the random draws come from the given NumPy random generator, which
+    #   defaults to the seedable generator owned by the Evaluation Module, so
+    #   a run can be reproduced.
+    # --------------------------------------------------------------------------
+    def mutate(self, mutationRate, mutationLikelihood, biasMutationLikelihood, mutationMagnitudeLow, mutationMagnitudeHigh, topologicalMutationRate, valueReplacementBias, randomGenerator = None) :
+
+        if randomGenerator is None :
+            randomGenerator = self.evaluationModule.getRandomGenerator()
 
         # Decide whether to mutate or not
-        if random.uniform(0, 1) > mutationRate :
+        if randomGenerator.random() > mutationRate :
             return
 
+        self.markModified()
+
         # Randomly add a new layer
-        addALayerChance = random.uniform(0, 1)
+        addALayerChance = randomGenerator.random()
         if addALayerChance < topologicalMutationRate :
 
             # Generate the randomized new layer
-            newLayer = tf.random.uniform([self.productVectorSize, self.productVectorSize])
+            newLayer = randomGenerator.random((self.productVectorSize, self.productVectorSize), dtype = np.float32)
             
-            # Insert the new layer
-            randomInsertionIndex = random.randint(0, len(self.backingTensor) - 1)
-            self.backingTensor.insert(randomInsertionIndex, newLayer)
-
             # Generate the randomized new bias value
-            newBias = random.uniform(self.backingTensorValueLow, self.backingTensorValueHigh)
+            newBias = randomGenerator.uniform(self.backingTensorValueLow, self.backingTensorValueHigh)
 
-            # Insert the new bias at the insertion index
-            self.backingTensorBiases.insert(randomInsertionIndex, newBias)
+            # Insert the new layer and the new bias at the insertion index
+            randomInsertionIndex = int(randomGenerator.integers(0, len(self.getBackingTensor())))
+            if self.compactGenome :
+                self.genome.insertLayer(randomInsertionIndex, newLayer, newBias)
+            else :
+                self.backingTensor.insert(randomInsertionIndex, Backend.getBackend().convert_to_tensor(newLayer))
+                self.backingTensorBiases.insert(randomInsertionIndex, newBias)
 
         # Randomly remove a layer
-        removeALayerChance = random.uniform(0, 1)
-        if removeALayerChance < topologicalMutationRate and len(self.backingTensor) > 2:
+        removeALayerChance = randomGenerator.random()
+        if removeALayerChance < topologicalMutationRate and len(self.getBackingTensor()) > 2:
+
+            # Only hidden layers are removed so that the output layer stays N X 1
+            randomDeletionIndex = int(randomGenerator.integers(0, len(self.getBackingTensor()) - 1))
+
+            # Delete the backing tensor layer and the bias value at the deletion index
+            if self.compactGenome :
+                self.genome.deleteLayer(randomDeletionIndex)
+            else :
+                del self.backingTensor[randomDeletionIndex]
+                del self.backingTensorBiases[randomDeletionIndex]
+
+        # Randomly mutate the values in the backing tensor and the bias values
+        if self.compactGenome :
+            self.genome.setBuffer(self.mutateValues(self.genome.getBuffer(), mutationLikelihood, valueReplacementBias, mutationMagnitudeLow, mutationMagnitudeHigh, randomGenerator))
+            self.genome.setBiases(self.mutateValues(self.genome.getBiases(), biasMutationLikelihood, valueReplacementBias, mutationMagnitudeLow, mutationMagnitudeHigh, randomGenerator, True))
+        else :
+            newBackingTensor = []
+            for layer in self.backingTensor :
+                newBackingTensor.append(Backend.getBackend().convert_to_tensor(self.mutateValues(layer, mutationLikelihood, valueReplacementBias, mutationMagnitudeLow, mutationMagnitudeHigh, randomGenerator)))
+            self.backingTensor = newBackingTensor
+            self.backingTensorBiases = self.mutateValues(self.backingTensorBiases, biasMutationLikelihood, valueReplacementBias, mutationMagnitudeLow, mutationMagnitudeHigh, randomGenerator, True).tolist()
+
+    # Function:
+    # --------- 
+    #   mutateValues()
+    # --------------------------------------------------------------------------
+    # Description:
+    # ------------
+    #   Mutates an array of weights or biases.
+    # --------------------------------------------------------------------------
+    # Parameters:
+    # -----------
+    #   values - The weights or biases to mutate
+    #   mutationLikelihood - The chance that each value is mutated
+    #   valueReplacementBias - The chance that a mutated value is replaced
+    #                          rather than adjusted
+    #   mutationMagnitudeLow - The smallest possible adjustment
+    #   mutationMagnitudeHigh - The largest possible adjustment
+    #   randomGenerator - The NumPy random generator to draw from
+    #   boundAdjustments - Whether adjusted values that leave the range of
+    #                      possible backing tensor values are thrown out
+    # --------------------------------------------------------------------------
+    # Returns:
+    # --------
+    #   A mutated float32 copy of the values.
+    # --------------------------------------------------------------------------
+    # Explanation:
+    # ------------
+    #   Each value is mutated with probability mutationLikelihood. A mutated
+    #   value is either replaced by a value drawn uniformly from the range of
+    #   possible backing tensor values (with probability valueReplacementBias)
+    #   or has a magnitude drawn uniformly from [mutationMagnitudeLow,
+    #   mutationMagnitudeHigh] added to or subtracted from it with even odds.
+    #   This is the same as drawing those numbers one value at a time, but the
+    #   mutation mask is drawn for the whole array at once and the replacement
+    #   values, magnitudes and signs are only drawn for the values it selects.
+    # --------------------------------------------------------------------------
+    def mutateValues(self, values, mutationLikelihood, valueReplacementBias, mutationMagnitudeLow, mutationMagnitudeHigh, randomGenerator, boundAdjustments = False) :
 
-            randomDeletionIndex = random.randint(0, len(self.backingTensor) - 1)
+        mutatedValues = np.array(values, dtype = np.float32)
+        flatValues = mutatedValues.reshape(-1)
 
-            # Delete the backing tensor layer at the deletion index
-            del self.backingTensor[randomDeletionIndex]
+        # Pick the values to mutate
+        mutationIndices = np.flatnonzero(randomGenerator.random(flatValues.shape[0]) < mutationLikelihood)
+        mutationCount = len(mutationIndices)
+        if mutationCount == 0 :
+            return mutatedValues
 
-            # Delete the bias value at the deletion index
-            del self.backingTensorBiases[randomDeletionIndex]
-            
-        # Randomly mutate the values in the backing tensor
-        newBackingTensor = []
-        for i in range(len(self.backingTensor)) :
-            rank2Tensor = self.backingTensor[i].numpy()
-            newRank2Tensor = []
-            for j in range(len(rank2Tensor)) :
-                rank1Tensor = rank2Tensor[j]
-                newRank1Tensor = []
-                for k in range(len(rank1Tensor)) :
-                    newTensorValue = rank1Tensor[k]
-                    if random.uniform(0, 1) < mutationLikelihood :
-                        if random.uniform(0, 1) < valueReplacementBias :
-                            newTensorValue = random.uniform(self.backingTensorValueLow, self.backingTensorValueHigh)
-                        else :
-                            mutationMagnitude = random.uniform(mutationMagnitudeLow, mutationMagnitudeHigh)
-                            if random.uniform(0, 1) < .5 :
-                                newTensorValue = newTensorValue + mutationMagnitude
-                            else :
-                                newTensorValue = newTensorValue - mutationMagnitude
-                    newRank1Tensor.append(newTensorValue)
-                newRank2Tensor.append(newRank1Tensor)
-            newBackingTensor.append(tf.convert_to_tensor(newRank2Tensor, dtype=np.float32))
-
-        # Set the mutated backing tensor to be the new backing tensor
-        self.backingTensor = newBackingTensor
-                            
-        # Randomly mutate the bias values
-        for i in range(len(self.backingTensorBiases)) :
-            if random.uniform(0, 1) < biasMutationLikelihood :
-                if random.uniform(0, 1) < valueReplacementBias :
-                    self.backingTensorBiases[i] = random.uniform(self.backingTensorValueLow, self.backingTensorValueHigh)
-                else :
-                    adjustedBias = self.backingTensorBiases[i]
-                    
-                    mutationMagnitude = random.uniform(mutationMagnitudeLow, mutationMagnitudeHigh)
-                    if random.uniform(0, 1) < .5 :
-                        adjustedBias = adjustedBias + mutationMagnitude
-                    else :
-                        adjustedBias = adjustedBias - mutationMagnitude
-
-                    if adjustedBias > self.backingTensorValueLow and adjustedBias < self.backingTensorValueHigh :
-                        self.backingTensorBiases[i] = adjustedBias
+        # Draw everything the selected values need
+        replacementMask = randomGenerator.random(mutationCount) < valueReplacementBias
+        replacementValues = randomGenerator.uniform(self.backingTensorValueLow, self.backingTensorValueHigh, mutationCount)
+        mutationMagnitudes = randomGenerator.uniform(mutationMagnitudeLow, mutationMagnitudeHigh, mutationCount)
+        mutationSigns = np.where(randomGenerator.random(mutationCount) < .5, 1.0, -1.0)
+
+        # Adjust the values and keep them in range if asked to
+        currentValues = flatValues[mutationIndices]
+        adjustedValues = currentValues + mutationSigns * mutationMagnitudes
+        if boundAdjustments :
+            adjustedValues = np.where((adjustedValues > self.backingTensorValueLow) & (adjustedValues < self.backingTensorValueHigh), adjustedValues, currentValues)
+
+        flatValues[mutationIndices] = np.where(replacementMask, replacementValues, adjustedValues)
+
+        return mutatedValues
                         
+    # Setting the fitness marks the Mapping Operator as evaluated
     def setFitness(self, fitness) :
         self.fitness = fitness
+        self.evaluatedVersion = self.modificationVersion
 
     def getFitness(self) :
         return self.fitness
@@ -184,19 +261,106 @@ class MappingOperator :
         return self.productVectorSize
 
     def getBackingTensor(self) :
+        if self.compactGenome :
+            return self.genome.getLayers()
         return self.backingTensor
 
     def getBackingTensorBiases(self) :
+        if self.compactGenome :
+            return self.genome.getBiases()
         return self.backingTensorBiases
 
     def setBackingTensor(self, newBackingTensor) :
-        self.backingTensor = newBackingTensor
+        if self.compactGenome :
+            self.genome = Genome(newBackingTensor, self.genome.getBiases() if self.genome is not None else [])
+        else :
+            self.backingTensor = newBackingTensor
+        self.markModified()
 
     def setBackingTensorBiases(self, newBiases) :
-        self.backingTensorBiases = newBiases
+        if self.compactGenome :
+            self.genome.setBiases(newBiases)
+        else :
+            self.backingTensorBiases = newBiases
+        self.markModified()
+
+    # Records that the backing tensor or biases have changed since the last evaluation
+    def markModified(self) :
+        self.modificationVersion = self.modificationVersion + 1
+
+    # Whether the backing tensor or biases have changed since the fitness was last set
+    def isDirty(self) :
+        return self.evaluatedVersion != self.modificationVersion
+
+    def getGenome(self) :
+        return self.genome
+
+    # Returns the backing tensor as one flat float32 buffer. If layer shapes are given, each
+    # layer is first cut down to its given shape so that two Mapping Operators line up.
+    def getBackingTensorBuffer(self, layerShapes = None) :
+        backingTensor = self.getBackingTensor()
+        if layerShapes is None :
+            layerShapes = [tuple(np.shape(layer)) for layer in backingTensor]
+
+        # A compact genome that already has the right shape is handed out as is
+        if self.compactGenome and list(self.genome.getLayerShapes()) == list(layerShapes) :
+            return self.genome.getBuffer()
+
+        return np.concatenate([np.asarray(backingTensor[i], dtype = np.float32)[:layerShapes[i][0], :layerShapes[i][1]].ravel() for i in range(len(layerShapes))])
+
+    # Sets the backing tensor from one flat float32 buffer laid out with the given layer shapes
+    def setBackingTensorBuffer(self, buffer, layerShapes, biases) :
+        if self.compactGenome :
+            self.genome = Genome.fromBuffer(buffer, layerShapes, np.asarray(biases, dtype = np.float32))
+        else :
+            layerOffsets = Genome.computeLayerOffsets(layerShapes)
+            self.backingTensor = [Backend.getBackend().convert_to_tensor(buffer[layerOffsets[i]:layerOffsets[i + 1]].reshape(layerShapes[i])) for i in range(len(layerShapes))]
+            self.backingTensorBiases = np.asarray(biases, dtype = np.float32).tolist()
+        self.markModified()
+
+    # Function:
+    # ---------
+    #   getGenomeHash()
+    # --------------------------------------------------------------------------
+    # Description:
+    # ------------
+    #   Hashes the contents of the backing tensor and the biases.
+    # --------------------------------------------------------------------------
+    # Returns:
+    # --------
+    #   A bytes digest that is the same for any two Mapping Operators with the
+    #   same layer shapes, weights and biases.
+    # --------------------------------------------------------------------------
+    # Explanation:
+    # ------------
+    #   The layer shapes are hashed along with the values so that two backing
+    #   tensors holding the same numbers in a different topology do not
+    #   collide. BLAKE2b reads the flat buffer at memory speed, which is far
+    #   cheaper than evaluating the Mapping Operator. See FitnessCache.py.
+    # --------------------------------------------------------------------------
+    def getGenomeHash(self) :
+        backingTensor = self.getBackingTensor()
+        layerShapes = np.array([np.shape(layer) for layer in backingTensor], dtype = np.int64)
+
+        genomeHash = hashlib.blake2b(digest_size = 16)
+        genomeHash.update(layerShapes.tobytes())
+        genomeHash.update(np.ascontiguousarray(self.getBackingTensorBuffer(), dtype = np.float32).tobytes())
+        genomeHash.update(np.asarray(self.getBackingTensorBiases(), dtype = np.float32).tobytes())
+        return genomeHash.digest()
+
+    # Drop the Evaluation Module when pickling so that sending a Mapping Operator
+    # to an evaluator process does not drag the Data Frame along with it. The
+    # layers are sent as NumPy arrays.
+    def __getstate__(self) :
+        state = self.__dict__.copy()
+        state['evaluationModule'] = None
+        if not self.compactGenome :
+            state['backingTensor'] = [np.asarray(layer) for layer in self.backingTensor]
+        return state
 
     def clone(self) :
-        clone = MappingOperator(self.evaluationModule)
+        # The backing tensor is copied in below, so no random one is generated to be thrown away
+        clone = MappingOperator(self.evaluationModule, False)
 
         clone.backingTensorDepth = self.backingTensorDepth
         clone.backingTensorValueLow = self.backingTensorValueLow
@@ -206,25 +370,24 @@ class MappingOperator :
 
         clone.setProductVectorSize(self.productVectorSize)
 
-        cloneBackingTensor = []
+        # A compact genome is copied in one go
+        if self.compactGenome :
+            clone.genome = self.genome.copy()
+        else :
+            cloneBackingTensor = []
+            for i in range(len(self.backingTensor)) :
+                cloneBackingTensor.append(Backend.getBackend().convert_to_tensor(np.array(self.backingTensor[i])))
 
-        for i in range(len(self.backingTensor)) :
-            backingTensorRank2Tensor = self.backingTensor[i].numpy()
-            newBackingRank2Tensor = []
-            for j in range(len(backingTensorRank2Tensor)) :
-                backingTensorRank1Tensor = self.backingTensorRank2Tensor[j]
-                newBackingRank1Tensor = []
-                for k in range(len(backingTensorRank1Tensor)) :
-                    newBackingRank1Tensor.append(backingTensorRank1Tensor[k])
-                newBackingRank2Tensor.append(newBackingRank1Tensor)
-            cloneBackingTensor.append(tf.convert_to_tensor(newBackingRank2Tensor))
+            clone.setBackingTensor(cloneBackingTensor)
 
-        clone.setBackingTensor(cloneBackingTensor)
+            cloneBackingTensorBiases = []
+            for i in range(len(self.backingTensorBiases)) :
+                cloneBackingTensorBiases.append(self.backingTensorBiases[i])
 
-        cloneBackingTensorBiases = []
-        for i in range(len(self.backingTensorBiases)) :
-            cloneBackingTensorBiases.append(self.backingTensorBiases[i])
+            clone.setBackingTensorBiases(cloneBackingTensorBiases)
 
-        clone.setBackingTensorBiases(cloneBackingTensorBiases)
+        # A clone of an evaluated Mapping Operator does not need evaluating again
+        clone.modificationVersion = self.modificationVersion
+        clone.evaluatedVersion = self.evaluatedVersion
         
         return clone
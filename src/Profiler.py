@@ -0,0 +1,194 @@
+import csv
+import json
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+
+# -------------------------------------------------------------
+# File:
+# -----
+#   Profiler.py
+# -------------------------------------------------------------
+# Description:
+# ------------
+#   The Profiler file contains the Profiler class. The Profiler
+#   class measures where the time of each generation of the
+#   Genetic Algorithm goes:
+#
+#       1. Every phase of a generation (selection, crossover,
+#          mutate, injectElites, evaluatePopulation,
+#          sortPopulation and saveElites, or in steady state
+#          breedChild, submitChild or evaluateChild, waitForChild
+#          and insertChild) is timed with the wall clock and the
+#          net change in the number of memory blocks the
+#          interpreter holds is recorded with it.
+#       2. Each measurement is written out as a record as soon as
+#          the generation ends.
+#       3. A summary table of every phase is printed when the run
+#          is over.
+# -------------------------------------------------------------
+# Records:
+# --------
+#   One record is written per phase per generation with the
+#   fields:
+#
+#       generation    - The generation the phase ran in
+#       phase         - The name of the phase
+#       seconds       - The wall time the phase took
+#       netBlockDelta - The change in sys.getallocatedblocks()
+#                       over the phase: blocks allocated minus
+#                       blocks freed. Positive values are memory
+#                       the phase left allocated. It is not a
+#                       count of allocations, so a phase that
+#                       frees as much as it allocates shows 0.
+#
+#   A phase that runs several times in a generation, such as the
+#   steady state phases that run once per child, is summed into
+#   the one record.
+#
+#   Records are written as JSON lines, or as CSV when the
+#   profile path ends in ".csv".
+# -------------------------------------------------------------
+
+class Profiler :
+
+    # Configuration
+    # -------------
+    profileGenerations = False
+    profilePath = None
+
+    # Phase Totals
+    #   Phase name -> [calls, seconds, net block delta], in the order the phases first ran
+    phaseTotals = None
+
+    # Current Generation
+    generationCount = 0
+    generationRecords = None
+
+    # Output
+    profileFile = None
+    csvWriter = None
+
+    def __init__(self, evaluationModule) :
+
+        # Set the Profiler parameters from the evaluation module
+        self.profileGenerations = evaluationModule.profileGenerations
+        self.profilePath = evaluationModule.profilePath
+
+        self.phaseTotals = {}
+        self.generationRecords = {}
+
+        if self.profileGenerations and self.profilePath is not None :
+            self.profileFile = open(self.profilePath, 'w', newline = '')
+            if str(self.profilePath).endswith(".csv") :
+                self.csvWriter = csv.DictWriter(self.profileFile, fieldnames = ['generation', 'phase', 'seconds', 'netBlockDelta'])
+                self.csvWriter.writeheader()
+
+    # Starts collecting the records of a generation
+    def beginGeneration(self, generationCount) :
+        self.generationCount = generationCount
+        self.generationRecords = {}
+
+    # Function:
+    # ---------
+    #   phase()
+    # --------------------------------------------------------------------------
+    # Description:
+    # ------------
+    #   Measures the block of code run inside it as one phase of the current
+    #   generation.
+    # --------------------------------------------------------------------------
+    # Parameters:
+    # -----------
+    #   phaseName - The name the phase is recorded under
+    # --------------------------------------------------------------------------
+    # Usage:
+    # ------
+    #   with profiler.phase("crossover") :
+    #       geneticAlgorithm.crossover()
+    # --------------------------------------------------------------------------
+    # Explanation:
+    # ------------
+    #   time.perf_counter() is read before and after the phase, and so is
+    #   sys.getallocatedblocks(), which is a cheap running count of the blocks
+    #   the interpreter holds. The difference is the net block delta of the
+    #   phase, not the number of allocations it made or its peak. Tracing every
+    #   allocation with tracemalloc would give those, but would slow the phases
+    #   down far more than they are being measured at. When
+    #   profiling is disabled the phase is run inside a context that does
+    #   nothing.
+    # --------------------------------------------------------------------------
+    def phase(self, phaseName) :
+        if not self.profileGenerations :
+            return nullcontext()
+        return self.measurePhase(phaseName)
+
+    @contextmanager
+    def measurePhase(self, phaseName) :
+        startBlocks = sys.getallocatedblocks()
+        startTime = time.perf_counter()
+        try :
+            yield
+        finally :
+            seconds = time.perf_counter() - startTime
+            netBlockDelta = sys.getallocatedblocks() - startBlocks
+
+            # A phase that runs again in the same generation adds to its record
+            if phaseName not in self.generationRecords :
+                self.generationRecords[phaseName] = {'generation' : self.generationCount, 'phase' : phaseName, 'seconds' : 0.0, 'netBlockDelta' : 0}
+            record = self.generationRecords[phaseName]
+            record['seconds'] = record['seconds'] + seconds
+            record['netBlockDelta'] = record['netBlockDelta'] + netBlockDelta
+
+            if phaseName not in self.phaseTotals :
+                self.phaseTotals[phaseName] = [0, 0.0, 0]
+            phaseTotal = self.phaseTotals[phaseName]
+            phaseTotal[0] = phaseTotal[0] + 1
+            phaseTotal[1] = phaseTotal[1] + seconds
+            phaseTotal[2] = phaseTotal[2] + netBlockDelta
+
+    # Writes out the records of the current generation
+    def endGeneration(self) :
+        if self.profileFile is not None :
+            for record in self.generationRecords.values() :
+                if self.csvWriter is not None :
+                    self.csvWriter.writerow(record)
+                else :
+                    self.profileFile.write(json.dumps(record) + "\n")
+            self.profileFile.flush()
+        self.generationRecords = {}
+
+    # Function:
+    # ---------
+    #   getSummary()
+    # --------------------------------------------------------------------------
+    # Description:
+    # ------------
+    #   Formats the totals of every phase as a table.
+    # --------------------------------------------------------------------------
+    # Returns:
+    # --------
+    #   The table as a string with one row per phase giving the number of times
+    #   it ran, its total and mean wall time, its share of the profiled time and
+    #   its mean net block delta per call.
+    # --------------------------------------------------------------------------
+    def getSummary(self) :
+
+        totalSeconds = sum(phaseTotal[1] for phaseTotal in self.phaseTotals.values())
+
+        lines = ["%-20s %8s %12s %12s %8s %16s" % ("Phase", "Calls", "Total (s)", "Mean (ms)", "Share", "Mean Net Blocks")]
+        for phaseName, (calls, seconds, netBlockDelta) in self.phaseTotals.items() :
+            share = seconds / totalSeconds if totalSeconds > 0 else 0.0
+            lines.append("%-20s %8d %12.4f %12.4f %7.1f%% %16.1f" % (phaseName, calls, seconds, 1000 * seconds / calls, 100 * share, netBlockDelta / calls))
+        lines.append("%-20s %8s %12.4f" % ("Total", "", totalSeconds))
+
+        return "\n".join(lines)
+
+    # Closes the record file and prints the summary table
+    def close(self) :
+        if self.profileFile is not None :
+            self.profileFile.close()
+            self.profileFile = None
+            self.csvWriter = None
+        if self.profileGenerations and len(self.phaseTotals) > 0 :
+            print(self.getSummary())
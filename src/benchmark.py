@@ -0,0 +1,271 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from itertools import product
+
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
+os.environ['CUDA_VISIBLE_DEVICES'] = '-1'
+
+from EvaluationModule import EvaluationModule
+from GeneticAlgorithm import GeneticAlgorithm
+from Profiler import Profiler
+
+# -------------------------------------------------------------
+# File:
+# -----
+#   benchmark.py
+# -------------------------------------------------------------
+# Description:
+# ------------
+#   The benchmark.py file times the hot paths of the Genetic
+#   Algorithm so that a change to them can be measured instead
+#   of guessed at. For every configuration in a grid of product
+#   vector sizes, backing tensor depths, Stimulus-Product pair
+#   counts and population sizes it times:
+#
+#       mutate             - GeneticAlgorithm.mutate() over the
+#                            whole population
+#       crossover          - GeneticAlgorithm.crossover() over
+#                            the 2 * populationSize members
+#                            selection hands it
+#       evaluateOperator   - DataFrame.evaluateMappingOperator()
+#                            over the whole population, one
+#                            Mapping Operator at a time
+#       evaluatePopulation - GeneticAlgorithm.evaluatePopulation()
+#       generation         - One full generation
+#
+#   Every configuration is seeded, evaluated in this process on
+#   the CPU and run with the fitness and activation caches off,
+#   so the same work is timed on every run. Each measurement is
+#   made once untimed to warm up and then repeated, and the median
+#   and minimum are kept.
+# -------------------------------------------------------------
+# Usage:
+# ------
+#   python benchmark.py --output results.json
+#   python benchmark.py --save-baseline baseline.json
+#   python benchmark.py --baseline baseline.json --tolerance .15
+#
+#   Comparing against a baseline prints the ratio of every median
+#   to the baseline median and exits with 1 if any of them is
+#   slower than the baseline by more than the tolerance.
+# -------------------------------------------------------------
+
+# Default Grid
+productVectorSizes = [2, 8]
+backingTensorDepths = [4, 20]
+stimulusProductPairCounts = [16, 256]
+populationSizes = [16, 64]
+
+# The parameters every configuration is run with
+benchmarkParameters = {
+    'randomSeed' : 1234,
+    'evaluationProcessCount' : 1,
+    'fitnessCacheSize' : 0,
+    'activationCacheBudget' : 0,
+    'fitnessSampleSize' : 0,
+    'checkpointInterval' : 0,
+    'profileGenerations' : False,
+    'topologicalMutationRate' : 0,
+    'elitismWeight' : .1,
+    'mutationRate' : 1.0,
+    'crossoverRate' : 1.0
+}
+
+# Names a configuration in the results
+def getConfigurationKey(productVectorSize, backingTensorDepth, stimulusProductPairCount, populationSize) :
+    return "N=%d,depth=%d,pairs=%d,population=%d" % (productVectorSize, backingTensorDepth, stimulusProductPairCount, populationSize)
+
+# Times a function the given number of times, running setup untimed before each call. One untimed
+# call first warms up the caches and any code compiled on first use.
+def timeRepeatedly(function, repeats, setup = None) :
+    if setup is not None :
+        setup()
+    function()
+
+    times = []
+    for i in range(repeats) :
+        if setup is not None :
+            setup()
+        startTime = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - startTime)
+    return {'median' : statistics.median(times), 'min' : min(times)}
+
+# Function:
+# ---------
+#   benchmarkConfiguration()
+# --------------------------------------------------------------------------
+# Description:
+# ------------
+#   Times every benchmarked operation for one configuration.
+# --------------------------------------------------------------------------
+# Parameters:
+# -----------
+#   parameters - The Evaluation Module parameters of the configuration
+#   repeats - The number of times each operation is timed
+# --------------------------------------------------------------------------
+# Returns:
+# --------
+#   A dictionary of operation name to {'median', 'min'} seconds.
+# --------------------------------------------------------------------------
+# Explanation:
+# ------------
+#   A fitted population is generated once. Operations that change the
+#   population are handed a fresh copy of it before every timed call, so
+#   each repeat does the same work. Crossover is handed the same 2P members
+#   selection feeds it in a generation, picked by one tournament draw that
+#   every repeat reuses. Every member is marked as modified before the
+#   evaluations are timed so none of them is skipped as clean.
+# --------------------------------------------------------------------------
+def benchmarkConfiguration(parameters, repeats) :
+
+    evaluationModule = EvaluationModule(parameters)
+    ga = GeneticAlgorithm(evaluationModule)
+    ga.profiler = Profiler(evaluationModule)
+    dataFrame = evaluationModule.getDataFrame()
+
+    ga.generatePopulation()
+    ga.evaluatePopulation()
+    ga.sortPopulation()
+    ga.saveElites()
+    basePopulation = [mappingOperator.clone() for mappingOperator in ga.population]
+
+    def resetPopulation() :
+        ga.population = [mappingOperator.clone() for mappingOperator in basePopulation]
+        ga.sortPopulation()
+
+    # The parents of one generation, as selectTournament() would pick them
+    resetPopulation()
+    selectedIndices = ga.drawTournamentChampions(len(basePopulation) * 2)
+
+    def resetSelectedPopulation() :
+        resetPopulation()
+        ga.population = [ga.population[populationIndex] for populationIndex in selectedIndices]
+
+    def resetDirtyPopulation() :
+        resetPopulation()
+        for mappingOperator in ga.population :
+            mappingOperator.markModified()
+
+    def evaluateOperators() :
+        for mappingOperator in ga.population :
+            dataFrame.evaluateMappingOperator(mappingOperator)
+
+    results = {}
+    results['mutate'] = timeRepeatedly(ga.mutate, repeats, resetPopulation)
+    results['crossover'] = timeRepeatedly(ga.crossover, repeats, resetSelectedPopulation)
+    results['evaluateOperator'] = timeRepeatedly(evaluateOperators, repeats, resetPopulation)
+    results['evaluatePopulation'] = timeRepeatedly(ga.evaluatePopulation, repeats, resetDirtyPopulation)
+    results['generation'] = timeRepeatedly(lambda : ga.runGeneration(0), repeats, resetPopulation)
+
+    return results
+
+# Runs every configuration of the grid and returns the results document
+def runBenchmarks(grid, repeats) :
+
+    results = {}
+    for productVectorSize, backingTensorDepth, stimulusProductPairCount, populationSize in product(*grid) :
+        key = getConfigurationKey(productVectorSize, backingTensorDepth, stimulusProductPairCount, populationSize)
+        parameters = dict(benchmarkParameters)
+        parameters.update({
+            'productVectorSize' : productVectorSize,
+            'backingTensorDepth' : backingTensorDepth,
+            'stimulusProductPairCount' : stimulusProductPairCount,
+            'populationSize' : populationSize
+        })
+        print("Benchmarking ", key, file = sys.stderr)
+        results[key] = benchmarkConfiguration(parameters, repeats)
+
+    return {
+        'environment' : {
+            'python' : platform.python_version(),
+            'platform' : platform.platform(),
+            'processor' : platform.processor()
+        },
+        'repeats' : repeats,
+        'results' : results
+    }
+
+# Function:
+# ---------
+#   compareToBaseline()
+# --------------------------------------------------------------------------
+# Description:
+# ------------
+#   Compares the median of every measurement to the same measurement in a
+#   baseline results document.
+# --------------------------------------------------------------------------
+# Parameters:
+# -----------
+#   results - The results document of this run
+#   baseline - A results document saved by an earlier run
+#   tolerance - How much slower than the baseline a median may be before
+#               it counts as a regression. .1 = 10% slower
+# --------------------------------------------------------------------------
+# Returns:
+# --------
+#   A list of (configuration, operation, ratio) regressions, where ratio is
+#   this median divided by the baseline median. Measurements that are not in
+#   both documents are skipped.
+# --------------------------------------------------------------------------
+def compareToBaseline(results, baseline, tolerance) :
+
+    regressions = []
+    print("%-45s %-20s %12s %12s %8s" % ("Configuration", "Operation", "Baseline", "Current", "Ratio"))
+    for key, operations in results['results'].items() :
+        baselineOperations = baseline['results'].get(key)
+        if baselineOperations is None :
+            continue
+        for operation, timing in operations.items() :
+            if operation not in baselineOperations :
+                continue
+            baselineMedian = baselineOperations[operation]['median']
+            ratio = timing['median'] / baselineMedian if baselineMedian > 0 else 1.0
+            flag = " <-- slower" if ratio > 1 + tolerance else ""
+            print("%-45s %-20s %12.6f %12.6f %8.2f%s" % (key, operation, baselineMedian, timing['median'], ratio, flag))
+            if ratio > 1 + tolerance :
+                regressions.append((key, operation, ratio))
+
+    return regressions
+
+def main(arguments) :
+
+    parser = argparse.ArgumentParser(description = "Benchmark the Genetic Algorithm hot paths.")
+    parser.add_argument("--product-vector-sizes", type = int, nargs = '+', default = productVectorSizes)
+    parser.add_argument("--backing-tensor-depths", type = int, nargs = '+', default = backingTensorDepths)
+    parser.add_argument("--pair-counts", type = int, nargs = '+', default = stimulusProductPairCounts)
+    parser.add_argument("--population-sizes", type = int, nargs = '+', default = populationSizes)
+    parser.add_argument("--repeats", type = int, default = 5, help = "The number of times each operation is timed")
+    parser.add_argument("--output", help = "Write the results document to this file")
+    parser.add_argument("--save-baseline", metavar = "PATH", help = "Write the results document to this file as the new baseline")
+    parser.add_argument("--baseline", metavar = "PATH", help = "Compare the results to a baseline saved with --save-baseline")
+    parser.add_argument("--tolerance", type = float, default = .1, help = "How much slower than the baseline a median may be before it is a regression")
+    parsedArguments = parser.parse_args(arguments)
+
+    grid = (parsedArguments.product_vector_sizes, parsedArguments.backing_tensor_depths, parsedArguments.pair_counts, parsedArguments.population_sizes)
+    results = runBenchmarks(grid, parsedArguments.repeats)
+
+    for path in (parsedArguments.output, parsedArguments.save_baseline) :
+        if path is not None :
+            with open(path, 'w') as resultsFile :
+                json.dump(results, resultsFile, indent = 2)
+
+    if parsedArguments.baseline is None :
+        print(json.dumps(results['results'], indent = 2))
+        return 0
+
+    with open(parsedArguments.baseline) as baselineFile :
+        baseline = json.load(baselineFile)
+    regressions = compareToBaseline(results, baseline, parsedArguments.tolerance)
+    if len(regressions) > 0 :
+        print(len(regressions), " measurements are slower than the baseline")
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -1,12 +1,19 @@
 
+import argparse
+import ast
+import json
+import sys
+import time
+
 from GeneticAlgorithm import GeneticAlgorithm
+from IslandModel import IslandModel
+from DistributedEvaluation import runEvaluationWorker
+from Checkpoint import Checkpoint
 from DataFrame import DataFrame
 from EvaluationModule import EvaluationModule
 
-  # Silence Tensorflow
-import tensorflow as tf
-# tf.disable_v2_behavior()
-tf.enable_eager_execution()
+# Silence Tensorflow if the tensorflow backend is selected. It is only
+# imported then and runs eagerly. See Backend.py.
 import os
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
 os.environ['CUDA_VISIBLE_DEVICES'] = '-1'
@@ -31,7 +38,9 @@ os.environ['CUDA_VISIBLE_DEVICES'] = '-1'
 #
 #   The hierarchy of ownership in the simulation is:
 #
-#       1. gavm.py owns a Genetic Algorithm instance
+#       1. gavm.py owns a Genetic Algorithm instance, or an
+#          Island Model that runs one Genetic Algorithm per
+#          island in its own process. See IslandModel.py
 #       2. GeneticAlgorithm.py owns:
 #           - The instance of EvaluationModule.py
 #               - Which owns the instance of DataFrame.py
@@ -39,30 +48,253 @@ os.environ['CUDA_VISIBLE_DEVICES'] = '-1'
 #               is the size of the population in the Genetic
 #               Algorithm
 # -------------------------------------------------------------
+# Usage:
+# ------
+#   Run with no arguments for the interactive menu. Any
+#   argument runs GAVM headless instead:
+#
+#       python gavm.py --config run.json --seed 7 \
+#           --output-dir runs/7 --max-generations 500 \
+#           --max-seconds 3600 --productVectorSize 8
+#
+#   --config reads a JSON object of Evaluation Module parameter
+#   names to values. Every Evaluation Module parameter can also
+#   be given as a flag of the same name, and flags win over the
+#   config file. See parseCommandLine() for the rest of the
+#   options and runHeadless() for the output and exit codes.
+#
+#   To evaluate on more processes, set a coordinator address on
+#   the run and start workers that connect to it:
+#
+#       python gavm.py --coordinatorAddress 127.0.0.1:5555
+#       python gavm.py --worker 127.0.0.1:5555
+#
+#   The coordinator only accepts local workers unless it is given
+#   the address of another interface. Messages are not
+#   authenticated, so reach it from other machines over a network
+#   they trust, such as an SSH tunnel.
+# -------------------------------------------------------------
+
+# Exit Codes
+# ----------
+EXIT_SUCCESS = 0 # The run finished its generation or time budget, or found a perfect mapping
+EXIT_RUN_FAILED = 1 # The run raised an error
+EXIT_BAD_CONFIGURATION = 2 # The command line or config file was invalid
+EXIT_INTERRUPTED = 130 # The run was interrupted from the keyboard
+
+# Returns an Island Model when more than one island is configured, otherwise a Genetic Algorithm
+def createGeneticAlgorithm(evaluationModule) :
+    if evaluationModule.islandCount > 1 :
+        return IslandModel(evaluationModule)
+    return GeneticAlgorithm(evaluationModule)
 
 def runRandomGavcInstance() :
 
     evaluationModule = EvaluationModule()
     
-    ga = GeneticAlgorithm(evaluationModule)
+    ga = createGeneticAlgorithm(evaluationModule)
 
     print("\nRunning this instance of GAVM...\n")
 
     ga.run()
 
+def resumeGavcInstance(checkpointPath) :
+
+    # Resume with the parameters the run was started with
+    evaluationModule = EvaluationModule(Checkpoint.loadParameters(checkpointPath))
+
+    ga = GeneticAlgorithm(evaluationModule)
+
+    print("\nResuming this instance of GAVM from ", checkpointPath, "...\n")
+
+    ga.run(checkpointPath)
+
 def runGavc() :
     
     print("\nWelcome to GAVM!\n")
 
     print("Select an option:")
     print("1) Run an instance of GAVM with the default parameters found in EvaluationModule.py")
+    print("2) Resume an instance of GAVM from a checkpoint")
     option = input()
 
     if option == "1" :
         runRandomGavcInstance()
+    elif option == "2" :
+        print("Enter the path of the checkpoint (default: " + EvaluationModule.checkpointPath + "):")
+        checkpointPath = input()
+        if checkpointPath == "" :
+            checkpointPath = EvaluationModule.checkpointPath
+        resumeGavcInstance(checkpointPath)
     else :
         print("Please select a valid option... Exiting...")
         exit()
 
+# Parses a command line value as a Python literal, falling back to the plain string
+def parseParameterValue(text) :
+    if text in ("None", "none", "null") :
+        return None
+    if text.lower() in ("true", "false") :
+        return text.lower() == "true"
+    try :
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError) :
+        return text
+
+# Function:
+# ---------
+#   parseCommandLine()
+# --------------------------------------------------------------------------
+# Description:
+# ------------
+#   Parses the headless command line.
+# --------------------------------------------------------------------------
+# Parameters:
+# -----------
+#   arguments - The command line arguments without the program name
+# --------------------------------------------------------------------------
+# Returns:
+# --------
+#   The parsed arguments and the dictionary of Evaluation Module
+#   parameters to run with, built from the config file and then the
+#   parameter flags.
+# --------------------------------------------------------------------------
+def parseCommandLine(arguments) :
+
+    parser = argparse.ArgumentParser(description = "Run GAVM headless.")
+    parser.add_argument("--config", help = "A JSON file of Evaluation Module parameter names to values")
+    parser.add_argument("--seed", type = int, help = "The random seed of the run. Same as --randomSeed")
+    parser.add_argument("--output-dir", default = ".", help = "The directory the metrics file and any relative checkpoint or profile path are written to")
+    parser.add_argument("--max-generations", type = int, help = "The generation budget of the run. Same as --maxGenerations")
+    parser.add_argument("--max-seconds", type = float, help = "The wall time budget of the run in seconds. Same as --maxRunSeconds")
+    parser.add_argument("--resume", metavar = "CHECKPOINT", help = "Resume the run from a checkpoint, with the parameters saved in it unless given here")
+    parser.add_argument("--metrics-file", default = "metrics.json", help = "The name of the final metrics file in the output directory")
+    parser.add_argument("--worker", metavar = "ADDRESS", help = "Run as an evaluation worker for the coordinator listening on ADDRESS (host:port or a Unix socket path) instead of running GAVM")
+
+    # One flag per Evaluation Module parameter
+    parameterGroup = parser.add_argument_group("Evaluation Module parameters", "Each flag overrides the parameter of the same name. See EvaluationModule.py.")
+    for name in EvaluationModule.getParameterNames() :
+        parameterGroup.add_argument("--" + name, dest = "parameter_" + name, type = parseParameterValue, metavar = "VALUE",
+                                    help = "Default: " + repr(getattr(EvaluationModule, name)))
+
+    parsedArguments = parser.parse_args(arguments)
+
+    parameters = {}
+    if parsedArguments.config is not None :
+        with open(parsedArguments.config) as configFile :
+            config = json.load(configFile)
+        if not isinstance(config, dict) :
+            raise ValueError("The config file " + parsedArguments.config + " must hold a JSON object")
+        parameters.update(config)
+
+    for name in EvaluationModule.getParameterNames() :
+        value = getattr(parsedArguments, "parameter_" + name)
+        if value is not None :
+            parameters[name] = value
+
+    if parsedArguments.seed is not None :
+        parameters['randomSeed'] = parsedArguments.seed
+    if parsedArguments.max_generations is not None :
+        parameters['maxGenerations'] = parsedArguments.max_generations
+    if parsedArguments.max_seconds is not None :
+        parameters['maxRunSeconds'] = parsedArguments.max_seconds
+
+    return parsedArguments, parameters
+
+# Runs an evaluation worker until its coordinator stops it. See DistributedEvaluation.py.
+def runWorker(address) :
+    try :
+        runEvaluationWorker(address)
+    except KeyboardInterrupt :
+        return EXIT_INTERRUPTED
+    except OSError as error :
+        print("Could not connect to the coordinator: ", error, file = sys.stderr)
+        return EXIT_RUN_FAILED
+    return EXIT_SUCCESS
+
+# Function:
+# ---------
+#   runHeadless()
+# --------------------------------------------------------------------------
+# Description:
+# ------------
+#   Runs GAVM from the command line without any prompts.
+# --------------------------------------------------------------------------
+# Parameters:
+# -----------
+#   arguments - The command line arguments without the program name
+# --------------------------------------------------------------------------
+# Returns:
+# --------
+#   The exit code of the run. See the exit codes above.
+# --------------------------------------------------------------------------
+# Explanation:
+# ------------
+#   Relative checkpoint and profile paths are placed in the output
+#   directory. When the run ends, for whatever reason, a JSON metrics file
+#   is written to the output directory holding the exit code, why the run
+#   stopped, the wall time, the performance metrics of the Evaluation
+#   Module and every parameter the run used.
+# --------------------------------------------------------------------------
+def runHeadless(arguments) :
+
+    try :
+        parsedArguments, parameters = parseCommandLine(arguments)
+        if parsedArguments.worker is not None :
+            return runWorker(parsedArguments.worker)
+        os.makedirs(parsedArguments.output_dir, exist_ok = True)
+        if parsedArguments.resume is not None :
+            # Resume with the parameters the run was started with, overridden by the ones given here
+            parameters = dict(Checkpoint.loadParameters(parsedArguments.resume), **parameters)
+        for pathName in ('checkpointPath', 'profilePath') :
+            path = parameters.get(pathName, getattr(EvaluationModule, pathName))
+            if path is not None and not os.path.isabs(path) :
+                parameters[pathName] = os.path.join(parsedArguments.output_dir, path)
+        evaluationModule = EvaluationModule(parameters)
+        if evaluationModule.islandCount > 1 and parsedArguments.resume is not None :
+            raise ValueError("island model runs cannot be resumed from a checkpoint")
+        ga = createGeneticAlgorithm(evaluationModule)
+    except (OSError, ValueError, TypeError) as error :
+        print("Invalid configuration: ", error, file = sys.stderr)
+        return EXIT_BAD_CONFIGURATION
+
+    exitCode = EXIT_SUCCESS
+    runError = None
+    runStartTime = time.perf_counter()
+    try :
+        ga.run(parsedArguments.resume)
+    except KeyboardInterrupt :
+        exitCode = EXIT_INTERRUPTED
+    except Exception as error :
+        exitCode = EXIT_RUN_FAILED
+        runError = repr(error)
+    runSeconds = time.perf_counter() - runStartTime
+
+    metrics = {
+        'exitCode' : exitCode,
+        'error' : runError,
+        'stopReason' : ga.stopReason,
+        'runSeconds' : runSeconds,
+        'totalGenerations' : evaluationModule.getTotalGenerations(),
+        'bestFitness' : evaluationModule.getBestFitness(),
+        'averageFitness' : evaluationModule.getAverageFitness(),
+        'averageFitnessGain' : evaluationModule.averageFitnessGain,
+        'averageNumberOfGenerationsBetweenFitnessGains' : evaluationModule.averageNumberOfGenerationsBetweenFitnessGains,
+        'fitnessGains' : evaluationModule.fitnessGains,
+        'generationCountsBetweenFitnessGains' : evaluationModule.generationCountsBetweenFitnessGains,
+        'parameters' : evaluationModule.getParameters()
+    }
+    metricsPath = os.path.join(parsedArguments.output_dir, parsedArguments.metrics_file)
+    with open(metricsPath, 'w') as metricsFile :
+        json.dump(metrics, metricsFile, indent = 2, default = float)
+
+    if runError is not None :
+        print("The run failed: ", runError, file = sys.stderr)
+    print("Metrics written to ", metricsPath)
+
+    return exitCode
+
 if __name__ == '__main__':
+    if len(sys.argv) > 1 :
+        sys.exit(runHeadless(sys.argv[1:]))
     runGavc()
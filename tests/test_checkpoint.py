@@ -0,0 +1,45 @@
+import pytest
+
+from Checkpoint import Checkpoint
+from EvaluationModule import EvaluationModule
+from GeneticAlgorithm import GeneticAlgorithm
+
+def runGeneticAlgorithm(parameters, maxGenerations, checkpointPath = None) :
+    evaluationModule = EvaluationModule(dict(parameters, maxGenerations = maxGenerations))
+    ga = GeneticAlgorithm(evaluationModule)
+    ga.run(checkpointPath)
+    return evaluationModule, ga
+
+@pytest.mark.parametrize("modeParameters", [
+    {},
+    {'evolutionModeIndicator' : 1},
+    {'fitnessSampleSize' : 4, 'fullRescoringInterval' : 2}
+], ids = ['generational', 'steadyState', 'sampling'])
+def test_resumed_run_matches_uninterrupted_run(tmp_path, modeParameters) :
+
+    parameters = dict({
+        'randomSeed' : 1,
+        'stimulusProductPairCount' : 40,
+        'productVectorSize' : 2,
+        'backingTensorDepth' : 4,
+        'populationSize' : 10,
+        'elitismWeight' : .3,
+        'evaluationProcessCount' : 1,
+        'checkpointInterval' : 3,
+        'checkpointPath' : str(tmp_path / "checkpoint.npz")
+    }, **modeParameters)
+
+    fullEvaluationModule, fullGa = runGeneticAlgorithm(parameters, 6)
+
+    # Stop halfway, then resume from the checkpoint with the parameters saved in it
+    runGeneticAlgorithm(parameters, 3)
+    savedParameters = Checkpoint.loadParameters(parameters['checkpointPath'])
+    assert savedParameters['maxGenerations'] == 3
+    resumedEvaluationModule, resumedGa = runGeneticAlgorithm(savedParameters, 6, parameters['checkpointPath'])
+
+    assert resumedEvaluationModule.getTotalGenerations() == 6
+    assert resumedEvaluationModule.getBestFitness() == fullEvaluationModule.getBestFitness()
+    assert resumedEvaluationModule.getAverageFitness() == pytest.approx(fullEvaluationModule.getAverageFitness())
+    assert resumedEvaluationModule.fitnessGains == fullEvaluationModule.fitnessGains
+    assert resumedEvaluationModule.generationCountsBetweenFitnessGains == fullEvaluationModule.generationCountsBetweenFitnessGains
+    assert [mappingOperator.getFitness() for mappingOperator in resumedGa.population] == [mappingOperator.getFitness() for mappingOperator in fullGa.population]
@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from EvaluationModule import EvaluationModule
+from MappingOperator import MappingOperator
+
+def buildEvaluationModule() :
+    return EvaluationModule({
+        'randomSeed' : 11,
+        'stimulusProductPairCount' : 40,
+        'productVectorSize' : 3,
+        'backingTensorDepth' : 5,
+        'batchedEvaluation' : False,
+        'compiledForwardPass' : False
+    })
+
+# Children that keep every layer of their parent but the last, so that they share its leading layers
+def buildPopulation(evaluationModule) :
+    randomGenerator = evaluationModule.getRandomGenerator()
+    population = [MappingOperator(evaluationModule) for i in range(4)]
+    for parent in list(population) :
+        child = parent.clone()
+        backingTensor = list(child.getBackingTensor())
+        backingTensor[-1] = randomGenerator.random(np.shape(backingTensor[-1]), dtype = np.float32)
+        child.setBackingTensor(backingTensor)
+        population.append(child)
+    return population
+
+# The fitnesses of the per pair evaluation every other path must agree with
+def evaluatePerPair(evaluationModule, population) :
+    dataFrame = evaluationModule.getDataFrame()
+    for mappingOperator in population :
+        dataFrame.evaluateMappingOperator(mappingOperator)
+    return [mappingOperator.getFitness() for mappingOperator in population]
+
+def test_batched_evaluation_agrees_with_per_pair_evaluation() :
+
+    evaluationModule = buildEvaluationModule()
+    population = buildPopulation(evaluationModule)
+    expectedFitnesses = evaluatePerPair(evaluationModule, population)
+
+    evaluationModule.getDataFrame().batchedEvaluation = True
+    assert evaluatePerPair(evaluationModule, population) == pytest.approx(expectedFitnesses, rel = 1e-5)
+
+@pytest.mark.parametrize("evaluationChunkSize", [1, 7, 40])
+def test_chunked_evaluation_agrees_with_per_pair_evaluation(evaluationChunkSize) :
+
+    evaluationModule = buildEvaluationModule()
+    population = buildPopulation(evaluationModule)
+    expectedFitnesses = evaluatePerPair(evaluationModule, population)
+
+    dataFrame = evaluationModule.getDataFrame()
+    dataFrame.batchedEvaluation = True
+    dataFrame.evaluationChunkSize = evaluationChunkSize
+    assert evaluatePerPair(evaluationModule, population) == pytest.approx(expectedFitnesses, rel = 1e-5)
+
+    # Stacked by shape, a whole population at once
+    dataFrame.evaluateMappingOperators(population)
+    assert [mappingOperator.getFitness() for mappingOperator in population] == pytest.approx(expectedFitnesses, rel = 1e-5)
+
+def test_activation_cache_agrees_with_per_pair_evaluation() :
+
+    evaluationModule = buildEvaluationModule()
+    population = buildPopulation(evaluationModule)
+    expectedFitnesses = evaluatePerPair(evaluationModule, population)
+
+    dataFrame = evaluationModule.getDataFrame()
+    dataFrame.batchedEvaluation = True
+    dataFrame.setActivationCacheBudget(1 << 20)
+    assert dataFrame.isActivationCacheActive()
+
+    # Each child starts from the cached activations of its parent's leading layers
+    assert evaluatePerPair(evaluationModule, population) == pytest.approx(expectedFitnesses, rel = 1e-5)
+    assert dataFrame.activationCache.getHits() >= 4
+
+    # Evaluated again, every Mapping Operator is served from the cache
+    assert evaluatePerPair(evaluationModule, population) == pytest.approx(expectedFitnesses, rel = 1e-5)
+
+def test_activation_cache_is_bypassed_while_sampling_or_chunking() :
+
+    dataFrame = buildEvaluationModule().getDataFrame()
+    dataFrame.batchedEvaluation = True
+    dataFrame.setActivationCacheBudget(1 << 20)
+
+    dataFrame.setSample(np.array([0, 5, 9]))
+    assert not dataFrame.isActivationCacheActive()
+    dataFrame.setSample(None)
+
+    dataFrame.evaluationChunkSize = 7
+    assert not dataFrame.isActivationCacheActive()
@@ -0,0 +1,159 @@
+import multiprocessing
+import os
+import signal
+import socket
+import time
+
+import numpy as np
+import pytest
+
+import DistributedEvaluation
+from DistributedEvaluation import DistributedEvaluator, ProtocolError, TaskError, runEvaluationWorker
+from EvaluationModule import EvaluationModule
+from MappingOperator import MappingOperator
+
+# A worker that joins, takes a task and then fails without answering it
+def runFailingWorker(address, failure, tookTask) :
+    family, socketAddress = DistributedEvaluation.parseAddress(address)
+    connection = socket.socket(family, socket.SOCK_STREAM)
+    while True :
+        try :
+            connection.connect(socketAddress)
+            break
+        except OSError :
+            time.sleep(.05)
+
+    DistributedEvaluation.sendMessage(connection, ('hello', 'failing', os.getpid()))
+    DistributedEvaluation.receiveMessage(connection)
+    message = DistributedEvaluation.receiveMessage(connection)
+    assert message[0] == 'evaluate'
+    tookTask.set()
+
+    if failure == 'killed' :
+        os.kill(os.getpid(), signal.SIGKILL)
+    # Otherwise go quiet without a heartbeat
+    time.sleep(60)
+
+def buildEvaluationModule(coordinatorAddress) :
+    return EvaluationModule({
+        'randomSeed' : 3,
+        'stimulusProductPairCount' : 40,
+        'productVectorSize' : 3,
+        'backingTensorDepth' : 4,
+        'evaluationProcessCount' : 1,
+        'coordinatorAddress' : coordinatorAddress,
+        'minimumEvaluationWorkerCount' : 3,
+        'heartbeatInterval' : .2,
+        'heartbeatTimeout' : 1.5
+    })
+
+@pytest.mark.parametrize("failure", ['killed', 'silent'])
+def test_task_of_failed_worker_is_requeued(tmp_path, failure) :
+
+    coordinatorAddress = str(tmp_path / "coordinator.sock")
+    evaluationModule = buildEvaluationModule(coordinatorAddress)
+    population = [MappingOperator(evaluationModule) for i in range(12)]
+
+    # The fitnesses evaluated in this process to compare against
+    expectedPopulation = [mappingOperator.clone() for mappingOperator in population]
+    evaluationModule.getDataFrame().evaluateMappingOperators(expectedPopulation)
+
+    # Two workers that answer and one that fails once it holds a task
+    context = multiprocessing.get_context('fork')
+    tookTask = context.Event()
+    workerProcesses = [context.Process(target = runEvaluationWorker, args = (coordinatorAddress,), daemon = True) for i in range(2)]
+    workerProcesses.append(context.Process(target = runFailingWorker, args = (coordinatorAddress, failure, tookTask), daemon = True))
+    for workerProcess in workerProcesses :
+        workerProcess.start()
+
+    evaluator = DistributedEvaluator(evaluationModule)
+    try :
+        evaluator.start()
+        assert evaluator.getWorkerCount() == 3
+
+        evaluator.evaluate(population)
+
+        assert tookTask.is_set()
+        assert evaluator.getWorkerCount() == 2
+        assert len(evaluator.tasks) == 0
+        assert [mappingOperator.getFitness() for mappingOperator in population] == pytest.approx([mappingOperator.getFitness() for mappingOperator in expectedPopulation])
+    finally :
+        evaluator.close()
+        for workerProcess in workerProcesses :
+            workerProcess.terminate()
+            workerProcess.join()
+
+def test_messages_round_trip_without_pickle() :
+
+    buffer = np.arange(12, dtype = np.float32)
+    biases = np.array([.5, .25], dtype = np.float32)
+    message = ('evaluate', 7, np.array([0, 3, 5]), [(4, (buffer, [(3, 3), (3, 1)], biases))])
+
+    messageType, payload = DistributedEvaluation.encodeMessage(message)
+    decoded = DistributedEvaluation.decodeMessage(messageType, payload)
+
+    assert decoded[0] == 'evaluate' and decoded[1] == 7
+    assert list(decoded[2]) == [0, 3, 5]
+    populationIndex, (decodedBuffer, layerShapes, decodedBiases) = decoded[3][0]
+    assert populationIndex == 4 and layerShapes == [(3, 3), (3, 1)]
+    assert np.array_equal(decodedBuffer, buffer) and np.array_equal(decodedBiases, biases)
+
+    messageType, payload = DistributedEvaluation.encodeMessage(('result', 7, [(4, 1.5), (9, 2.25)]))
+    assert DistributedEvaluation.decodeMessage(messageType, payload) == ('result', 7, [(4, 1.5), (9, 2.25)])
+
+def test_malformed_messages_are_rejected() :
+
+    messageType, payload = DistributedEvaluation.encodeMessage(('result', 1, [(0, 1.0)]))
+    with pytest.raises(ProtocolError) :
+        DistributedEvaluation.decodeMessage(messageType, payload[:-1])
+    with pytest.raises(ProtocolError) :
+        DistributedEvaluation.decodeMessage(99, b"")
+
+    # A genome whose layer shapes do not add up to its buffer
+    messageType, payload = DistributedEvaluation.encodeMessage(('evaluate', 1, None, [(0, (np.zeros(5, dtype = np.float32), [(3, 3)], np.zeros(1, dtype = np.float32)))]))
+    with pytest.raises(ProtocolError) :
+        DistributedEvaluation.decodeMessage(messageType, payload)
+
+def test_bare_port_binds_to_loopback() :
+    assert DistributedEvaluation.parseAddress("5555") == (socket.AF_INET, ("127.0.0.1", 5555))
+    assert DistributedEvaluation.parseAddress(":5555") == (socket.AF_INET, ("127.0.0.1", 5555))
+
+def test_inconsistent_genome_is_a_task_error() :
+
+    # Layers that hold the right number of values but do not chain
+    genome = (np.zeros(9, dtype = np.float32), [(3, 2), (3, 1)], np.zeros(2, dtype = np.float32))
+    messageType, payload = DistributedEvaluation.encodeMessage(('evaluate', 5, None, [(0, genome)]))
+    with pytest.raises(TaskError) as error :
+        DistributedEvaluation.decodeMessage(messageType, payload)
+    assert error.value.taskId == 5
+
+def test_worker_rejects_a_bad_task_and_keeps_working(tmp_path) :
+
+    coordinatorAddress = str(tmp_path / "coordinator.sock")
+    evaluationModule = buildEvaluationModule(coordinatorAddress)
+    evaluationModule.minimumEvaluationWorkerCount = 1
+    population = [MappingOperator(evaluationModule) for i in range(4)]
+    expectedPopulation = [mappingOperator.clone() for mappingOperator in population]
+    evaluationModule.getDataFrame().evaluateMappingOperators(expectedPopulation)
+
+    workerProcess = multiprocessing.get_context('fork').Process(target = runEvaluationWorker, args = (coordinatorAddress,), daemon = True)
+    workerProcess.start()
+
+    evaluator = DistributedEvaluator(evaluationModule)
+    try :
+        evaluator.start()
+
+        # A sample that runs past the end of the Data Frame
+        evaluator.submitTask([(0, DistributedEvaluation.packMappingOperator(population[0]))], np.array([0, 1000]))
+        with pytest.raises(RuntimeError, match = "rejected") :
+            evaluator.waitForResult()
+
+        evaluator.evaluate(population)
+
+        assert workerProcess.is_alive()
+        assert evaluator.getWorkerCount() == 1
+        assert [mappingOperator.getFitness() for mappingOperator in population] == pytest.approx([mappingOperator.getFitness() for mappingOperator in expectedPopulation])
+    finally :
+        evaluator.close()
+        workerProcess.terminate()
+        workerProcess.join()
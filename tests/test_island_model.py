@@ -0,0 +1,56 @@
+import os
+import time
+from multiprocessing import Process, Queue
+
+import pytest
+
+from EvaluationModule import EvaluationModule
+from IslandModel import IslandModel
+
+def buildEvaluationModule(evolutionModeIndicator = 0) :
+    return EvaluationModule({
+        'randomSeed' : 7,
+        'stimulusProductPairCount' : 20,
+        'productVectorSize' : 2,
+        'backingTensorDepth' : 3,
+        'populationSize' : 6,
+        'maxGenerations' : 4,
+        'islandCount' : 2,
+        'migrationInterval' : 2,
+        'evolutionModeIndicator' : evolutionModeIndicator
+    })
+
+# An island that reports and then waits to be stopped
+def runReportingIsland(reportQueue) :
+    reportQueue.put(('report', 0, 1.0, [], 1.0, 1))
+    time.sleep(60)
+
+# An island that dies before it reports
+def runDyingIsland() :
+    os._exit(3)
+
+@pytest.mark.parametrize("evolutionModeIndicator", [0, 1])
+def test_island_run_reports_average_fitness(evolutionModeIndicator) :
+
+    evaluationModule = buildEvaluationModule(evolutionModeIndicator)
+    IslandModel(evaluationModule).run()
+
+    assert evaluationModule.getTotalGenerations() == 4
+    assert evaluationModule.getBestFitness() <= evaluationModule.getAverageFitness() < 99999999
+
+def test_island_that_dies_without_reporting_fails_the_run() :
+
+    islandModel = IslandModel(buildEvaluationModule())
+    islandModel.reportPollInterval = .1
+    islandModel.reportQueue = Queue()
+    islandModel.islandProcesses = [Process(target = runReportingIsland, args = (islandModel.reportQueue,), daemon = True), Process(target = runDyingIsland, daemon = True)]
+    for islandProcess in islandModel.islandProcesses :
+        islandProcess.start()
+
+    try :
+        with pytest.raises(RuntimeError, match = "Island 1 exited with code 3") :
+            islandModel.collectReports('report')
+    finally :
+        for islandProcess in islandModel.islandProcesses :
+            islandProcess.terminate()
+            islandProcess.join()
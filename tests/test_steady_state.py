@@ -0,0 +1,43 @@
+import pytest
+
+from EvaluationModule import EvaluationModule
+from GeneticAlgorithm import GeneticAlgorithm
+
+def buildGeneticAlgorithm(tournamentSize, tournamentReplacement) :
+    evaluationModule = EvaluationModule({
+        'randomSeed' : 5,
+        'stimulusProductPairCount' : 20,
+        'productVectorSize' : 2,
+        'backingTensorDepth' : 3,
+        'populationSize' : 6,
+        'evaluationProcessCount' : 1,
+        'evolutionModeIndicator' : 1,
+        'tournamentSize' : tournamentSize,
+        'tournamentReplacement' : tournamentReplacement
+    })
+    ga = GeneticAlgorithm(evaluationModule)
+    ga.generatePopulation()
+    ga.evaluatePopulation()
+    ga.sortPopulation()
+    return ga
+
+# A tournament of the whole population always has the same champion, so it is the case where a
+# second tournament is most likely to pick the first parent again
+@pytest.mark.parametrize("tournamentSize, tournamentReplacement", [(2, True), (6, True), (6, False)])
+def test_child_is_bred_from_two_distinct_parents(tournamentSize, tournamentReplacement) :
+
+    ga = buildGeneticAlgorithm(tournamentSize, tournamentReplacement)
+
+    # Record the parents of every child
+    parentPairs = []
+    crossoverParents = ga.crossoverParents
+    def recordParents(parentA, parentB, randomGenerator) :
+        parentPairs.append((parentA, parentB))
+        return crossoverParents(parentA, parentB, randomGenerator)
+    ga.crossoverParents = recordParents
+
+    for i in range(50) :
+        ga.breedChild()
+
+    assert len(parentPairs) == 50
+    assert all(parentA is not parentB for parentA, parentB in parentPairs)